@@ -0,0 +1,113 @@
+"""Compare the solver step counts with and without dense output.
+
+Run a constant volume (CONV) and an internal combustion engine (ICEN)
+case with frequent printing and saving, once with the default output,
+where the print and save intervals limit the solver step size, and
+once with the ``DENS`` keyword. Report the number of solver steps, the
+wall time, and the ignition delay for each. Requires Cantera 2.5 or
+newer.
+
+With Cantera 2.6.0, ``gri30.xml``, and Python 3.10 on one core of an
+Intel Xeon, the results were::
+
+      case   output      steps   time (s)   ignition (s)
+      CONV  default      51934       2.76   3.840593e-02
+      CONV    dense       3320       1.65   3.840592e-02
+      CONV ratio of default to dense steps: 15.64
+      ICEN  default      22289       1.42   1.023379e-02
+      ICEN    dense       4343       0.92   1.023379e-02
+      ICEN ratio of default to dense steps: 5.13
+
+The ignition delays agree to 1e-8 s, and the wall time fell by 40 % and
+35 %, less than the step counts.
+
+Usage::
+
+    python benchmarks/dense_output.py --mech gri30.xml
+"""
+# Standard libraries
+import io
+import os
+import time
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+
+# Local imports
+from cansen.run_cases import SimulationCase
+
+COMMON = """TEMP 1000.0
+PRES 20.0
+EQUI 1.0
+FUEL CH4 1.0
+OXID O2 1.0
+OXID N2 3.76
+CPROD CO2
+CPROD H2O
+CPROD N2
+DELT 1.0E-5
+DTSV 1.0E-6
+"""
+
+CASES = {
+    'CONV': """CONV
+TIME 0.05
+VOL 1.0
+""",
+    # The wall area is 1 m**2, so the swept volume is the stroke length
+    # in m**3.
+    'ICEN': """ICEN
+TIME 0.02
+STROKE 8.0
+LOLR 3.5
+RPM 1500
+CMPR 10.0
+VOLD 80000.0
+""",
+}
+
+
+def run(input_filename, mech_filename, save_filename):
+    """Run one case and return the step count, wall time, and ignition."""
+    filenames = {'input_filename': input_filename,
+                 'mech_filename': mech_filename,
+                 'save_filename': save_filename,
+                 'thermo_filename': None,
+                 }
+    with redirect_stdout(io.StringIO()):
+        sim = SimulationCase(filenames)
+        start = time.perf_counter()
+        sim.run_simulation()
+        wall_time = time.perf_counter() - start
+    return sim.n_steps, wall_time, sim.ignition_time
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mech', default='gri30.xml',
+                        help='Cantera mechanism with CH4, O2, and N2.')
+    args = parser.parse_args()
+
+    print('{:>6s} {:>8s} {:>10s} {:>10s} {:>14s}'.format(
+        'case', 'output', 'steps', 'time (s)', 'ignition (s)'))
+    with TemporaryDirectory() as tmp_dir:
+        save_filename = os.path.join(tmp_dir, 'save.hdf')
+        for name, case in CASES.items():
+            results = {}
+            for output, extra in (('default', ''), ('dense', 'DENS\n')):
+                input_filename = os.path.join(tmp_dir, name + '.inp')
+                with open(input_filename, 'w') as input_file:
+                    input_file.write(case + COMMON + extra + 'END\n')
+                results[output] = run(input_filename, args.mech,
+                                      save_filename)
+                n_steps, wall_time, ignition_time = results[output]
+                print('{:>6s} {:>8s} {:>10d} {:>10.2f} {:>14s}'.format(
+                    name, output, n_steps, wall_time,
+                    '{:.6e}'.format(ignition_time) if ignition_time
+                    else 'none'))
+            print('{:>6s} ratio of default to dense steps: {:.2f}'.format(
+                name, results['default'][0]/results['dense'][0]))
+
+
+if __name__ == '__main__':
+    main()
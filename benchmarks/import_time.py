@@ -0,0 +1,107 @@
+"""Check the import time of the command line entry point against a budget.
+
+Import ``cansen.__main__`` in a new interpreter with ``python -X
+importtime`` several times and report the fastest cumulative import
+time, the slowest modules it imports, and whether any of the modules
+that should only be imported when cases are run (Cantera, NumPy, and
+PyTables) were imported. The budget and the deferred modules are read
+from ``import_budget.json`` next to this script. The script exits with
+status 1 if the budget is exceeded or a deferred module is imported, so
+it can be run in continuous integration. With ``--record``, the result
+is appended to a CSV file, so that the import time can be tracked over
+time. Requires Python 3.7 or newer.
+
+Usage::
+
+    python benchmarks/import_time.py --repeat 5 --record import_history.csv
+"""
+# Standard libraries
+import os
+import sys
+import json
+import time
+import subprocess
+from argparse import ArgumentParser
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_times(module):
+    """Import the module in a new interpreter and return the times.
+
+    :return times:
+        Dictionary of the cumulative import time of each imported
+        module, in ms.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True,
+        cwd=os.path.dirname(HERE),
+        )
+    times = {}
+    for line in result.stderr.splitlines():
+        # Lines look like:
+        # import time:       self [us] |  cumulative | imported package
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            continue
+        times[fields[2].strip()] = cumulative/1000
+    return times
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of imports; the fastest is reported.')
+    parser.add_argument('--budget', default=os.path.join(HERE,
+                                                         'import_budget.json'),
+                        help='JSON file with the budget.')
+    parser.add_argument('--record', metavar='CSV',
+                        help='Append the result to this CSV file.')
+    args = parser.parse_args()
+
+    with open(args.budget) as budget_file:
+        budget = json.load(budget_file)
+    module = budget['module']
+
+    runs = [import_times(module) for i in range(args.repeat)]
+    fastest = min(runs, key=lambda times: times[module])
+    total = fastest[module]
+
+    print('{} imported in {:.1f} ms (budget {:.1f} ms)'.format(
+        module, total, budget['budget_ms']))
+    print('Slowest imports:')
+    slowest = sorted(fastest.items(), key=lambda item: item[1], reverse=True)
+    for name, cumulative in slowest[1:11]:
+        print('{:>10.1f} ms  {}'.format(cumulative, name))
+
+    failed = False
+    if total > budget['budget_ms']:
+        print('Import time is over budget')
+        failed = True
+    deferred = [name for name in budget['deferred'] if name in fastest]
+    if deferred:
+        print('Imported modules that should be deferred: {}'.format(
+            ', '.join(deferred)))
+        failed = True
+
+    if args.record is not None:
+        new_file = not os.path.isfile(args.record)
+        with open(args.record, 'a') as record_file:
+            if new_file:
+                print('date,python,module,import_ms,budget_ms',
+                      file=record_file)
+            print('{},{},{},{:.1f},{:.1f}'.format(
+                time.strftime('%Y-%m-%dT%H:%M:%S'),
+                '.'.join(str(v) for v in sys.version_info[:3]), module,
+                total, budget['budget_ms']), file=record_file)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
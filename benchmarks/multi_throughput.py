@@ -0,0 +1,122 @@
+"""Measure the throughput of --multi against the worker and thread counts.
+
+Run the same sweep of constant volume cases with each combination of
+the number of worker processes and the number of threads per worker,
+with and without pinning the workers to cores, and report the number of
+cases finished per second. The result cache is not used. Every case
+must reach ignition or the end time; a run with failed or stopped
+cases is an error rather than a throughput. Requires Cantera.
+
+Usage::
+
+    python benchmarks/multi_throughput.py --mech gri30.xml --workers 1 2 4 \\
+        --threads 1 2 --cases 64
+"""
+# Standard libraries
+import io
+import os
+import csv
+import sys
+import time
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+
+# Local imports
+from cansen.cansen import main as cansen_main
+from cansen._version import __version__
+
+INPUT = """CONV
+TRNG 800 1400 {step}
+PRES 20.0
+EQUI 1.0
+FUEL CH4 1.0
+OXID O2 1.0
+OXID N2 3.76
+VOL 1.0
+CPROD CO2
+CPROD H2O
+CPROD N2
+TIME 0.1
+END
+"""
+
+
+def run(tmp_dir, mech_filename, n_workers, n_threads, pin, max_tasks):
+    """Run the sweep, check the statuses, and return the wall time."""
+    filenames = {'input_filename': os.path.join(tmp_dir, 'sweep.inp'),
+                 'output_filename': os.path.join(tmp_dir, 'output.out'),
+                 'save_filename': None,
+                 'mech_filename': mech_filename,
+                 'thermo_filename': None,
+                 }
+    results_filename = os.path.join(tmp_dir, 'results.csv')
+    multi_options = {'cache': False,
+                     'results': results_filename,
+                     'threads': n_threads,
+                     'pin': pin,
+                     'max_tasks': max_tasks,
+                     }
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        cansen_main(filenames, False, True, n_workers, __version__,
+                    multi_options=multi_options)
+    wall_time = time.perf_counter() - start
+
+    with open(results_filename, newline='') as results_file:
+        statuses = [row['status'] for row in csv.DictReader(results_file)]
+    failed = [status for status in statuses
+              if status not in ('ignition', 'no-ignition')]
+    if not statuses or failed:
+        raise RuntimeError('{} of {} cases did not finish: {}'.format(
+            len(failed), len(statuses), ', '.join(sorted(set(failed)))))
+    return wall_time
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mech', default='gri30.xml',
+                        help='Cantera mechanism with CH4, O2, and N2.')
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, os.cpu_count() or 1],
+                        help='Numbers of worker processes to try.')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1],
+                        help='Numbers of threads per worker to try.')
+    parser.add_argument('--cases', type=int, default=32,
+                        help='Number of cases in the temperature sweep.')
+    parser.add_argument('--max-tasks', type=int, default=None,
+                        help='Replace each worker after this many cases.')
+    args = parser.parse_args()
+
+    # The thread limit is set in environment variables before Cantera
+    # is loaded by the first run. Later runs can only change it for the
+    # libraries that are already loaded with threadpoolctl.
+    if len(set(args.threads)) > 1:
+        try:
+            import threadpoolctl  # noqa: F401
+        except ImportError:
+            print('Warning: threadpoolctl is not installed, so only the '
+                  'first number of threads is used by every run.',
+                  file=sys.stderr)
+
+    print('{:>8s} {:>8s} {:>6s} {:>10s} {:>10s}'.format(
+        'workers', 'threads', 'pin', 'time (s)', 'cases/s'))
+    with TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, 'sweep.inp'), 'w') as input_file:
+            input_file.write(INPUT.format(
+                step=600.0/max(args.cases - 1, 1)))
+        for n_workers in args.workers:
+            for n_threads in args.threads:
+                pins = [None]
+                if hasattr(os, 'sched_setaffinity'):
+                    pins.append('core')
+                for pin in pins:
+                    wall_time = run(tmp_dir, args.mech, n_workers, n_threads,
+                                    pin, args.max_tasks)
+                    print('{:>8d} {:>8d} {:>6s} {:>10.2f} {:>10.2f}'.format(
+                        n_workers, n_threads, pin or 'none', wall_time,
+                        args.cases/wall_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Compare Python and native Cantera functions for the VPRO and TPRO profiles.
+
+Run a compression case with a ``VPRO`` profile and a case with a
+``TPRO`` profile, once with the profiles evaluated by Python callbacks
+and once with native Cantera functions (``--native-functions``). Report
+the wall time, the number of solver steps, and the time per step, which
+is dominated by the evaluation of the right-hand side. Also report the
+time to evaluate each profile directly, and check that the ignition
+delays agree. Requires Cantera 2.5 or newer.
+
+Usage::
+
+    python benchmarks/native_profiles.py --mech gri30.xml --points 10000
+"""
+# Standard libraries
+import time
+from argparse import ArgumentParser
+
+# Third-party modules
+import cantera as ct
+import numpy as np
+
+# Local imports
+from cansen import utils
+from cansen.run_cases import MultiSimulationCase
+from cansen.profiles import VolumeProfile, TemperatureProfile
+
+INPUT = """PRES 20.0
+TEMP {temperature}
+EQUI 1.0
+FUEL CH4 1.0
+OXID O2 1.0
+OXID N2 3.76
+VOL 1.0
+CPROD CO2
+CPROD H2O
+CPROD N2
+TIME {end_time}
+"""
+
+
+def profile_lines(keyword, times, values):
+    """Return the input file lines of a profile."""
+    return ['{} {!r} {!r}\n'.format(keyword, t, value)
+            for t, value in zip(times.tolist(), values.tolist())]
+
+
+def make_keywords(n_points, end_time, kind):
+    """Return the keywords of a VPRO or TPRO case."""
+    times = np.linspace(0, end_time, n_points)
+    if kind == 'VPRO':
+        # Compress by a factor of 10 over the first half, then hold.
+        fraction = np.minimum(times/(0.5*end_time), 1.0)
+        values = 1.0 - 0.9*(1 - np.cos(np.pi*fraction))/2
+        temperature = 500.0
+    else:
+        values = 1000.0 + 200.0*times/end_time
+        temperature = values[0]
+    lines = INPUT.format(temperature=temperature,
+                         end_time=end_time).splitlines(True)
+    lines += profile_lines(kind, times, values) + ['END\n']
+    return utils.read_input_file(None, echo=False, lines=lines)
+
+
+def run(keywords, mech_filename, native):
+    """Run the case and return the wall time, steps, and ignition delay."""
+    filenames = {'input_filename': None,
+                 'mech_filename': mech_filename,
+                 'save_filename': None,
+                 'thermo_filename': None,
+                 }
+    keywords = dict(keywords, nativeFunctions=native)
+    sim = MultiSimulationCase(filenames, keywords=keywords)
+    start = time.perf_counter()
+    sim.run_simulation()
+    return time.perf_counter() - start, sim.n_steps, sim.ignition_time
+
+
+def time_calls(function, times):
+    """Return the time per call of the function in microseconds."""
+    start = time.perf_counter()
+    for t in times:
+        function(t)
+    return (time.perf_counter() - start)/len(times)*1e6
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mech', default='gri30.xml',
+                        help='Cantera mechanism with CH4, O2, and N2.')
+    parser.add_argument('--points', type=int, default=10000,
+                        help='Number of points in the profiles.')
+    parser.add_argument('--end-time', type=float, default=0.05,
+                        help='End time of the cases, in s.')
+    args = parser.parse_args()
+
+    print('{:>6s} {:>8s} {:>10s} {:>8s} {:>12s} {:>14s}'.format(
+        'kind', 'function', 'time (s)', 'steps', 'us/step', 'ignition (s)'))
+    for kind, profile_class in [('VPRO', VolumeProfile),
+                                ('TPRO', TemperatureProfile)]:
+        keywords = make_keywords(args.points, args.end_time, kind)
+        profile = profile_class(keywords)
+        native_function = profile.native_function()
+        if native_function is None:
+            print('{}: native functions are not available with Cantera '
+                  '{}'.format(kind, ct.__version__))
+            continue
+
+        results = {}
+        for native in (False, True):
+            name = 'native' if native else 'python'
+            results[name] = run(keywords, args.mech, native)
+            wall_time, n_steps, ignition_time = results[name]
+            print('{:>6s} {:>8s} {:>10.2f} {:>8d} {:>12.1f} {:>14.6e}'.format(
+                kind, name, wall_time, n_steps, wall_time/n_steps*1e6,
+                ignition_time or float('nan')))
+        if results['python'][2] != results['native'][2]:
+            print('{}: ignition delays differ by {:.3e} s'.format(
+                kind, abs((results['python'][2] or 0) -
+                          (results['native'][2] or 0))))
+
+        times = np.sort(np.random.default_rng(0).uniform(
+            0, args.end_time, 100000)).tolist()
+        python_function = ct.Func1(profile)
+        differences = [abs(python_function(t) - native_function(t))
+                       for t in times]
+        print('{}: {:.2f} us per Python call, {:.2f} us per native call, '
+              'largest difference {:.3e}'.format(
+                  kind, time_calls(python_function, times),
+                  time_calls(native_function, times), max(differences)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Measure the time to evaluate the VPRO and TPRO profiles.
+
+Build volume and temperature profiles of increasing length and evaluate
+them at a sequence of increasing times, as the integrator does, and at
+random times. Compare the time per call with the lookup that scanned
+the whole time array on every call, and check that both return the
+same values. Does not require Cantera.
+
+Usage::
+
+    python benchmarks/profile_lookup.py --points 100 1000 10000 50000
+"""
+# Standard libraries
+import time
+from argparse import ArgumentParser
+
+# Third-party modules
+import numpy as np
+
+# Local imports
+from cansen.profiles import VolumeProfile, TemperatureProfile
+
+
+def scan_volume(profile, t):
+    """The previous lookup of `VolumeProfile`, for comparison."""
+    if t < profile.time[-1]:
+        prev_time_point = profile.time[profile.time <= t][-1]
+        index = np.where(profile.time == prev_time_point)[0][0]
+        return profile.velocity[index]
+    else:
+        return 0
+
+
+def scan_temperature(profile, t):
+    """The previous lookup of `TemperatureProfile`, for comparison."""
+    if t == 0:
+        return profile.temperature[0]
+    if t < profile.time[1]:
+        tim0 = profile.time[0]
+        tim1 = profile.time[1]
+        temp0 = profile.temperature[0]
+        temp1 = profile.temperature[1]
+    elif t >= profile.time[1] and t <= profile.time[-1]:
+        tim0 = profile.time[profile.time < t][-1]
+        tim1 = profile.time[np.where(profile.time == tim0)[0][0]+1]
+        temp0 = profile.temperature[profile.time < t][-1]
+        temp1 = profile.temperature[np.where(profile.time == tim0)[0][0]+1]
+    elif t > profile.time[-1]:
+        return profile.temperature[-1]
+
+    return temp0 + (temp1-temp0)*(t-tim0)/(tim1-tim0)
+
+
+def time_calls(function, times):
+    """Return the values and the time per call in microseconds."""
+    start = time.perf_counter()
+    values = [function(t) for t in times]
+    return values, (time.perf_counter() - start)/len(times)*1e6
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, nargs='+',
+                        default=[100, 1000, 10000, 50000],
+                        help='Numbers of points in the profiles.')
+    parser.add_argument('--calls', type=int, default=20000,
+                        help='Number of calls for each profile.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print('{:>8s} {:>6s} {:>8s} {:>12s} {:>12s} {:>8s}'.format(
+        'points', 'kind', 'order', 'scan (us)', 'search (us)', 'same'))
+    for n_points in args.points:
+        end_time = 0.1
+        profile_time = np.linspace(0, end_time, n_points)
+        keywords = {
+            'vproTime': profile_time.tolist(),
+            'vproVol': (1 + 0.5*np.cos(profile_time/end_time*np.pi) +
+                        1e-3*rng.standard_normal(n_points)).tolist(),
+            'TproTime': profile_time.tolist(),
+            'TproTemp': (800 + 300*profile_time/end_time).tolist(),
+            }
+        orders = {
+            'forward': np.sort(rng.uniform(0, end_time, args.calls)),
+            'random': rng.uniform(0, end_time, args.calls),
+            }
+        for kind, profile_class, scan in [
+                ('VPRO', VolumeProfile, scan_volume),
+                ('TPRO', TemperatureProfile, scan_temperature)]:
+            for order, times in orders.items():
+                times = times.tolist()
+                profile = profile_class(keywords)
+                old, old_time = time_calls(lambda t: scan(profile, t), times)
+                new, new_time = time_calls(profile, times)
+                print('{:>8d} {:>6s} {:>8s} {:>12.2f} {:>12.2f} {:>8s}'.format(
+                    n_points, kind, order, old_time, new_time,
+                    str(old == new)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Compare running many cases with new and reused reactor networks.
+
+Run a sweep of constant volume cases in one process, once building a
+new reactor network for every case and once reusing the network from
+the previous case, as the workers of ``--multi`` do. Report the time to
+set up and run the cases and check that the ignition delays are the
+same. Requires Cantera.
+
+Usage::
+
+    python benchmarks/reactor_reuse.py --mech gri30.xml --cases 20
+"""
+# Standard libraries
+import time
+from argparse import ArgumentParser
+
+# Third-party modules
+import numpy as np
+
+# Local imports
+from cansen import utils
+from cansen.run_cases import MultiSimulationCase
+
+INPUT = """CONV
+TRNG 800 1400 {step}
+PRES 20.0
+EQUI 1.0
+FUEL CH4 1.0
+OXID O2 1.0
+OXID N2 3.76
+VOL 1.0
+CPROD CO2
+CPROD H2O
+CPROD N2
+TIME 0.1
+END
+"""
+
+
+def run(cases, mech_filename, reuse):
+    """Run the cases and return the wall time and ignition delays."""
+    filenames = {'input_filename': None,
+                 'mech_filename': mech_filename,
+                 'save_filename': None,
+                 'thermo_filename': None,
+                 }
+    ignition_times = []
+    start = time.perf_counter()
+    for keywords in cases:
+        sim = MultiSimulationCase(filenames, keywords=keywords)
+        sim.reuse_reactor = reuse
+        sim.run_simulation()
+        ignition_times.append(sim.ignition_time)
+    return time.perf_counter() - start, ignition_times
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mech', default='gri30.xml',
+                        help='Cantera mechanism with CH4, O2, and N2.')
+    parser.add_argument('--cases', type=int, default=20,
+                        help='Number of cases in the temperature sweep.')
+    args = parser.parse_args()
+
+    step = 600.0/max(args.cases - 1, 1)
+    lines = INPUT.format(step=step).splitlines(True)
+    keywords = utils.read_input_file(None, echo=False, lines=lines)
+    cases = utils.expand_sweep(keywords)
+
+    # Load the mechanism before timing, since both runs share it.
+    run(cases[:1], args.mech, reuse=False)
+    new_time, new_ignition = run(cases, args.mech, reuse=False)
+    reuse_time, reuse_ignition = run(cases, args.mech, reuse=True)
+
+    print('{} cases'.format(len(cases)))
+    print('{:>8s} {:>10s}'.format('network', 'time (s)'))
+    print('{:>8s} {:>10.2f}'.format('new', new_time))
+    print('{:>8s} {:>10.2f}'.format('reused', reuse_time))
+    new_ignition = np.array(new_ignition, dtype=float)
+    reuse_ignition = np.array(reuse_ignition, dtype=float)
+    if np.array_equal(new_ignition, reuse_ignition, equal_nan=True):
+        print('Ignition delays are identical')
+    else:
+        print('Ignition delays differ by up to {:.3e} s'.format(
+            np.nanmax(np.abs(new_ignition - reuse_ignition))))
+
+
+if __name__ == '__main__':
+    main()
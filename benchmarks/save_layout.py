@@ -0,0 +1,152 @@
+"""Compare the layouts of the binary save file.
+
+Write a synthetic reactor history with the same table definition as
+:py:meth:`cansen.run_cases.SimulationCase.run_case` using each of a
+set of compression and chunk settings, and report the file size and
+the write and read throughput for each. Cantera is not needed.
+
+Usage::
+
+    python benchmarks/save_layout.py --rows 5000 --species 200 --sens 50
+"""
+# Standard libraries
+import os
+import time
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+
+# Third-party modules
+import numpy as np
+import tables
+
+# Local imports
+from cansen.writer import BufferedTableWriter
+
+# (complib, complevel, chunk rows). A complib of None is the default
+# uncompressed layout, and chunk rows of None lets PyTables choose.
+SETTINGS = [
+    (None, 0, None),
+    (None, 0, 64),
+    ('zlib', 1, None),
+    ('zlib', 5, None),
+    ('blosc', 5, None),
+    ('blosc:lz4', 5, None),
+    ('blosc:lz4', 5, 64),
+    ('blosc:zstd', 5, None),
+]
+
+
+def synthetic_history(n_rows, n_species, n_sens):
+    """Return arrays that look like a reactor history.
+
+    The mass fractions follow smooth logistic curves in time, like an
+    ignition event, with a little noise so that compression does not
+    look better than it is.
+    """
+    rng = np.random.RandomState(0)
+    time_ = np.linspace(0, 1e-2, n_rows)
+    progress = 1/(1 + np.exp(-(time_ - 5e-3)/2e-4))
+    scale = rng.uniform(1e-12, 1e-1, n_species)
+    massfractions = (progress[:, None]*scale +
+                     rng.normal(0, 1e-14, (n_rows, n_species)))
+    temperature = 800 + 1800*progress
+    pressure = 101325*temperature/800
+    volume = np.full(n_rows, 1e-6)
+    if n_sens:
+        sens = (progress[:, None, None] *
+                rng.normal(0, 1, (1, n_species + 3, n_sens)))
+    else:
+        sens = None
+    return time_, temperature, pressure, volume, massfractions, sens
+
+
+def run(filename, history, complib, complevel, chunk_rows, buffer_size):
+    """Write and read back one save file and return the timings."""
+    time_, temperature, pressure, volume, massfractions, sens = history
+    n_rows, n_species = massfractions.shape
+    table_def = {'time': tables.Float64Col(pos=0),
+                 'temperature': tables.Float64Col(pos=1),
+                 'pressure': tables.Float64Col(pos=2),
+                 'volume': tables.Float64Col(pos=3),
+                 'massfractions': tables.Float64Col(shape=(n_species),
+                                                    pos=4),
+                 }
+    if sens is not None:
+        table_def['sensitivity'] = tables.Float64Col(shape=sens.shape[1:],
+                                                     pos=5)
+    if complib is not None:
+        filters = tables.Filters(complevel=complevel, complib=complib,
+                                 shuffle=True)
+    else:
+        filters = None
+    if chunk_rows is not None:
+        chunkshape = (chunk_rows,)
+    else:
+        chunkshape = None
+
+    start = time.perf_counter()
+    with tables.open_file(filename, mode='w') as save_file:
+        table = save_file.create_table(save_file.root, 'reactor', table_def,
+                                       filters=filters,
+                                       chunkshape=chunkshape)
+        with BufferedTableWriter(table, buffer_size) as timestep:
+            for i in range(n_rows):
+                timestep['time'] = time_[i]
+                timestep['temperature'] = temperature[i]
+                timestep['pressure'] = pressure[i]
+                timestep['volume'] = volume[i]
+                timestep['massfractions'] = massfractions[i]
+                if sens is not None:
+                    timestep['sensitivity'] = sens[i]
+                timestep.append()
+        chunkshape = table.chunkshape
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with tables.open_file(filename, mode='r') as save_file:
+        save_file.root.reactor.read()
+    read_time = time.perf_counter() - start
+
+    return os.path.getsize(filename), write_time, read_time, chunkshape[0]
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000,
+                        help='Number of time steps to write.')
+    parser.add_argument('--species', type=int, default=200,
+                        help='Number of species in the mass fractions.')
+    parser.add_argument('--sens', type=int, default=0,
+                        help='Number of sensitivity parameters; 0 to '
+                             'leave out the sensitivity column.')
+    parser.add_argument('--buffer-size', type=int, default=100,
+                        help='Number of rows buffered before writing.')
+    args = parser.parse_args()
+
+    history = synthetic_history(args.rows, args.species, args.sens)
+    raw_mb = sum(a.nbytes for a in history if a is not None)/2**20
+
+    print('{} rows, {} species, {} sensitivity parameters, {:.1f} MB of '
+          'data'.format(args.rows, args.species, args.sens, raw_mb))
+    print('{:>12s} {:>5s} {:>6s} {:>10s} {:>7s} {:>12s} {:>12s}'.format(
+        'complib', 'level', 'chunk', 'size (MB)', 'ratio', 'write MB/s',
+        'read MB/s'))
+    with TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, 'save.hdf')
+        for complib, complevel, chunk_rows in SETTINGS:
+            if (complib is not None and
+                    not tables.which_lib_version(complib.split(':')[0])):
+                print('{:>12s} not available, skipped'.format(complib))
+                continue
+            size, write_time, read_time, chunk = run(
+                filename, history, complib, complevel, chunk_rows,
+                args.buffer_size)
+            size_mb = size/2**20
+            print('{:>12s} {:>5d} {:>6d} {:>10.2f} {:>7.2f} {:>12.1f} '
+                  '{:>12.1f}'.format(complib or 'none', complevel, chunk,
+                                     size_mb, raw_mb/size_mb,
+                                     raw_mb/write_time, raw_mb/read_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Compare the solver steps of raw and smoothed VPRO volume profiles.
+
+Run a rapid compression machine case with a noisy measured-like
+``VPRO`` volume trace, once with the piecewise constant velocity of the
+raw profile and once with each ``VSMO`` smoothing method. Report the
+number of solver steps, the wall time, and the ignition delay of each.
+``SPLINE`` is skipped if SciPy 1.10 or newer is not installed. Requires
+Cantera.
+
+Usage::
+
+    python benchmarks/smooth_volume.py --mech gri30.xml --points 5000 \\
+        --noise 1e-4
+"""
+# Standard libraries
+import time
+from argparse import ArgumentParser
+
+# Third-party modules
+import numpy as np
+
+# Local imports
+from cansen import utils
+from cansen.exceptions import CanSenError
+from cansen.run_cases import MultiSimulationCase
+
+INPUT = """PRES 1.5
+TEMP 350.0
+EQUI 1.0
+FUEL CH4 1.0
+OXID O2 1.0
+OXID N2 3.76
+VOL 1.0
+CPROD CO2
+CPROD H2O
+CPROD N2
+TIME {end_time}
+"""
+
+
+def rcm_keywords(n_points, end_time, noise, seed=0):
+    """Return the keywords of a compression case with a noisy profile.
+
+    The volume is compressed by a factor of 12 over the first 30 % of
+    the time and then held, with Gaussian noise of the given relative
+    size added to every point, as in a measured pressure trace.
+    """
+    times = np.linspace(0, end_time, n_points)
+    fraction = np.minimum(times/(0.3*end_time), 1.0)
+    volume = 1.0 - (11.0/12.0)*(1 - np.cos(np.pi*fraction))/2
+    rng = np.random.default_rng(seed)
+    volume *= 1 + noise*rng.standard_normal(n_points)
+    lines = INPUT.format(end_time=end_time).splitlines(True)
+    lines += ['VPRO {!r} {!r}\n'.format(t, v)
+              for t, v in zip(times.tolist(), volume.tolist())]
+    lines.append('END\n')
+    return utils.read_input_file(None, echo=False, lines=lines)
+
+
+def run(keywords, mech_filename):
+    """Run the case and return the steps, wall time, and ignition delay."""
+    filenames = {'input_filename': None,
+                 'mech_filename': mech_filename,
+                 'save_filename': None,
+                 'thermo_filename': None,
+                 }
+    sim = MultiSimulationCase(filenames, keywords=keywords)
+    start = time.perf_counter()
+    sim.run_simulation()
+    return sim.n_steps, time.perf_counter() - start, sim.ignition_time
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mech', default='gri30.xml',
+                        help='Cantera mechanism with CH4, O2, and N2.')
+    parser.add_argument('--points', type=int, default=5000,
+                        help='Number of points in the volume profile.')
+    parser.add_argument('--end-time', type=float, default=0.1,
+                        help='End time of the case, in s.')
+    parser.add_argument('--noise', type=float, default=1e-4,
+                        help='Relative size of the noise in the volume.')
+    args = parser.parse_args()
+
+    keywords = rcm_keywords(args.points, args.end_time, args.noise)
+    print('{:>8s} {:>8s} {:>10s} {:>14s}'.format(
+        'VSMO', 'steps', 'time (s)', 'ignition (s)'))
+    reference_steps = None
+    for method in [None, 'pchip', 'spline']:
+        case = dict(keywords)
+        if method is not None:
+            case['vproSmoothing'] = method
+        try:
+            n_steps, wall_time, ignition_time = run(case, args.mech)
+        except CanSenError as error:
+            print('{:>8s} skipped: {}'.format(method, error))
+            continue
+        if reference_steps is None:
+            reference_steps = n_steps
+        print('{:>8s} {:>8d} {:>10.2f} {:>14.6e}  ({:.2f}x fewer steps)'.format(
+            method or 'none', n_steps, wall_time,
+            ignition_time or float('nan'), reference_steps/n_steps))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,7 @@ from .cansen import cansen
 def main(args=None):
     if args is None:
         args = sys.argv[1:]
-        cansen(args)
+    cansen(args)
 
 
 if __name__ == '__main__':
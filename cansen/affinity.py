@@ -0,0 +1,168 @@
+# Standard libraries
+import os
+import sys
+import glob
+
+# Environment variables that set the number of threads used by the
+# common OpenMP and BLAS libraries.
+THREAD_ENV_VARS = ['OMP_NUM_THREADS',
+                   'OPENBLAS_NUM_THREADS',
+                   'MKL_NUM_THREADS',
+                   'BLIS_NUM_THREADS',
+                   'VECLIB_MAXIMUM_THREADS',
+                   'NUMEXPR_NUM_THREADS',
+                   ]
+
+# Modules that load OpenMP or BLAS libraries when they are imported.
+THREADED_MODULES = ['numpy', 'cantera']
+
+# Set once the user has been told that the thread limit could not be
+# applied, so that each process only says so once.
+_warned = False
+
+
+def limit_threads(n_threads):
+    """Limit the number of threads used by OpenMP and BLAS libraries.
+
+    The environment variables are read by the libraries when they are
+    loaded, so they only affect libraries loaded after this call, and
+    this should be called before Cantera or NumPy are imported. The
+    libraries that are already loaded, such as the BLAS used by NumPy,
+    are limited with ``threadpoolctl`` if it is installed. Otherwise, a
+    warning is printed if the limit changes after they are loaded.
+
+    :param n_threads:
+        Maximum number of threads.
+    """
+    global _warned
+    changed = any(os.environ.get(name) != str(n_threads)
+                  for name in THREAD_ENV_VARS)
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(n_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        loaded = any(name in sys.modules for name in THREADED_MODULES)
+        if changed and loaded and not _warned:
+            _warned = True
+            print('Warning: The thread limit cannot be applied to the '
+                  'OpenMP and BLAS libraries that are already loaded '
+                  'without the threadpoolctl package, so it may have no '
+                  'effect.')
+        return
+    threadpool_limits(limits=n_threads)
+
+
+def numa_nodes():
+    """Return the CPUs of each NUMA node.
+
+    :return nodes:
+        List of sets of the CPUs of each NUMA node, read from
+        ``/sys/devices/system/node``. If the NUMA layout is not
+        available, a single node with every CPU this process is allowed
+        to use is returned.
+    """
+    nodes = []
+    for cpulist in sorted(glob.glob('/sys/devices/system/node/node*/cpulist')):
+        with open(cpulist) as cpulist_file:
+            nodes.append(parse_cpulist(cpulist_file.read()))
+    allowed = available_cpus()
+    nodes = [node & allowed for node in nodes if node & allowed]
+    return nodes or [allowed]
+
+
+def parse_cpulist(cpulist):
+    """Return the set of CPUs in a Linux CPU list, such as ``0-3,8``.
+
+    :param cpulist:
+        String with the CPU list.
+    """
+    cpus = set()
+    for part in cpulist.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def available_cpus():
+    """Return the set of CPUs this process is allowed to run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return set(os.sched_getaffinity(0))
+    return set(range(os.cpu_count() or 1))
+
+
+def cpu_sets(pin, n_workers, n_threads=1):
+    """Return the CPUs that each worker should be pinned to.
+
+    :param pin:
+        ``'core'`` to give each worker its own ``n_threads`` CPUs, or
+        ``'numa'`` to spread the workers over the NUMA nodes, with each
+        worker allowed to use every CPU of its node.
+    :param n_workers:
+        Number of worker processes.
+    :param n_threads:
+        Number of threads of each worker. Only used with ``'core'``.
+    :return cpu_sets:
+        List of the sets of CPUs of each worker. When there are more
+        workers than CPUs, the CPUs are shared.
+    """
+    if pin == 'numa':
+        nodes = numa_nodes()
+        return [nodes[i % len(nodes)] for i in range(n_workers)]
+    elif pin == 'core':
+        cpus = sorted(available_cpus())
+        n_threads = max(n_threads, 1)
+        return [{cpus[(i*n_threads + j) % len(cpus)]
+                 for j in range(n_threads)} for i in range(n_workers)]
+    raise ValueError('Unknown pinning: {}'.format(pin))
+
+
+def pid_alive(pid):
+    """Return ``True`` if a process with the given ID is running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def claim_slot(slots):
+    """Claim a free worker slot for this process.
+
+    Each slot holds the process ID of the worker using it, or 0. A slot
+    is free if it is 0 or its worker has exited, so a worker that
+    replaces one that was recycled takes over its slot, and its CPUs.
+
+    :param slots:
+        Shared ``multiprocessing.Array`` of integers, one per worker.
+    :return slot:
+        Index of the claimed slot.
+    """
+    with slots.get_lock():
+        for slot, pid in enumerate(slots):
+            if pid == 0 or not pid_alive(pid):
+                slots[slot] = os.getpid()
+                return slot
+    # All of the slots are taken, which should not happen; share one.
+    return os.getpid() % len(slots)
+
+
+def pin_process(cpus):
+    """Restrict this process to the given CPUs, if the OS supports it.
+
+    :param cpus:
+        Set of CPU numbers.
+    :return pinned:
+        ``True`` if the process was pinned.
+    """
+    if not hasattr(os, 'sched_setaffinity'):
+        return False
+    os.sched_setaffinity(0, cpus)
+    return True
@@ -0,0 +1,457 @@
+# Standard libraries
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+
+
+def user_cache_dir():
+    """Return the directory where CanSen stores its caches.
+
+    Uses ``%LOCALAPPDATA%`` on Windows, ``~/Library/Caches`` on macOS,
+    and ``$XDG_CACHE_HOME`` or ``~/.cache`` otherwise. The directory
+    is created if it does not exist.
+    """
+    if sys.platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME',
+                              os.path.expanduser('~/.cache'))
+    cache_dir = os.path.join(base, 'cansen')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def hash_file(filename):
+    """Return the SHA-256 hex digest of the contents of a file.
+
+    :param filename:
+        Name of the file to hash.
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as hashed_file:
+        for block in iter(lambda: hashed_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def atomic_write(filename, suffix=''):
+    """Write a file under a temporary name and then move it into place.
+
+    The caches are shared by every CanSen process of the user, so the
+    file is only moved to ``filename`` once it is complete, and another
+    process never reads a partly written file. If writing fails, the
+    temporary file is removed.
+
+    :param filename:
+        Name of the file to write.
+    :param suffix:
+        Optional suffix of the temporary name, for writers that add an
+        extension if it is missing.
+    :return tmp_filename:
+        Name of the temporary file to write, in the same directory.
+    """
+    tmp_filename = '{}.{}.tmp{}'.format(filename, os.getpid(), suffix)
+    try:
+        yield tmp_filename
+    except BaseException:
+        if os.path.isfile(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+    os.replace(tmp_filename, filename)
+
+
+# Size in bytes of the numeric columns of a row of the runtimes table,
+# counted with the length of the mechanism hash towards the cache size.
+RUNTIME_ROW_SIZE = 40
+
+# Changes to the result cache are committed in batches, when this many
+# have been made or this many seconds have passed since the last
+# commit, and when the cache is closed.
+COMMIT_CHANGES = 100
+COMMIT_INTERVAL = 10.0
+
+
+class ResultCache(object):
+    """
+    Store the results of ignition delay cases in an SQLite database, so
+    that cases that have been run before do not have to be run again.
+    The results are keyed by a hash of everything that determines
+    them: the mechanism, the keywords of the case, and the versions of
+    CanSen and Cantera. When the stored results grow larger than the
+    maximum size, the least recently used results are removed.
+
+    The size of the stored results is counted when the cache is opened
+    and then kept up to date as entries are added and removed, so it
+    does not include entries added by other processes in the meantime.
+    Changes are committed in batches; call `close` to commit the rest.
+    """
+
+    def __init__(self, filename=None, max_size=100.0):
+        """Open the cache database, creating it if necessary.
+
+        :param filename:
+            Name of the database file. Optional, default:
+            ``results.sqlite`` in the `user_cache_dir`.
+        :param max_size:
+            Maximum size of the stored results, in MB.
+        """
+        if filename is None:
+            filename = os.path.join(user_cache_dir(), 'results.sqlite')
+        self.filename = filename
+        self.max_size = max_size
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, '
+            'result TEXT NOT NULL, '
+            'last_used REAL NOT NULL)'
+            )
+        # Runtimes of previous cases, used to estimate the cost of new
+        # cases with the same mechanism. The table of older versions
+        # kept every runtime of every run; it is only an estimate, so
+        # drop it rather than convert it.
+        columns = [row[1] for row in self.connection.execute(
+            'PRAGMA table_info(runtimes)')]
+        if columns and 'last_used' not in columns:
+            self.connection.execute('DROP TABLE runtimes')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS runtimes ('
+            'mech_hash TEXT NOT NULL, '
+            'temperature REAL NOT NULL, '
+            'pressure REAL NOT NULL, '
+            'eq_ratio REAL NOT NULL, '
+            'runtime REAL NOT NULL, '
+            'last_used REAL NOT NULL, '
+            'PRIMARY KEY (mech_hash, temperature, pressure, eq_ratio))'
+            )
+        self.connection.commit()
+        self.n_bytes = self.count_bytes()
+        self.n_changes = 0
+        self.last_commit = time.time()
+
+    @staticmethod
+    def make_key(mech_hash, keywords, versions):
+        """Return the cache key for a case.
+
+        :param mech_hash:
+            Hash of the contents of the mechanism file, from
+            `hash_file`.
+        :param keywords:
+            Dictionary of the keywords of the case, including any that
+            were set on the command line. The tolerances are included
+            in the keywords.
+        :param versions:
+            Tuple of the CanSen and Cantera version strings.
+        """
+        description = json.dumps([mech_hash, keywords, list(versions)],
+                                 sort_keys=True, default=str)
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the stored result for the key, or ``None``.
+
+        :param key:
+            Cache key, from `make_key`.
+        """
+        row = self.connection.execute(
+            'SELECT result FROM results WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        self.connection.execute(
+            'UPDATE results SET last_used = ? WHERE key = ?',
+            (time.time(), key)
+            )
+        self.changed()
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """Store the result for the key and evict old results if needed.
+
+        :param key:
+            Cache key, from `make_key`.
+        :param result:
+            Result of the case. Must be serializable to JSON.
+        """
+        old = self.connection.execute(
+            'SELECT LENGTH(key) + LENGTH(result) FROM results WHERE key = ?',
+            (key,)
+            ).fetchone()
+        result = json.dumps(result)
+        self.connection.execute(
+            'INSERT OR REPLACE INTO results (key, result, last_used) '
+            'VALUES (?, ?, ?)', (key, result, time.time())
+            )
+        self.n_bytes += len(key) + len(result) - (old[0] if old else 0)
+        self.changed()
+        self.evict()
+
+    def put_runtime(self, mech_hash, keywords, runtime):
+        """Store the runtime of a case and evict old entries if needed.
+
+        Only the latest runtime of each initial condition is kept. Only
+        the runtimes of cases that finished should be stored, since the
+        runtimes of cases that were stopped early or failed say little
+        about their cost.
+
+        :param mech_hash:
+            Hash of the contents of the mechanism file.
+        :param keywords:
+            Dictionary of the keywords of the case.
+        :param runtime:
+            Wall-clock time to run the case, in seconds.
+        """
+        condition = (mech_hash, keywords['temperature'], keywords['pressure'],
+                     keywords.get('eqRatio') or 1.0)
+        old = self.connection.execute(
+            'SELECT 1 FROM runtimes WHERE mech_hash = ? AND temperature = ? '
+            'AND pressure = ? AND eq_ratio = ?', condition
+            ).fetchone()
+        self.connection.execute(
+            'INSERT OR REPLACE INTO runtimes VALUES (?, ?, ?, ?, ?, ?)',
+            condition + (runtime, time.time())
+            )
+        if old is None:
+            self.n_bytes += len(mech_hash) + RUNTIME_ROW_SIZE
+        self.changed()
+        self.evict()
+
+    def get_runtimes(self, mech_hash):
+        """Return the runtimes of previous cases with the mechanism.
+
+        :param mech_hash:
+            Hash of the contents of the mechanism file.
+        :return runtimes:
+            List of tuples of the temperature, pressure, equivalence
+            ratio, and runtime of each case.
+        """
+        runtimes = self.connection.execute(
+            'SELECT temperature, pressure, eq_ratio, runtime FROM runtimes '
+            'WHERE mech_hash = ?', (mech_hash,)
+            ).fetchall()
+        self.connection.execute(
+            'UPDATE runtimes SET last_used = ? WHERE mech_hash = ?',
+            (time.time(), mech_hash)
+            )
+        self.changed()
+        return runtimes
+
+    def count_bytes(self):
+        """Return the size of the stored results and runtimes, in bytes.
+
+        Reads every entry, so it is only used when the cache is opened.
+        """
+        results = self.connection.execute(
+            'SELECT SUM(LENGTH(key) + LENGTH(result)) FROM results'
+            ).fetchone()[0]
+        runtimes = self.connection.execute(
+            'SELECT SUM(LENGTH(mech_hash) + {}) FROM runtimes'.format(
+                RUNTIME_ROW_SIZE)
+            ).fetchone()[0]
+        return (results or 0) + (runtimes or 0)
+
+    def size(self):
+        """Return the size of the stored results and runtimes, in MB."""
+        return self.n_bytes/2**20
+
+    def changed(self):
+        """Record a change, and commit the changes if a batch is full."""
+        self.n_changes += 1
+        if (self.n_changes >= COMMIT_CHANGES or
+                time.time() - self.last_commit >= COMMIT_INTERVAL):
+            self.commit()
+
+    def commit(self):
+        """Commit the changes made since the last commit."""
+        self.connection.commit()
+        self.n_changes = 0
+        self.last_commit = time.time()
+
+    def evict(self):
+        """Remove the least recently used entries until under max_size.
+
+        The results and the runtimes are removed together, in the order
+        they were last used. Nothing is read unless the cache is larger
+        than max_size.
+        """
+        excess = self.n_bytes - self.max_size*2**20
+        if excess <= 0:
+            return
+        rows = self.connection.execute(
+            'SELECT 0, key, LENGTH(key) + LENGTH(result), last_used '
+            'FROM results '
+            'UNION ALL '
+            'SELECT 1, rowid, LENGTH(mech_hash) + {}, last_used '
+            'FROM runtimes '
+            'ORDER BY last_used'.format(RUNTIME_ROW_SIZE)
+            ).fetchall()
+        evicted = ([], [])
+        for table, key, length, last_used in rows:
+            if excess <= 0:
+                break
+            evicted[table].append((key,))
+            excess -= length
+            self.n_bytes -= length
+        self.connection.executemany('DELETE FROM results WHERE key = ?',
+                                    evicted[0])
+        self.connection.executemany('DELETE FROM runtimes WHERE rowid = ?',
+                                    evicted[1])
+        self.commit()
+
+    def close(self):
+        """Commit any changes and close the cache database."""
+        self.commit()
+        self.connection.close()
+
+
+class MechanismCache(object):
+    """
+    Store CHEMKIN format mechanisms converted to the Cantera CTI format,
+    so that a mechanism that has not changed does not have to be
+    converted again. The converted files are stored in the
+    `user_cache_dir`, keyed by a hash of the contents of the mechanism
+    and thermodynamic database and the version of the converter. Each
+    converted file ``<key>.cti`` has a file ``<key>.json`` next to it
+    that describes where it came from and when it was last used.
+    """
+
+    def __init__(self, cache_dir=None):
+        """Open the cache directory, creating it if necessary.
+
+        :param cache_dir:
+            Directory of the converted files. Optional, default:
+            ``ck2cti`` in the `user_cache_dir`.
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(user_cache_dir(), 'ck2cti')
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def make_key(mech_filename, thermo_filename, converter_version):
+        """Return the cache key for a conversion.
+
+        :param mech_filename:
+            Filename of the CHEMKIN format mechanism.
+        :param thermo_filename:
+            Filename of the thermodynamic database, or ``None``.
+        :param converter_version:
+            Version string of the converter.
+        """
+        thermo_hash = None
+        if thermo_filename is not None:
+            thermo_hash = hash_file(thermo_filename)
+        description = json.dumps([hash_file(mech_filename), thermo_hash,
+                                  converter_version])
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        """Return the name of the converted file for the key."""
+        return os.path.join(self.cache_dir, key + '.cti')
+
+    def get(self, key):
+        """Return the name of the converted file for the key, or ``None``.
+
+        :param key:
+            Cache key, from `make_key`.
+        """
+        filename = self.path(key)
+        if not os.path.isfile(filename):
+            return None
+        info = self.read_info(key)
+        info['last_used'] = time.time()
+        self.write_info(key, info)
+        return filename
+
+    def put(self, key, mech_filename, thermo_filename, converter_version):
+        """Record where a converted file in the cache came from.
+
+        The converted file must already have been written to `path`,
+        with `atomic_write`.
+
+        :param key:
+            Cache key, from `make_key`.
+        :param mech_filename:
+            Filename of the CHEMKIN format mechanism.
+        :param thermo_filename:
+            Filename of the thermodynamic database, or ``None``.
+        :param converter_version:
+            Version string of the converter.
+        :return filename:
+            Name of the converted file in the cache.
+        """
+        filename = self.path(key)
+        now = time.time()
+        self.write_info(key, {
+            'mechanism': os.path.abspath(mech_filename),
+            'thermo': (os.path.abspath(thermo_filename)
+                       if thermo_filename is not None else None),
+            'converter_version': converter_version,
+            'created': now,
+            'last_used': now,
+            })
+        return filename
+
+    def read_info(self, key):
+        """Return the dictionary describing the converted file."""
+        try:
+            with open(os.path.join(self.cache_dir, key + '.json')) as info:
+                return json.load(info)
+        except (OSError, ValueError):
+            return {}
+
+    def write_info(self, key, info):
+        """Write the dictionary describing the converted file."""
+        info_filename = os.path.join(self.cache_dir, key + '.json')
+        with atomic_write(info_filename, '.json') as tmp_filename:
+            with open(tmp_filename, 'w') as info_file:
+                json.dump(info, info_file)
+
+    def entries(self):
+        """Return the descriptions of the converted files in the cache.
+
+        :return entries:
+            List of dictionaries, from the least to the most recently
+            used, each with the ``key`` and ``size`` in bytes of the
+            converted file in addition to the description written by
+            `put`.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            key, extension = os.path.splitext(name)
+            if extension != '.cti':
+                continue
+            entry = self.read_info(key)
+            entry['key'] = key
+            entry['size'] = os.path.getsize(self.path(key))
+            entry.setdefault('last_used', os.path.getmtime(self.path(key)))
+            entries.append(entry)
+        return sorted(entries, key=lambda entry: entry['last_used'])
+
+    def prune(self, max_age=None):
+        """Remove converted files that have not been used recently.
+
+        :param max_age:
+            Files that have not been used for this many days are
+            removed. Optional, by default every file is removed.
+        :return removed:
+            List of the entries that were removed, from `entries`.
+        """
+        removed = []
+        now = time.time()
+        for entry in self.entries():
+            if max_age is not None and now - entry['last_used'] < max_age*86400:
+                continue
+            for extension in ('.cti', '.json'):
+                filename = os.path.join(self.cache_dir, entry['key'] + extension)
+                if os.path.isfile(filename):
+                    os.remove(filename)
+            removed.append(entry)
+        return removed
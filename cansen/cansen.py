@@ -1,26 +1,104 @@
 # Standard libraries
+import os
 import sys
-from multiprocessing import Pool
-
-# Local imports
+import time
+import socket
+from multiprocessing import Pool, Array, Process
+
+# Local imports. Cantera, NumPy, and PyTables take a long time to
+# import, so the modules that need them are only imported by the
+# functions that run cases, and not for ``--help``, ``--version``, or
+# the mechanism cache options.
 from . import utils
+from . import affinity
+from . import distributed
+from . import scheduler
+from .cache import ResultCache, hash_file
 from .printer import Tee
-from .run_cases import SimulationCase, MultiSimulationCase
+from .exceptions import KeywordError
 from ._version import __version__
 
+# Filenames and command line options for the cases run by a worker
+# process, and the slot of the worker in the pool, set by `init_worker`.
+worker_filenames = None
+worker_options = None
+worker_slot = None
+
+
+def init_worker(filenames, options, placement=None):
+    """Initialize a worker process for multiprocessing of cases.
 
-def worker(sim_index_tup):
+    The mechanism is loaded once here, and reused by every case the
+    worker runs, so that only the keywords of each case have to be sent
+    to the worker.
+
+    :param filenames:
+        Dictionary of filenames related to the simulation.
+    :param options:
+        Dictionary of keywords set on the command line.
+    :param placement:
+        Optional dictionary with the maximum number of threads of the
+        worker (``'threads'``), the sets of CPUs the workers are pinned
+        to (``'cpu_sets'``), and the shared array of worker slots
+        (``'slots'``), used to pick a slot, and its set of CPUs, that no
+        other worker is using. Any of them may be ``None``.
+    """
+    global worker_filenames, worker_options, worker_slot
+    worker_filenames = filenames
+    worker_options = options
+    if placement is not None:
+        if placement.get('threads') is not None:
+            affinity.limit_threads(placement['threads'])
+        if placement.get('slots') is not None:
+            worker_slot = affinity.claim_slot(placement['slots'])
+            if placement.get('cpu_sets') is not None:
+                affinity.pin_process(placement['cpu_sets'][worker_slot])
+    from .run_cases import load_solution
+    load_solution(filenames['mech_filename'])
+
+
+def worker(keywords_index_tup):
     """Worker for multiprocessing of cases.
 
-    :param sim_index_tup:
-        Tuple containing the MultiSimulationCase object to be run and
-        the index of current case for status messages.
-    :return res:
-        List of simulation results.
+    :param keywords_index_tup:
+        Tuple containing the dictionary of keywords of the case to be
+        run and the index of current case for status messages.
+    :return index, res, stats:
+        Index of the case, list of simulation results, and dictionary
+        of the status, wall time, process ID, worker name (host and
+        process ID), slot of the worker in the pool (``None`` for a
+        remote worker), and number of solver steps of the case.
     """
 
-    sim, index = sim_index_tup
-    sim.run_simulation()
+    from .run_cases import MultiSimulationCase
+
+    keywords, index = keywords_index_tup
+    start = time.perf_counter()
+    # The time history is only saved if a directory for the case files
+    # is given.
+    filenames = worker_filenames.copy()
+    if filenames.get('case_save_dir') is not None:
+        filenames['save_filename'] = os.path.join(
+            filenames['case_save_dir'], utils.case_save_filename(index))
+    else:
+        filenames['save_filename'] = None
+    sim = MultiSimulationCase(filenames, worker_options, keywords)
+    # A case that fails is recorded with the ``'error'`` status instead
+    # of stopping the rest of the cases.
+    try:
+        sim.run_simulation()
+        status = sim.status
+    except Exception as err:
+        print('Case {} failed: {}'.format(index, err))
+        sim.ignition_time = None
+        status = 'error'
+    stats = {'status': status,
+             'wall_time': time.perf_counter() - start,
+             'pid': os.getpid(),
+             'worker': '{}:{}'.format(socket.gethostname(), os.getpid()),
+             'slot': worker_slot,
+             'n_steps': getattr(sim, 'n_steps', 0),
+             }
 
     # store results
     if sim.keywords.get('eqRatio') is None:
@@ -34,12 +112,63 @@ def worker(sim_index_tup):
                sim.keywords['temperature'],
                sim.keywords['eqRatio']]
 
-    print('Done with ' + str(index))
+    return index, res, stats
+
+
+def result_status(res):
+    """Return the status of a case that ran to the end time.
+
+    :param res:
+        List of simulation results, from `worker`.
+    """
+    return 'no-ignition' if res[0] is None else 'ignition'
 
-    return res
 
+def format_result(index, res, status):
+    """Format the results of one case as a line of the output file.
 
-def main(filenames, convert, multi, num_proc, version):
+    :param index:
+        Index of the case in the input file.
+    :param res:
+        List of simulation results, from `worker`.
+    :param status:
+        Status of the case, from `worker`.
+    :return line:
+        String with the case index followed by the results and the
+        status.
+    """
+    # If ignition was not found, write ``nan`` so that the line can
+    # still be read as numbers.
+    if res[0] is None:
+        res = [float('nan')] + res[1:]
+    if len(res) == 3:
+        line = '{:d} {:.8e} {:.2f} {:.1f}'.format(index, *res)
+    elif len(res) == 4:
+        line = '{:d} {:.8e} {:.2f} {:.1f} {:.2f}'.format(index, *res)
+    return line + ' ' + status
+
+
+def run_workers(address, num_proc=None):
+    """Run worker processes for a coordinator started with ``--serve``.
+
+    :param address:
+        Tuple of the host and port of the coordinator.
+    :param num_proc:
+        Number of worker processes to run. Optional, default: 1
+    """
+    if not num_proc or num_proc == 1:
+        distributed.run_worker(address)
+        return
+    processes = [Process(target=distributed.run_worker, args=(address,))
+                 for i in range(num_proc)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def main(filenames, convert, multi, num_proc, version, options=None,
+         multi_options=None):
     """The main driver function of CanSen.
 
     :param filenames:
@@ -53,7 +182,14 @@ def main(filenames, convert, multi, num_proc, version):
         Number of processors to use for multiprocessing.
     :param version:
         Version string of CanSen.
+    :param options:
+        Dictionary of keywords set on the command line, which override
+        the keywords in the input file.
+    :param multi_options:
+        Dictionary of options for running multiple cases.
     """
+    if multi_options is None:
+        multi_options = {}
 
     # Open the text output file from the printer module
     output_filename = filenames['output_filename']
@@ -68,66 +204,267 @@ def main(filenames, convert, multi, num_proc, version):
         print("This is CanSen, the SENKIN-like wrapper for Cantera, "
               "written in Python.\nVersion: {!s}\n".format(version))
 
+    # The thread limit is set through environment variables that are
+    # only read when the OpenMP and BLAS libraries are loaded, so it is
+    # set before Cantera and NumPy are imported, by the conversion of
+    # the mechanism or below, and before the workers are forked.
+    if multi and multi_options.get('threads') is not None:
+        affinity.limit_threads(multi_options['threads'])
+
     # Convert the mechanism if it is in CHEMKIN format. If ``convert``
     # is True, exit the simulation.
     mech_filename = filenames['mech_filename']
     thermo_filename = filenames['thermo_filename']
     if mech_filename.endswith('.inp'):
-        mech_filename = utils.convert_mech(mech_filename, thermo_filename)
+        # With ``--convert``, the converted mechanism is written next to
+        # the input; otherwise, the copy in the cache is used directly.
+        cti_filename = mech_filename[:-4] + '.cti' if convert else None
+        mech_filename = utils.convert_mech(mech_filename, thermo_filename,
+                                           cti_filename)
+        filenames['mech_filename'] = mech_filename
 
     if convert:
         print('User requested conversion only. Goodbye.')
         sys.exit(0)
 
+    import cantera as ct
+    from .writer import ResultWriter, open_result_writer, write_master_file
+    from .run_cases import SimulationCase
+
     # Run the simulation
     if multi:
-        # Preprocess the input file to separate the various cases.
-        input_files = utils.process_multi_input(filenames['input_filename'])
-
-        # Create a pool based on the number of processors
-        if num_proc is not None:
-            pool = Pool(processes=num_proc)
+        # Read the keywords of the various cases in the input file.
+        input_cases = utils.read_multi_cases(filenames['input_filename'])
+
+        # If requested, each worker saves the time history of each of
+        # its cases to a separate file in the ``save_dir``.
+        save_dir = multi_options.get('save_cases')
+        if save_dir is not None:
+            os.makedirs(save_dir, exist_ok=True)
+        filenames['case_save_dir'] = save_dir
+
+        # Limit the threads of each worker and pin the workers to CPUs,
+        # if requested, so that the workers do not compete for cores.
+        # Pool uses os.cpu_count() processes by default.
+        n_workers = num_proc or os.cpu_count() or 1
+        # Each worker takes a slot in the pool, which a worker that
+        # replaces a recycled one takes over, along with its CPUs.
+        placement = {'threads': multi_options.get('threads'),
+                     'cpu_sets': None,
+                     'slots': Array('i', n_workers),
+                     }
+        if multi_options.get('pin') is not None:
+            placement['cpu_sets'] = affinity.cpu_sets(
+                multi_options['pin'], n_workers, placement['threads'] or 1)
+
+        # Create a pool based on the number of processors. Each worker
+        # loads the mechanism once, when it starts. If requested, each
+        # worker is replaced after it has run ``max_tasks`` cases, to
+        # release any memory it has accumulated. When serving the cases
+        # to remote workers, no local pool is needed.
+        max_tasks = multi_options.get('max_tasks')
+        serve_address = multi_options.get('serve')
+        if serve_address is not None:
+            pool = None
+        elif num_proc is not None:
+            pool = Pool(processes=num_proc, initializer=init_worker,
+                        initargs=(filenames, options, placement),
+                        maxtasksperchild=max_tasks)
         else:
             # use available number of processors by default
-            pool = Pool()
-
-        jobs = []
-        results = []
-
-        # prepare all cases
-        for i, temp_file in enumerate(input_files):
-
-            local_names = filenames.copy()
-            local_names['input_filename'] = temp_file
-            sim = MultiSimulationCase(local_names)
-
-            jobs.append([sim, i])
-
-        jobs = tuple(jobs)
-        results = pool.map(worker, jobs)
-
-        # not adding more proceses
-        pool.close()
-
-        # ensure all finished
-        pool.join()
-
-        # clean up
-        utils.remove_files(input_files)
+            pool = Pool(initializer=init_worker,
+                        initargs=(filenames, options, placement),
+                        maxtasksperchild=max_tasks)
+
+        # Each case is identified by a hash of the mechanism, its
+        # keywords, and the versions of CanSen and Cantera. The limits
+        # on the cost of a case do not change its result, only whether
+        # it finishes, so they are left out.
+        mech_hash = hash_file(mech_filename)
+        versions = (version, ct.__version__)
+
+        # Results of cases that have been run before are read from the
+        # cache instead of being run again. When the time histories are
+        # saved, every case has to be run, but the results are still
+        # stored in the cache.
+        cache = None
+        if multi_options.get('cache', True):
+            cache = ResultCache(max_size=multi_options.get('cache_size',
+                                                           100.0))
+
+        # Every finished case is recorded in the journal as soon as it
+        # is finished. When resuming, the cases of the interrupted run
+        # that reached ignition or the end time are not run again.
+        journal_filename = multi_options.get('journal')
+        if journal_filename is None:
+            journal_filename = output_filename + '.journal'
+        journaled = {}
+        if multi_options.get('resume', False):
+            journaled = utils.read_journal(journal_filename)
+            journal = open(journal_filename, 'a')
+        else:
+            journal = open(journal_filename, 'w')
 
-        # write output
-        print('# Ignition delay [s], Pressure [atm], Temperature [K], '
-              'Equivalence ratio', file=out)
+        case_keys = {}
+        costs = {}
+        case_keywords = {}
 
-        for res in results:
-            if len(res) == 3:
-                line = '{:.8e} {:.2f} {:.1f}'.format(*res)
-            elif len(res) == 4:
-                line = '{:.8e} {:.2f} {:.1f} {:.2f}'.format(*res)
-            print(line, file=out)
+        jobs = []
+        known_results = []
+        n_cached = 0
+        n_cases = 0
+
+        # prepare all cases, expanding any swept keywords. Only the
+        # keywords are sent to the workers.
+        for keywords in input_cases:
+            for case in utils.expand_sweep(keywords):
+                index = n_cases
+                n_cases += 1
+                case_keywords[index] = case.copy()
+                case_keywords[index].update(options or {})
+                key_keywords = {k: v for k, v in case_keywords[index].items()
+                                if k not in ('maxWallTime', 'maxSteps')}
+                key = ResultCache.make_key(mech_hash, key_keywords, versions)
+                case_keys[index] = key
+                if key in journaled:
+                    res, stats = journaled[key]
+                    known_results.append((index, res, stats))
+                    continue
+                if cache is not None and save_dir is None:
+                    res = cache.get(key)
+                    if res is not None:
+                        stats = {'status': result_status(res)}
+                        known_results.append((index, res, stats))
+                        utils.write_journal(journal, index, key, res, stats)
+                        n_cached += 1
+                        continue
+                jobs.append([case, index])
+
+        # Start the most expensive cases first, so that a long case is
+        # not left running alone at the end. The costs are estimated
+        # from the runtimes of earlier cases with the same mechanism,
+        # if there are any in the cache.
+        history = None
+        if cache is not None:
+            history = scheduler.RuntimeHistory(cache.get_runtimes(mech_hash))
+        for case, index in jobs:
+            costs[index] = scheduler.estimate_cost(case_keywords[index],
+                                                   history)
+        jobs = scheduler.order_jobs(jobs, costs)
+
+        # Write each result to the output file as soon as its case is
+        # finished, in the order the cases finish.
+        # If requested, the results are also written to a table with
+        # a column for every swept keyword and statistic of the case.
+        results_writer = None
+        if multi_options.get('results') is not None:
+            results_writer = open_result_writer(multi_options['results'])
+        print('# Case, Ignition delay [s], Pressure [atm], '
+              'Temperature [K], Equivalence ratio, Status', file=out)
+        master_rows = []
+        for index, res, stats in known_results:
+            print(format_result(index, res, stats['status']), file=out)
+            if results_writer is not None:
+                results_writer.append(index, case_keywords[index], res[0],
+                                      stats)
+            master_rows.append(ResultWriter.make_row(
+                index, case_keywords[index], res[0], stats))
+        out.flush()
+        n_done = len(known_results)
+        if n_done > n_cached:
+            print('Found {} of {} cases in the journal'.format(
+                n_done - n_cached, n_cases))
+        if n_cached:
+            print('Found {} of {} cases in the cache'.format(n_cached,
+                                                             n_cases))
+
+        # Hand out the cases one at a time, so that the order above is
+        # kept and the workers stay evenly loaded.
+        busy_times = {}
+        start = time.perf_counter()
+        if serve_address is not None:
+            coordinator = distributed.Coordinator(
+                serve_address, jobs,
+                distributed.worker_setup(filenames, options, jobs))
+            print('Serving {} cases on port {}'.format(
+                len(jobs), coordinator.address[1]))
+            results = coordinator.results()
+        else:
+            results = pool.imap_unordered(worker, jobs, chunksize=1)
+        for index, res, stats in results:
+            n_done += 1
+            print(format_result(index, res, stats['status']), file=out)
+            out.flush()
+            utils.write_journal(journal, index, case_keys[index], res,
+                                {'status': stats['status'],
+                                 'n_steps': stats['n_steps'],
+                                 'wall_time': stats['wall_time']})
+            if results_writer is not None:
+                results_writer.append(index, case_keywords[index], res[0],
+                                      stats)
+            master_rows.append(ResultWriter.make_row(
+                index, case_keywords[index], res[0], stats))
+            # The busy time of a local worker is counted by its slot,
+            # so that a worker that was recycled and its replacement
+            # count as one. Remote workers are never recycled.
+            name = stats['worker']
+            if stats.get('slot') is not None:
+                name = stats['slot']
+            busy_times[name] = busy_times.get(name, 0.0) + stats['wall_time']
+            # Only the results and runtimes of cases that ran to ignition
+            # or the end time are kept, so that a case that was stopped
+            # early or failed is run again next time.
+            if (cache is not None and
+                    stats['status'] in ('ignition', 'no-ignition')):
+                cache.put_runtime(mech_hash, case_keywords[index],
+                                  stats['wall_time'])
+                cache.put(case_keys[index], res)
+            print('Done with case {} ({} of {} complete, {}, {:.2f} s, {} '
+                  'steps)'.format(index, n_done, n_cases, stats['status'],
+                                  stats['wall_time'], stats['n_steps']))
+        wall_time = time.perf_counter() - start
+        if serve_address is not None:
+            coordinator.close()
+            # Only the remote workers that ran a case are known.
+            n_workers = len(busy_times)
+        if jobs:
+            print(scheduler.load_balance(busy_times, wall_time, n_workers))
+
+        journal.close()
+        if results_writer is not None:
+            results_writer.close()
+        if cache is not None:
+            cache.close()
+
+        if pool is not None:
+            # not adding more proceses
+            pool.close()
+
+            # ensure all finished
+            pool.join()
+
+        # Index the saved time histories, including those of the cases
+        # finished before the run was resumed.
+        if save_dir is not None:
+            case_files = {}
+            for row in master_rows:
+                index = int(row['case'][0])
+                case_file = utils.case_save_filename(index)
+                if os.path.isfile(os.path.join(save_dir, case_file)):
+                    case_files[index] = case_file
+            write_master_file(os.path.join(save_dir, 'master.hdf'),
+                              master_rows, case_files)
+
+        # Restore the order of the cases in the input file.
+        if multi_options.get('sort', False):
+            out.close()
+            utils.sort_multi_output(output_filename)
 
     else:
-        sim = SimulationCase(filenames)
+        sim = SimulationCase(filenames, options)
+        if 'sweep' in sim.keywords:
+            raise KeywordError('Sweep keywords TRNG, PLST, and ELST require '
+                               'the --multi option.')
         sim.run_simulation()
 
     # Clean up
@@ -155,11 +492,107 @@ def cansen(argv):
      --convert:
         Convert the input mechanism to CTI format and quit. If
         ``--convert`` is specified, the SENKIN input file is optional.
+     --list-mech-cache:
+        List the converted mechanisms in the mechanism cache and quit.
+     --prune-mech-cache:
+        Remove the converted mechanisms that have not been used for the
+        given number of days from the mechanism cache and quit. If no
+        number is given, remove all of them.
      -m, --multi:
         Run multiple cases from the input file. Optional. If ``-m`` is
         used, must specify number of processors to be used (e.g.,
         ``-m 4``). If ``--multi`` is specified, CanSen uses the available
         number of processors by default.
+     --sort:
+        With ``--multi``, sort the results in the output file into the
+        order of the cases in the input file when all of the cases are
+        finished. Optional, by default the results are in the order the
+        cases finish.
+     --no-cache:
+        With ``--multi``, run every case instead of reading the results
+        of cases that have been run before from the result cache.
+     --cache-size:
+        Maximum size of the result cache in MB. The least recently used
+        results are removed when the cache is larger. Optional,
+        default: 100
+     --results:
+        With ``--multi``, also write the results to a table with one
+        row per case, in HDF5 (``.h5``, ``.hdf``, ``.hdf5``), CSV
+        (``.csv``), or NumPy (``.npz``) format, chosen by the file
+        extension. Optional.
+     --save-cases:
+        With ``--multi``, save the time history of each case to its own
+        binary save file in the given directory, and write a
+        ``master.hdf`` file there that links to all of them. Optional,
+        by default no time histories are saved.
+     --threads-per-worker:
+        With ``--multi``, the maximum number of threads each worker
+        process may use in OpenMP and BLAS libraries. Optional, by
+        default the libraries choose.
+     --pin:
+        With ``--multi``, pin each worker process to its own CPUs
+        (``core``) or spread the workers over the NUMA nodes (``numa``).
+        Only supported on Linux. Optional, by default the workers are
+        not pinned.
+     --max-tasks:
+        With ``--multi``, replace each worker process after it has run
+        this many cases, to bound its memory use. Optional, by default
+        the workers are kept for the whole run.
+     --serve:
+        Instead of running the cases of ``--multi`` on this machine,
+        hand them out to workers that connect to the given
+        ``[HOST:]PORT``. The host is ``localhost`` if it is left out;
+        use ``0.0.0.0`` to listen on every interface. Implies
+        ``--multi``.
+     --worker:
+        Run cases from the coordinator started with ``--serve`` at
+        ``HOST:PORT`` until there are none left. Use ``-m`` to start
+        more than one worker process. No other options are needed.
+     --journal:
+        With ``--multi``, the file where each case is recorded as soon
+        as it is finished. Optional, default: the output file name
+        followed by ``.journal``
+     --resume:
+        With ``--multi``, continue an interrupted run, running only the
+        cases that are not in the journal or that failed or were stopped.
+     --dense-output:
+        Interpolate the printed and saved values between solver steps,
+        so that the print and save intervals do not limit the solver
+        step size. Same as the ``DENS`` keyword.
+     --native-functions:
+        Evaluate the ``VPRO`` and ``TPRO`` profiles and the ``ICEN``
+        piston velocity with native Cantera functions instead of Python
+        callbacks, if the installed version of Cantera supports it.
+        Optional, by default Python callbacks are used.
+     --buffer-size:
+        Number of time steps to collect in memory before they are
+        written to the binary save file. Overrides the ``BUFS``
+        keyword. Optional, default: 100
+     --async-write:
+        Write the binary save file from a background thread, so that
+        writing overlaps with the integration. Optionally, specify the
+        maximum number of blocks of time steps waiting to be written
+        (e.g., ``--async-write 8``). Overrides the ``ASYNC`` keyword.
+        Optional, default queue size: 4
+     --complib:
+        Compression library for the binary save file, e.g., ``zlib``
+        or ``blosc:lz4``. Overrides the ``COMP`` keyword. Optional,
+        by default the file is not compressed.
+     --complevel:
+        Compression level for the binary save file, from 1 to 9. Only
+        used if a compression library is set. Optional, default: 5
+     --chunk-rows:
+        Number of time steps in each chunk of the binary save file.
+        Overrides the ``CHNK`` keyword. Optional, by default PyTables
+        chooses the chunk size.
+     --max-wall-time:
+        With ``--multi``, stop a case that runs longer than this many
+        seconds and go on to the next case. Overrides the ``WTIM``
+        keyword. Optional, by default there is no limit.
+     --max-steps:
+        With ``--multi``, stop a case that takes more than this many
+        solver steps and go on to the next case. Overrides the ``MXST``
+        keyword. Optional, by default there is no limit.
      -h, --help:
         Print this help message and quit.
     """
@@ -170,5 +603,14 @@ def cansen(argv):
     convert = ret[1]
     multi = ret[2]
     num_proc = ret[3]
+    options = ret[4]
+    multi_options = ret[5]
+
+    # A worker gets the cases and everything it needs to run them from
+    # the coordinator.
+    if multi_options.get('worker') is not None:
+        run_workers(multi_options['worker'], num_proc)
+        return
 
-    main(filenames, convert, multi, num_proc, __version__)
+    main(filenames, convert, multi, num_proc, __version__, options,
+         multi_options)
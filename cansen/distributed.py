@@ -0,0 +1,407 @@
+# Standard libraries
+import os
+import json
+import time
+import base64
+import queue
+import socket
+import threading
+import socketserver
+from collections import deque
+
+# Local imports
+from .cache import user_cache_dir, atomic_write
+
+# Workers send a heartbeat this often, in seconds, while they run a
+# case. A worker that has not been heard from for ``HEARTBEAT_TIMEOUT``
+# seconds is considered dead, and its case is given to another worker.
+HEARTBEAT_INTERVAL = 5.0
+HEARTBEAT_TIMEOUT = 30.0
+
+# Time a worker waits before asking again when every remaining case is
+# running on another worker.
+WAIT_TIME = 1.0
+
+# Keywords of the profile files that are sent to the workers with the
+# setup.
+PROFILE_KEYWORDS = ('vproFile', 'TproFile')
+
+
+def parse_address(address):
+    """Return the host and port of an address like ``host:port``.
+
+    :param address:
+        String with the port, optionally preceded by the host name and
+        a colon. If the host is left out, it is ``localhost``, so a
+        server only listens on every interface if it is asked to, with
+        a host of ``0.0.0.0``.
+    :return host, port:
+        Tuple of the host name and the integer port.
+    """
+    host, _, port = address.rpartition(':')
+    return host or 'localhost', int(port)
+
+
+def send_message(sock, message, lock=None):
+    """Send a message as one line of JSON.
+
+    :param sock:
+        The connected socket.
+    :param message:
+        Dictionary with the message. Must be serializable to JSON.
+    :param lock:
+        Optional lock held while sending, for sockets shared by
+        threads.
+    """
+    data = (json.dumps(message) + '\n').encode('utf-8')
+    if lock is None:
+        sock.sendall(data)
+    else:
+        with lock:
+            sock.sendall(data)
+
+
+def read_message(stream):
+    """Read one message sent by `send_message`.
+
+    :param stream:
+        Binary file object of the socket, from ``socket.makefile``.
+    :return message:
+        Dictionary with the message, or ``None`` if the connection was
+        closed.
+    """
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode('utf-8'))
+
+
+class CoordinatorHandler(socketserver.StreamRequestHandler):
+    """Handle the connection of one worker to the `Coordinator`."""
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker_id = coordinator.connect(self.request)
+        try:
+            while True:
+                try:
+                    message = read_message(self.rfile)
+                except (OSError, ValueError):
+                    break
+                if message is None:
+                    break
+                reply = coordinator.handle_message(worker_id, message)
+                if reply is not None:
+                    send_message(self.request, reply)
+        finally:
+            coordinator.disconnect(worker_id)
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Coordinator(object):
+    """
+    Hand out cases to workers over TCP and collect their results.
+
+    Workers started with ``cansen --worker host:port`` connect to the
+    coordinator, receive the mechanism and the command line options,
+    and then ask for one case at a time. Each message is a line of
+    JSON. A case is given to another worker if its worker disconnects
+    or stops sending heartbeats. If a case is finished twice, the
+    second result is ignored.
+    """
+
+    def __init__(self, address, jobs, setup):
+        """Start listening for workers.
+
+        :param address:
+            Tuple of the host and port to listen on, from
+            `parse_address`.
+        :param jobs:
+            Sequence of jobs, each a list of the keywords and the index
+            of the case, in the order they should be handed out.
+        :param setup:
+            Dictionary sent to each worker when it connects, from
+            `worker_setup`.
+        """
+        self.setup = setup
+        self.pending = deque(jobs)
+        self.n_jobs = len(self.pending)
+        self.running = {}
+        self.finished = set()
+        self.workers = {}
+        self.next_worker_id = 0
+        self.lock = threading.Lock()
+        self.results_queue = queue.Queue()
+
+        self.server = CoordinatorServer(address, CoordinatorHandler)
+        self.server.coordinator = self
+        self.address = self.server.server_address
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def connect(self, sock):
+        """Register a new worker connection and return its ID."""
+        with self.lock:
+            worker_id = self.next_worker_id
+            self.next_worker_id += 1
+            self.workers[worker_id] = {'socket': sock,
+                                       'last_seen': time.monotonic(),
+                                       'jobs': set(),
+                                       }
+        return worker_id
+
+    def disconnect(self, worker_id):
+        """Forget a worker and give its unfinished cases to others."""
+        with self.lock:
+            worker = self.workers.pop(worker_id, None)
+            if worker is not None:
+                self.requeue(worker['jobs'])
+
+    def requeue(self, indices):
+        """Put unfinished cases back at the front of the queue.
+
+        Must be called with the lock held.
+        """
+        for index in indices:
+            job = self.running.pop(index, None)
+            if job is not None and index not in self.finished:
+                self.pending.appendleft(job)
+
+    def handle_message(self, worker_id, message):
+        """Process a message from a worker and return the reply.
+
+        :param worker_id:
+            ID of the worker, from `connect`.
+        :param message:
+            Dictionary with the message.
+        :return reply:
+            Dictionary with the reply, or ``None`` if there is none.
+        """
+        with self.lock:
+            worker = self.workers.get(worker_id)
+            kind = message.get('type')
+            if kind == 'result':
+                # Keep the result even if the worker was given up on,
+                # unless another worker has finished the case already.
+                index = message['index']
+                self.running.pop(index, None)
+                if worker is not None:
+                    worker['jobs'].discard(index)
+                    worker['last_seen'] = time.monotonic()
+                if index not in self.finished:
+                    self.finished.add(index)
+                    self.results_queue.put((index, message['result'],
+                                            message['stats']))
+                return None
+            if worker is None:
+                return {'type': 'done'}
+            worker['last_seen'] = time.monotonic()
+            if kind == 'hello':
+                return dict(self.setup, type='setup')
+            elif kind == 'request':
+                if self.pending:
+                    job = self.pending.popleft()
+                    self.running[job[1]] = job
+                    worker['jobs'].add(job[1])
+                    return {'type': 'case', 'keywords': job[0],
+                            'index': job[1]}
+                elif len(self.finished) < self.n_jobs:
+                    return {'type': 'wait', 'delay': WAIT_TIME}
+                return {'type': 'done'}
+            return None
+
+    def check_heartbeats(self):
+        """Drop the workers that have not been heard from in time."""
+        now = time.monotonic()
+        with self.lock:
+            dead = [worker_id for worker_id, worker in self.workers.items()
+                    if now - worker['last_seen'] > HEARTBEAT_TIMEOUT]
+            for worker_id in dead:
+                worker = self.workers.pop(worker_id)
+                self.requeue(worker['jobs'])
+                # Wake up the handler thread of the worker, so that it
+                # ends.
+                try:
+                    worker['socket'].shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def results(self):
+        """Yield the results of the cases as the workers finish them.
+
+        :return results:
+            Iterator over tuples of the index, list of simulation
+            results, and dictionary of statistics of each case, like
+            the iterator of the results from `~cansen.cansen.worker`.
+        """
+        n_done = 0
+        while n_done < self.n_jobs:
+            try:
+                result = self.results_queue.get(timeout=1.0)
+            except queue.Empty:
+                self.check_heartbeats()
+                continue
+            n_done += 1
+            yield result
+            self.check_heartbeats()
+
+    def close(self):
+        """Stop listening for workers."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def worker_setup(filenames, options, jobs=()):
+    """Return the setup sent to each worker when it connects.
+
+    The mechanism and the profile files of the cases are sent with the
+    setup, so that the workers do not need access to the file system
+    of the coordinator.
+
+    :param filenames:
+        Dictionary of filenames related to the simulation. The
+        mechanism must be in Cantera CTI or CTML format.
+    :param options:
+        Dictionary of keywords set on the command line.
+    :param jobs:
+        Sequence of jobs handed out by the `Coordinator`. Optional,
+        only needed if the cases use profile files.
+    """
+    mech_filename = filenames['mech_filename']
+    with open(mech_filename) as mech_file:
+        mechanism = mech_file.read()
+    # Profile files may be binary, so they are sent base64 encoded.
+    profiles = {}
+    for keywords, index in jobs:
+        for keyword in PROFILE_KEYWORDS:
+            filename = keywords.get(keyword)
+            if filename is not None and filename not in profiles:
+                with open(filename, 'rb') as profile_file:
+                    profiles[filename] = base64.b64encode(
+                        profile_file.read()).decode('ascii')
+    return {'mech_name': os.path.basename(mech_filename),
+            'mechanism': mechanism,
+            'profiles': profiles,
+            'options': options,
+            }
+
+
+def write_mechanism(setup):
+    """Write the mechanism from the setup to the cache directory.
+
+    :param setup:
+        Dictionary from `worker_setup`.
+    :return mech_filename:
+        Name of the file with the mechanism. Files with the same
+        contents are only written once.
+    """
+    from hashlib import sha256
+    digest = sha256(setup['mechanism'].encode('utf-8')).hexdigest()
+    mech_dir = os.path.join(user_cache_dir(), 'mechanisms')
+    os.makedirs(mech_dir, exist_ok=True)
+    extension = os.path.splitext(setup['mech_name'])[1]
+    mech_filename = os.path.join(mech_dir, digest + extension)
+    if not os.path.isfile(mech_filename):
+        with atomic_write(mech_filename) as tmp_filename:
+            with open(tmp_filename, 'w') as mech_file:
+                mech_file.write(setup['mechanism'])
+    return mech_filename
+
+
+def write_profiles(setup):
+    """Write the profile files from the setup to the cache directory.
+
+    :param setup:
+        Dictionary from `worker_setup`.
+    :return profile_filenames:
+        Dictionary of the name of each profile file on the worker, by
+        its name on the coordinator. The files keep their extension,
+        which sets how they are read, and files with the same contents
+        are only written once. Since the contents are unchanged, the
+        hashes of the files in the keywords still match.
+    """
+    from hashlib import sha256
+    profile_filenames = {}
+    profiles = setup.get('profiles', {})
+    if not profiles:
+        return profile_filenames
+    profile_dir = os.path.join(user_cache_dir(), 'profiles')
+    os.makedirs(profile_dir, exist_ok=True)
+    for filename, encoded in profiles.items():
+        data = base64.b64decode(encoded)
+        extension = os.path.splitext(filename)[1]
+        local_filename = os.path.join(
+            profile_dir, sha256(data).hexdigest() + extension)
+        if not os.path.isfile(local_filename):
+            with atomic_write(local_filename) as tmp_filename:
+                with open(tmp_filename, 'wb') as profile_file:
+                    profile_file.write(data)
+        profile_filenames[filename] = local_filename
+    return profile_filenames
+
+
+def run_worker(address):
+    """Run cases from a coordinator until there are none left.
+
+    :param address:
+        Tuple of the host and port of the coordinator, from
+        `parse_address`.
+    """
+    from .cansen import init_worker, worker
+
+    sock = socket.create_connection(address)
+    stream = sock.makefile('rb')
+    send_lock = threading.Lock()
+    try:
+        send_message(sock, {'type': 'hello'}, send_lock)
+        setup = read_message(stream)
+        filenames = {'input_filename': None,
+                     'mech_filename': write_mechanism(setup),
+                     'save_filename': None,
+                     'thermo_filename': None,
+                     'case_save_dir': None,
+                     }
+        profile_filenames = write_profiles(setup)
+        init_worker(filenames, setup['options'])
+
+        # Send heartbeats from a separate thread, so that they keep
+        # coming while a long case runs.
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                try:
+                    send_message(sock, {'type': 'heartbeat'}, send_lock)
+                except OSError:
+                    return
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            while True:
+                send_message(sock, {'type': 'request'}, send_lock)
+                message = read_message(stream)
+                if message is None or message['type'] == 'done':
+                    break
+                elif message['type'] == 'wait':
+                    time.sleep(message['delay'])
+                    continue
+                keywords = message['keywords']
+                for keyword in PROFILE_KEYWORDS:
+                    if keyword in keywords:
+                        keywords[keyword] = profile_filenames[
+                            keywords[keyword]]
+                index, res, stats = worker((keywords, message['index']))
+                send_message(sock, {'type': 'result', 'index': index,
+                                    'result': res, 'stats': stats},
+                             send_lock)
+        finally:
+            stop.set()
+    finally:
+        stream.close()
+        sock.close()
@@ -1,8 +1,330 @@
 # Standard libraries
+import os
+from bisect import bisect_left, bisect_right
 
 # Third-party modules
 import numpy as np
 
+# Local imports
+from .cache import user_cache_dir, hash_file, atomic_write
+from .exceptions import CanSenError
+
+# Cache of the profiles that have been loaded from files in this
+# process, keyed by the filename. The profiles are memory-mapped, so
+# the processes running the cases of one run share the pages of the
+# file instead of each keeping a copy.
+_profiles = {}
+
+# Cache of the arrays and lists derived from the profiles loaded from
+# files in this process, keyed by the filename, the hash, and what was
+# derived, so that they are built once per process and shared by every
+# case instead of being copied for each case.
+_derived = {}
+
+
+def derived_tables(key, function, *args):
+    """Return ``function(*args)``, cached by ``key`` if it is given.
+
+    :param key:
+        Tuple identifying the result, or ``None`` for a profile that
+        is not read from a file, which is not cached.
+    :param function:
+        Function that builds the tables from ``args``.
+    """
+    if key is None:
+        return function(*args)
+    if key not in _derived:
+        _derived[key] = function(*args)
+    return _derived[key]
+
+
+def load_profile(filename, digest=None):
+    """Return the time and value columns of a profile file.
+
+    NumPy ``.npy`` files and raw binary files (``.bin``, of native
+    64-bit floats) are memory-mapped. Text files (``.csv``, or any
+    other extension, with whitespace separated columns) are parsed
+    once and stored as a ``.npy`` file in the cache directory, keyed by
+    their hash, which is then memory-mapped, so every process shares
+    the same parsed profile.
+
+    :param filename:
+        Name of the file, with two columns: the time and the value.
+    :param digest:
+        SHA-256 hex digest of the file, from the keywords. Optional,
+        only used for text files; computed if it is not given.
+    :return time, values:
+        Read-only arrays of the time and the value columns.
+    """
+    if filename not in _profiles:
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.npy':
+            data = np.load(filename, mmap_mode='r')
+        elif extension == '.bin':
+            data = np.memmap(filename, dtype=np.float64, mode='r')
+            if data.size % 2:
+                raise CanSenError('The profile file "{}" must have two '
+                                  'columns'.format(filename))
+            data = data.reshape(-1, 2)
+        else:
+            data = np.load(text_profile(filename, extension, digest),
+                           mmap_mode='r')
+        if data.ndim != 2 or data.shape[1] != 2 or data.shape[0] < 2:
+            raise CanSenError('The profile file "{}" must have two columns '
+                              'and at least two rows'.format(filename))
+        _profiles[filename] = (data[:, 0], data[:, 1])
+    return _profiles[filename]
+
+
+def text_profile(filename, extension, digest=None):
+    """Convert a text profile file to a ``.npy`` file in the cache.
+
+    :param filename:
+        Name of the text file.
+    :param extension:
+        Lower case extension of the file; ``.csv`` files are comma
+        separated.
+    :param digest:
+        SHA-256 hex digest of the file. Optional, computed if it is not
+        given.
+    :return npy_filename:
+        Name of the ``.npy`` file. Files with the same contents are
+        only converted once.
+    """
+    if digest is None:
+        digest = hash_file(filename)
+    profile_dir = os.path.join(user_cache_dir(), 'profiles')
+    os.makedirs(profile_dir, exist_ok=True)
+    npy_filename = os.path.join(profile_dir, digest + '.npy')
+    if not os.path.isfile(npy_filename):
+        delimiter = ',' if extension == '.csv' else None
+        data = np.loadtxt(filename, delimiter=delimiter, ndmin=2)
+        with atomic_write(npy_filename, '.npy') as tmp_filename:
+            np.save(tmp_filename, data)
+    return npy_filename
+
+
+def tabulated_function(time, values, method):
+    """Return a native Cantera function that interpolates a table.
+
+    A native function is evaluated by Cantera without calling back into
+    Python, which is much faster than wrapping a Python callable in a
+    :py:class:`~cantera.Func1`.
+
+    :param time:
+        Array of the time points, strictly increasing.
+    :param values:
+        Array of the values at the time points.
+    :param method:
+        ``'linear'`` for linear interpolation, or ``'previous'`` to use
+        the value of the last time point at or before the time.
+    :return function:
+        :py:class:`~cantera.TabulatedFunction` (``Tabulated1`` in
+        Cantera 3.0), or ``None`` if this version of Cantera does not
+        support tabulated functions with the method. Outside of the
+        table, the function returns the first or last value.
+    """
+    import cantera as ct
+    Tabulated = getattr(ct, 'TabulatedFunction',
+                        getattr(ct, 'Tabulated1', None))
+    if Tabulated is None:
+        return None
+    try:
+        return Tabulated(time, values, method=method)
+    except (TypeError, ValueError, ct.CanteraError):
+        return None
+
+
+def pchip_slopes(time, values):
+    """Return the slopes of the monotone cubic interpolant at the points.
+
+    The slopes are chosen by the method of Fritsch and Carlson, with the
+    same three-point formula at the ends as
+    ``scipy.interpolate.PchipInterpolator``, so that the interpolant
+    does not overshoot the data: it is monotonic wherever the data are.
+
+    :param time:
+        Array of the time points, strictly increasing.
+    :param values:
+        Array of the values at the time points.
+    :return slopes:
+        Array of the derivatives of the interpolant at the time points.
+    """
+    h = np.diff(time)
+    delta = np.diff(values)/h
+    if len(delta) == 1:
+        return np.array([delta[0], delta[0]])
+
+    slopes = np.zeros_like(values, dtype=float)
+    # At the interior points, the slope is a weighted harmonic mean of
+    # the slopes of the neighboring intervals, or zero at a local
+    # extremum.
+    w1 = 2*h[1:] + h[:-1]
+    w2 = h[1:] + 2*h[:-1]
+    same_sign = delta[:-1]*delta[1:] > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        harmonic = (w1 + w2)/(w1/delta[:-1] + w2/delta[1:])
+    slopes[1:-1] = np.where(same_sign, harmonic, 0.0)
+
+    def end_slope(h0, h1, delta0, delta1):
+        slope = ((2*h0 + h1)*delta0 - h0*delta1)/(h0 + h1)
+        if np.sign(slope) != np.sign(delta0):
+            return 0.0
+        elif np.sign(delta0) != np.sign(delta1) and abs(slope) > abs(3*delta0):
+            return 3*delta0
+        return slope
+
+    slopes[0] = end_slope(h[0], h[1], delta[0], delta[1])
+    slopes[-1] = end_slope(h[-1], h[-2], delta[-1], delta[-2])
+    return slopes
+
+
+def volume_tables(time, volume):
+    """Return the arrays and lists used to look up the volume profile.
+
+    :param time:
+        Array of the time points, sorted in increasing order.
+    :param volume:
+        Array of the volume at the time points.
+    :return volume, velocity, step_velocity, time_list:
+        The volume normalized by its first value, the velocity by the
+        forward difference, and the lists of the velocity of the first
+        of any repeated times and of the time points.
+    """
+    # The volume is normalized by the first volume element so that a
+    # unit area can be used to calculate the velocity.
+    volume = volume/volume[0]
+
+    # numpy.diff returns an array one element smaller than the input
+    # array, so we append a zero to match the length of the time
+    # array.
+    velocity = np.append(np.diff(volume)/np.diff(time), 0)
+
+    # If a time appears more than once, the velocity of its first point
+    # is used. The lookup is done on lists because indexing a list with
+    # a Python float is much faster than indexing a NumPy array in the
+    # callback.
+    first = np.searchsorted(time, time, side='left')
+    return volume, velocity, velocity[first].tolist(), time.tolist()
+
+
+def smooth_tables(time, volume, method, lam=None):
+    """Fit a smooth curve to the volume and return its tables.
+
+    :param time:
+        Array of the time points, strictly increasing.
+    :param volume:
+        Array of the normalized volume at the time points.
+    :param method:
+        ``'pchip'`` or ``'spline'``, see `VolumeProfile.smooth`.
+    :param lam:
+        Regularization parameter of the smoothing spline. Optional.
+    :return values, slopes:
+        Lists of the value and slope of the curve at the time points.
+    """
+    if np.any(np.diff(time) <= 0):
+        raise CanSenError('The times of a smoothed volume profile (VSMO) '
+                          'must be strictly increasing.')
+    if method == 'pchip':
+        values = volume
+        slopes = pchip_slopes(time, volume)
+    elif method == 'spline':
+        try:
+            from scipy.interpolate import make_smoothing_spline
+        except ImportError:
+            raise CanSenError('Smoothing the volume profile with VSMO '
+                              'SPLINE requires SciPy 1.10 or newer.')
+        # The knots of the smoothing spline are the time points, so its
+        # value and slope there define it exactly.
+        spline = make_smoothing_spline(time, volume, lam=lam)
+        values = spline(time)
+        slopes = spline.derivative()(time)
+    else:
+        raise CanSenError('Unknown smoothing method for the volume '
+                          'profile (VSMO): {}'.format(method))
+    return values.tolist(), slopes.tolist()
+
+
+def temperature_tables(time, temperature):
+    """Return the lists used to look up the temperature profile.
+
+    :param time:
+        Array of the time points, sorted in increasing order.
+    :param temperature:
+        Array of the temperature at the time points.
+    :return following, time_list, temp_list:
+        Lists of the index of the point after the first of any repeated
+        times, of the time points, and of the temperatures.
+    """
+    first = np.searchsorted(time, time, side='left')
+    return (first + 1).tolist(), time.tolist(), temperature.tolist()
+
+
+class IntervalSearch(object):
+    """
+    Find the interval of a sorted time array that contains a given
+    time. Each search starts from the interval found by the previous
+    search, since the integrator usually asks for times that are equal
+    to or just after the last one. If the time is not in that interval
+    or the next one, a binary search is used, so a lookup takes
+    constant time while the time advances and logarithmic time
+    otherwise.
+    """
+
+    def __init__(self, time):
+        """Store the time array.
+
+        :param time:
+            List of floats, sorted in increasing order.
+        """
+        self.time = time
+        self.last = len(time) - 1
+        self.hint = 0
+
+    def last_at_or_before(self, t):
+        """Return the index of the last time less than or equal to ``t``.
+
+        :param t:
+            Input float, current simulation time.
+        :return index:
+            Index into the time array, or -1 if ``t`` is before the
+            first time.
+        """
+        time = self.time
+        index = self.hint
+        while index < self.last and time[index] <= t:
+            if t < time[index + 1]:
+                self.hint = index
+                return index
+            if index > self.hint:
+                break
+            index += 1
+        index = bisect_right(time, t) - 1
+        self.hint = max(index, 0)
+        return index
+
+    def last_before(self, t):
+        """Return the index of the last time strictly less than ``t``.
+
+        :param t:
+            Input float, current simulation time.
+        :return index:
+            Index into the time array, or -1 if ``t`` is at or before
+            the first time.
+        """
+        time = self.time
+        index = self.hint
+        while index < self.last and time[index] < t:
+            if t <= time[index + 1]:
+                self.hint = index
+                return index
+            if index > self.hint:
+                break
+            index += 1
+        index = bisect_left(time, t) - 1
+        self.hint = max(index, 0)
+        return index
+
 
 class VolumeProfile(object):
     """
@@ -10,6 +332,7 @@ class VolumeProfile(object):
     profile. The initialization and calling of this class are handled
     by the :py:class:`~cantera.Func1`
     interface of Cantera. Used with the input keyword :ref:`VPRO <VPRO>`
+    or :ref:`VPRF <VPRF>`
     """
 
     def __init__(self, keywords):
@@ -27,18 +350,60 @@ class VolumeProfile(object):
         """
 
         # The time and volume are stored as lists in the keywords
-        # dictionary. The volume is normalized by the first volume
-        # element so that a unit area can be used to calculate the
-        # velocity.
-        self.time = np.array(keywords['vproTime'])
-        self.volume = np.array(keywords['vproVol'])/keywords['vproVol'][0]
-
-        # The velocity is calculated by the forward difference.
-        # numpy.diff returns an array one element smaller than the
-        # input array, so we append a zero to match the length of the
-        # self.time array.
-        self.velocity = np.diff(self.volume)/np.diff(self.time)
-        self.velocity = np.append(self.velocity, 0)
+        # dictionary, or memory-mapped from the file given by the VPRF
+        # keyword. The tables derived from a file are shared by every
+        # case run by this process.
+        if 'vproFile' in keywords:
+            self.key = (keywords['vproFile'], keywords.get('vproFileHash'))
+            self.time, volume = load_profile(*self.key)
+        else:
+            self.key = None
+            self.time = np.array(keywords['vproTime'])
+            volume = np.array(keywords['vproVol'])
+        (self.volume, self.velocity, self.step_velocity,
+         self.time_list) = derived_tables(
+            self.key and self.key + ('volume',), volume_tables,
+            self.time, volume)
+        self.search = IntervalSearch(self.time_list)
+
+        # With smoothing, the volume is a piecewise cubic curve given
+        # by its value and slope at each time point, and the velocity
+        # is its derivative, so it is continuous.
+        self.smoothing = keywords.get('vproSmoothing')
+        self.slopes = None
+        if self.smoothing is not None:
+            self.smooth(self.smoothing, keywords.get('vproSmoothingLam'))
+
+    def smooth(self, method, lam=None):
+        """Fit a smooth curve to the volume and use its derivative.
+
+        :param method:
+            ``'pchip'`` for the monotone cubic interpolant through the
+            points, or ``'spline'`` for a cubic smoothing spline, which
+            does not pass through the points and so also removes noise.
+            The smoothing spline requires SciPy 1.10 or newer.
+        :param lam:
+            Regularization parameter of the smoothing spline. Optional,
+            by default it is chosen by generalized cross-validation.
+        """
+        self.smooth_volume, self.slopes = derived_tables(
+            self.key and self.key + ('smooth', method, lam), smooth_tables,
+            self.time, self.volume, method, lam)
+
+    def native_function(self):
+        """Return the velocity as a native Cantera function, if possible.
+
+        The velocity is a step function of time, and is zero after the
+        last time point, as with `__call__`.
+
+        :return function:
+            Function from `tabulated_function`, or ``None`` if the
+            profile is smoothed, the time points are not strictly
+            increasing, or this version of Cantera does not support it.
+        """
+        if self.slopes is not None or np.any(np.diff(self.time) <= 0):
+            return None
+        return tabulated_function(self.time, self.velocity, 'previous')
 
     def __call__(self, t):
         """Return the velocity when called during a time step.
@@ -47,14 +412,21 @@ class VolumeProfile(object):
             Input float, current simulation time.
         """
 
-        if t < self.time[-1]:
-            # prev_time_point is the previous value in the time array
-            # after the current simulation time
-            prev_time_point = self.time[self.time <= t][-1]
-            # index is the index of the time array where
-            # prev_time_point occurs
-            index = np.where(self.time == prev_time_point)[0][0]
-            return self.velocity[index]
+        if t < self.time_list[-1]:
+            # index is the index of the last point in the time array
+            # at or before the current simulation time
+            index = max(self.search.last_at_or_before(t), 0)
+            if self.slopes is None:
+                return self.step_velocity[index]
+            # Derivative of the cubic Hermite polynomial on the
+            # interval, in terms of the fraction s of the interval.
+            tim0 = self.time_list[index]
+            h = self.time_list[index + 1] - tim0
+            s = max((t - tim0)/h, 0.0)
+            delta = (self.smooth_volume[index + 1] -
+                     self.smooth_volume[index])/h
+            return (6*s*(1 - s)*delta + (1 - s)*(1 - 3*s)*self.slopes[index] +
+                    s*(3*s - 2)*self.slopes[index + 1])
         else:
             return 0
 
@@ -65,19 +437,49 @@ class TemperatureProfile(object):
     temperature profile. The initialization and calling of this class
     are handled by the :py:class:`~cantera.Func1`
     interface of Cantera. Used with the input keyword :ref:`TPRO <TPRO>`
+    or :ref:`TPRF <TPRF>`
     """
 
     def __init__(self, keywords):
         """Set the initial values of the arrays from the input keywords.
 
         The time and temperature are read from the input file and
-        stored in the ``keywords`` dictionary as lists. This function
+        stored in the ``keywords`` dictionary as lists, or read from the
+        file given by the :ref:`TPRF <TPRF>` keyword. This function
         is only called once when the class is initialized at the
         beginning of a problem so it is efficient.
         """
 
-        self.time = np.array(keywords['TproTime'])
-        self.temperature = np.array(keywords['TproTemp'])
+        if 'TproFile' in keywords:
+            key = (keywords['TproFile'], keywords.get('TproFileHash'))
+            self.time, self.temperature = load_profile(*key)
+        else:
+            key = None
+            self.time = np.array(keywords['TproTime'])
+            self.temperature = np.array(keywords['TproTemp'])
+
+        # The lookup is done on lists, as in VolumeProfile, which are
+        # shared by every case run by this process for a file.
+        self.following, self.time_list, self.temp_list = derived_tables(
+            key and key + ('temperature',), temperature_tables,
+            self.time, self.temperature)
+        self.search = IntervalSearch(self.time_list)
+
+    def native_function(self):
+        """Return the temperature as a native Cantera function, if possible.
+
+        The temperature is interpolated linearly and is constant after
+        the last time point, as with `__call__`.
+
+        :return function:
+            Function from `tabulated_function`, or ``None`` if the
+            profile does not start at time zero, the time points are not
+            strictly increasing, or this version of Cantera does not
+            support it.
+        """
+        if self.time[0] != 0 or np.any(np.diff(self.time) <= 0):
+            return None
+        return tabulated_function(self.time, self.temperature, 'linear')
 
     def __call__(self, t):
         """Return the temperature when called during a time step.
@@ -90,21 +492,33 @@ class TemperatureProfile(object):
         """
 
         if t == 0:
-            return self.temperature[0]
-        if t < self.time[1]:
-            tim0 = self.time[0]
-            tim1 = self.time[1]
-            temp0 = self.temperature[0]
-            temp1 = self.temperature[1]
-        elif t >= self.time[1] and t <= self.time[-1]:
-            tim0 = self.time[self.time < t][-1]
-            tim1 = self.time[np.where(self.time == tim0)[0][0]+1]
-            temp0 = self.temperature[self.time < t][-1]
-            temp1 = self.temperature[np.where(self.time == tim0)[0][0]+1]
-        elif t > self.time[-1]:
-            return self.temperature[-1]
-
-        interp = temp0 + (temp1-temp0)*(t-tim0)/(tim1-tim0)
+            return self.temp_list[0]
+        time = self.time_list
+        temperature = self.temp_list
+        if t < time[1]:
+            tim0 = time[0]
+            tim1 = time[1]
+            temp0 = temperature[0]
+            temp1 = temperature[1]
+        elif t >= time[1] and t <= time[-1]:
+            # index is the index of the last point in the time array
+            # before the current simulation time; the interval ends at
+            # the point after the first point with the same time.
+            index = self.search.last_before(t)
+            following = self.following[index]
+            tim0 = time[index]
+            tim1 = time[following]
+            temp0 = temperature[index]
+            temp1 = temperature[following]
+        elif t > time[-1]:
+            return temperature[-1]
+
+        try:
+            interp = temp0 + (temp1-temp0)*(t-tim0)/(tim1-tim0)
+        except ZeroDivisionError:
+            # Repeated times give an infinite or undefined slope; let
+            # NumPy return inf or nan as it does for the arrays.
+            interp = temp0 + (temp1-temp0)*(t-tim0)/np.float64(tim1-tim0)
         return interp
 
 
@@ -131,6 +545,68 @@ class ICEngineProfile(object):
         self.omega = rev_per_minute*np.pi/30
         # Start angle, rad
         self.start_crank_rad = start_crank_angle/180.0*np.pi
+        # The native function is tabulated up to the end time.
+        self.end_time = keywords.get('endTime')
+
+    def velocity_table(self, end_time, rtol=1e-5, max_points=100000):
+        """Sample the velocity for linear interpolation.
+
+        The velocity is sampled at equally spaced times, with a whole
+        number of points per revolution, so the error of the linear
+        interpolation is the same in every revolution and is checked
+        against `__call__` at the middle of each interval of the first
+        one. The number of points per revolution is doubled until the
+        error is small enough.
+
+        :param end_time:
+            Last time of the table. The table goes a little past it,
+            in case the solver steps past the end time.
+        :param rtol:
+            Largest allowed error of the interpolation, relative to the
+            peak piston velocity.
+        :param max_points:
+            Largest number of points in the table.
+        :return time, velocity:
+            Arrays of the time points and the velocity at them, or
+            ``None`` if more than ``max_points`` points are needed.
+        """
+        period = 2*np.pi/self.omega
+        n_revolutions = end_time/period + 0.01
+        n_per_revolution = 64
+        while n_per_revolution*n_revolutions <= max_points:
+            step = period/n_per_revolution
+            time = np.arange(n_per_revolution + 1)*step
+            velocity = self(time)
+            midpoints = time[:-1] + step/2
+            error = np.abs((velocity[:-1] + velocity[1:])/2 -
+                           self(midpoints))
+            if np.max(error) <= rtol*np.max(np.abs(velocity)):
+                n_points = int(np.ceil(n_per_revolution*n_revolutions)) + 1
+                time = np.arange(n_points)*step
+                return time, self(time)
+            n_per_revolution *= 2
+        return None
+
+    def native_function(self):
+        """Return the velocity as a native Cantera function, if possible.
+
+        The velocity is interpolated linearly in a table from
+        `velocity_table`, so it differs from `__call__` by at most
+        ``1e-5`` of the peak piston velocity. Composing the velocity
+        from Cantera's sine and power functions would be exact, but
+        needs Cantera 3.0.
+
+        :return function:
+            Function from `tabulated_function`, or ``None`` if the end
+            time is not known, the table would be too long, or this
+            version of Cantera does not support it.
+        """
+        if self.end_time is None:
+            return None
+        table = self.velocity_table(self.end_time)
+        if table is None:
+            return None
+        return tabulated_function(table[0], table[1], 'linear')
 
     def __call__(self, time):
         """Return the velocity of the piston when called.
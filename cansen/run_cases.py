@@ -1,6 +1,8 @@
 # Standard libraries
 import math
+from time import perf_counter
 from itertools import zip_longest
+from contextlib import ExitStack
 
 # Third-party modules
 import cantera as ct
@@ -10,17 +12,171 @@ import tables
 # Local imports
 from .printer import divider
 from . import utils
+from .exceptions import CanSenError
+from .writer import (BufferedTableWriter,
+                     ThreadedTableWriter,
+                     AdaptiveSaveFilter)
 from .profiles import (VolumeProfile,
                        TemperatureProfile,
                        ICEngineProfile)
 
+def set_max_time_step(netw, max_time_step):
+    """Set the maximum time step of a reactor network.
+
+    Cantera 2.2 has the ``set_max_time_step`` method, which later
+    versions replaced with the ``max_time_step`` property.
+
+    :param netw:
+        The :py:class:`~cantera.ReactorNet`.
+    :param max_time_step:
+        Maximum time step, or zero for no limit.
+    """
+    if hasattr(netw, 'set_max_time_step'):
+        netw.set_max_time_step(max_time_step)
+    else:
+        netw.max_time_step = max_time_step
+
+
+# Cache of the ``Solution`` objects that have been loaded in this
+# process, keyed by the mechanism filename. Parsing a large mechanism
+# can take longer than running a case, so when many cases are run by
+# the same process, each mechanism is only loaded once.
+_solutions = {}
+
+
+def load_solution(mech_filename):
+    """Return the :py:class:`~cantera.Solution` for the mechanism.
+
+    The mechanism is loaded the first time it is requested in this
+    process; later calls return the same object. The state of the
+    object is set by each case, so the cases do not affect each other.
+
+    :param mech_filename:
+        Filename of the mechanism, in Cantera CTI or CTML format.
+    """
+    if mech_filename not in _solutions:
+        _solutions[mech_filename] = ct.Solution(mech_filename)
+    return _solutions[mech_filename]
+
+
+# Cache of the reactor networks that have been built in this process,
+# keyed by the mechanism filename, problem type, and whether the
+# sensitivity is calculated.
+_reactor_contexts = {}
+
+
+def reactor_context(mech_filename, problem_type, sensitivity):
+    """Return the `ReactorContext` for the mechanism and problem type.
+
+    The context is built the first time it is requested in this
+    process; later calls return the same object, which has to be reset
+    by each case with `ReactorContext.reset`.
+
+    :param mech_filename:
+        Filename of the mechanism, in Cantera CTI or CTML format.
+    :param problem_type:
+        Integer problem type from the input file.
+    :param sensitivity:
+        Boolean indicating that the sensitivity is calculated.
+    """
+    key = (mech_filename, problem_type, sensitivity)
+    if key not in _reactor_contexts:
+        _reactor_contexts[key] = ReactorContext(load_solution(mech_filename),
+                                                problem_type, sensitivity)
+    return _reactor_contexts[key]
+
+
+class ReactorContext(object):
+    """
+    The :py:class:`~cantera.Reactor`, the :py:class:`~cantera.Wall` and
+    :py:class:`~cantera.Reservoir` on the other side of it, and the
+    :py:class:`~cantera.ReactorNet` for one problem type. Building these
+    objects takes longer than resetting their state, so when many cases
+    are run in one process, the context is kept and reset by each case.
+    """
+
+    def __init__(self, gas, problem_type, sensitivity):
+        """Build the reactor network.
+
+        :param gas:
+            :py:class:`~cantera.Solution` with the mechanism. Its state
+            is the initial state of the reactor.
+        :param problem_type:
+            Integer problem type from the input file.
+        :param sensitivity:
+            Boolean indicating that the sensitivity of every reaction
+            is calculated.
+        """
+        # Create a non-interacting ``Reservoir`` to be on the other
+        # side of the ``Wall``.
+        env = ct.Reservoir(load_solution('air.xml'))
+        # All of the reactors are ``IdealGas`` Reactors. Set a ``Wall``
+        # for every case so that later code can be more generic. The
+        # velocity of the ``Wall`` is set by `reset`. We have to set
+        # the ``n_vars`` here because until the first time step,
+        # ``ReactorNet.n_vars`` is zero, but we need the ``n_vars``
+        # before the first time step.
+        energy = 'off' if problem_type in (4, 5, 7, 8) else 'on'
+        if problem_type in (2, 4, 7, 8):
+            self.reac = ct.IdealGasConstPressureReactor(gas, energy=energy)
+            # Number of solution variables is number of species + mass,
+            # temperature
+            self.n_vars = self.reac.kinetics.n_species + 2
+        else:
+            self.reac = ct.IdealGasReactor(gas, energy=energy)
+            # Number of solution variables is number of species + mass,
+            # volume, temperature
+            self.n_vars = self.reac.kinetics.n_species + 3
+        # In the engine, the piston compresses the reactor, so the
+        # ``Wall`` faces the other way.
+        if problem_type == 9:
+            self.wall = ct.Wall(env, self.reac, A=1.0, velocity=0)
+        else:
+            self.wall = ct.Wall(self.reac, env, A=1.0, velocity=0)
+
+        # Create the Reactor Network.
+        self.netw = ct.ReactorNet([self.reac])
+
+        if sensitivity:
+            # There is no automatic way to calculate the sensitivity of
+            # all of the reactions, so do it manually.
+            for i in range(self.reac.kinetics.n_reactions):
+                self.reac.add_sensitivity_reaction(i)
+
+    def reset(self, velocity, volume):
+        """Set the reactor network to the start of a new case.
+
+        The state of the reactor is taken from the current state of the
+        :py:class:`~cantera.Solution`, and the integration restarts from
+        time zero, and the maximum time step is removed, as in a new
+        network, so the results are the same as with a new network. The
+        tolerances are set again by each case, and the case sets the
+        maximum time step if it needs one.
+
+        :param velocity:
+            Velocity of the ``Wall``, either a number or a function of
+            time.
+        :param volume:
+            Initial volume of the reactor.
+        """
+        self.wall.set_velocity(velocity)
+        self.reac.volume = volume
+        self.reac.syncState()
+        # A maximum time step of zero means there is no limit.
+        set_max_time_step(self.netw, 0.0)
+        self.netw.set_initial_time(0.0)
+
 
 class SimulationCase(object):
     """
     Class that sets up and runs a simulation case.
     """
 
-    def __init__(self, filenames):
+    # Whether the reactor network is reused from the previous case run
+    # in this process; see `reactor_context`.
+    reuse_reactor = False
+
+    def __init__(self, filenames, options=None, keywords=None):
         """Initialize the simulation case.
 
         Read the SENKIN-format input file is read into the ``keywords``
@@ -29,13 +185,24 @@ class SimulationCase(object):
         :param filenames:
             Dictionary containing the relevant file names for this
             case.
+        :param options:
+            Optional dictionary of keywords set on the command line.
+            These override the values from the input file.
+        :param keywords:
+            Optional dictionary of keywords that have already been read.
+            If it is given, the input file is not read.
         """
         self.input_filename = filenames['input_filename']
         self.mech_filename = filenames['mech_filename']
         self.save_filename = filenames['save_filename']
         self.thermo_filename = filenames['thermo_filename']
 
-        self.keywords = utils.read_input_file(self.input_filename)
+        if keywords is not None:
+            self.keywords = keywords.copy()
+        else:
+            self.keywords = utils.read_input_file(self.input_filename)
+        if options is not None:
+            self.keywords.update(options)
 
     def setup_case(self):
         """
@@ -44,7 +211,7 @@ class SimulationCase(object):
         to the values from the input file.
         """
 
-        self.gas = ct.Solution(self.mech_filename)
+        self.gas = load_solution(self.mech_filename)
 
         initial_temp = self.keywords['temperature']
         # The initial pressure in Cantera is expected in Pa; in SENKIN
@@ -68,92 +235,56 @@ class SimulationCase(object):
 
         self.gas.TPX = initial_temp, initial_pres, reactants
 
-        # Create a non-interacting ``Reservoir`` to be on the other
-        # side of the ``Wall``.
-        env = ct.Reservoir(ct.Solution('air.xml'))
         # Set the ``temp_func`` to ``None`` as default; it will be set
-        # later if needed.
+        # later if needed. The problem types with a moving piston set
+        # the velocity of the ``Wall``; for the others, the velocity
+        # is zero and the ``Wall`` won't affect anything.
+        # With ``nativeFunctions``, the profiles and the engine
+        # velocity are converted to native Cantera functions when
+        # possible, so that the integrator does not call back into
+        # Python to evaluate them.
+        problem_type = self.keywords['problemType']
+        native = self.keywords.get('nativeFunctions', False)
         self.temp_func = None
-        # All of the reactors are ``IdealGas`` Reactors. Set a ``Wall``
-        # for every case so that later code can be more generic. If the
-        # velocity is set to zero, the ``Wall`` won't affect anything.
-        # We have to set the ``n_vars`` here because until the first
-        # time step, ``ReactorNet.n_vars`` is zero, but we need the
-        # ``n_vars`` before the first time step.
-        if self.keywords['problemType'] == 1:
-            self.reac = ct.IdealGasReactor(self.gas)
-            # Number of solution variables is number of species + mass,
-            # volume, temperature
-            self.n_vars = self.reac.kinetics.n_species + 3
-            self.wall = ct.Wall(self.reac, env, A=1.0, velocity=0)
-        elif self.keywords['problemType'] == 2:
-            self.reac = ct.IdealGasConstPressureReactor(self.gas)
-            # Number of solution variables is number of species + mass,
-            # temperature
-            self.n_vars = self.reac.kinetics.n_species + 2
-            self.wall = ct.Wall(self.reac, env, A=1.0, velocity=0)
-        elif self.keywords['problemType'] == 3:
-            self.reac = ct.IdealGasReactor(self.gas)
-            # Number of solution variables is number of species + mass,
-            # volume, temperature
-            self.n_vars = self.reac.kinetics.n_species + 3
-            self.wall = ct.Wall(self.reac, env, A=1.0,
-                                velocity=VolumeProfile(self.keywords))
-        elif self.keywords['problemType'] == 4:
-            self.reac = ct.IdealGasConstPressureReactor(self.gas, energy='off')
-            # Number of solution variables is number of species + mass,
-            # temperature
-            self.n_vars = self.reac.kinetics.n_species + 2
-            self.wall = ct.Wall(self.reac, env, A=1.0, velocity=0)
-        elif self.keywords['problemType'] == 5:
-            self.reac = ct.IdealGasReactor(self.gas, energy='off')
-            # Number of solution variables is number of species + mass,
-            # volume, temperature
-            self.n_vars = self.reac.kinetics.n_species + 3
-            self.wall = ct.Wall(self.reac, env, A=1.0, velocity=0)
-        elif self.keywords['problemType'] == 6:
+        velocity = 0
+        if problem_type == 3:
+            velocity = VolumeProfile(self.keywords)
+            if native:
+                velocity = velocity.native_function() or velocity
+        elif problem_type == 6:
             from user_routines import VolumeFunctionTime
-            self.reac = ct.IdealGasReactor(self.gas)
-            # Number of solution variables is number of species + mass,
-            # volume, temperature
-            self.n_vars = self.reac.kinetics.n_species + 3
-            self.wall = ct.Wall(self.reac, env, A=1.0,
-                                velocity=VolumeFunctionTime())
-        elif self.keywords['problemType'] == 7:
+            velocity = VolumeFunctionTime()
+        elif problem_type == 7:
             from user_routines import TemperatureFunctionTime
-            self.reac = ct.IdealGasConstPressureReactor(self.gas, energy='off')
-            # Number of solution variables is number of species + mass,
-            # temperature
-            self.n_vars = self.reac.kinetics.n_species + 2
-            self.wall = ct.Wall(self.reac, env, A=1.0, velocity=0)
             self.temp_func = ct.Func1(TemperatureFunctionTime())
-        elif self.keywords['problemType'] == 8:
-            self.reac = ct.IdealGasConstPressureReactor(self.gas, energy='off')
-            # Number of solution variables is number of species + mass,
-            # temperature
-            self.n_vars = self.reac.kinetics.n_species + 2
-            self.wall = ct.Wall(self.reac, env, A=1.0, velocity=0)
-            self.temp_func = ct.Func1(TemperatureProfile(self.keywords))
-        elif self.keywords['problemType'] == 9:
-            self.reac = ct.IdealGasReactor(self.gas)
-            # Number of solution variables is number of species + mass,
-            # volume, temperature
-            self.n_vars = self.reac.kinetics.n_species + 3
-            self.wall = ct.Wall(env, self.reac, A=1.0,
-                                velocity=ICEngineProfile(self.keywords))
-
-        if 'reactorVolume' in self.keywords:
-            self.reac.volume = self.keywords['reactorVolume']
+        elif problem_type == 8:
+            profile = TemperatureProfile(self.keywords)
+            if native:
+                self.temp_func = profile.native_function()
+            if self.temp_func is None:
+                self.temp_func = ct.Func1(profile)
+        elif problem_type == 9:
+            velocity = ICEngineProfile(self.keywords)
+            if native:
+                velocity = velocity.native_function() or velocity
 
-        # Create the Reactor Network.
-        self.netw = ct.ReactorNet([self.reac])
+        # Build the reactor network, or reuse the one from the previous
+        # case with the same mechanism and problem type in this
+        # process, and set it to the initial state of this case.
+        self.sensitivity = 'sensitivity' in self.keywords
+        if self.reuse_reactor:
+            context = reactor_context(self.mech_filename, problem_type,
+                                      self.sensitivity)
+        else:
+            context = ReactorContext(self.gas, problem_type,
+                                     self.sensitivity)
+        context.reset(velocity, self.keywords.get('reactorVolume', 1.0))
+        self.reac = context.reac
+        self.wall = context.wall
+        self.netw = context.netw
+        self.n_vars = context.n_vars
 
-        if 'sensitivity' in self.keywords:
-            self.sensitivity = True
-            # There is no automatic way to calculate the sensitivity of
-            # all of the reactions, so do it manually.
-            for i in range(self.reac.kinetics.n_reactions):
-                self.reac.add_sensitivity_reaction(i)
+        if self.sensitivity:
             # If no tolerances for the sensitivity are specified, set
             # to the SENKIN defaults.
             if 'sensAbsTol' in self.keywords:
@@ -164,8 +295,6 @@ class SimulationCase(object):
                 self.netw.rtol_sensitivity = self.keywords['sensRelTol']
             else:
                 self.netw.rtol_sensitivity = 1.0E-04
-        else:
-            self.sensitivity = False
 
         # If no solution tolerances are specified, set to the default
         # SENKIN values.
@@ -203,10 +332,22 @@ class SimulationCase(object):
                      if value is not None
                      ]
 
-        if time_ints:
-            self.netw.set_max_time_step(min(time_ints))
+        # With dense output, the printed and saved values are
+        # interpolated between the solver steps, so the step size is
+        # only limited if the user asks for it.
+        self.dense_output = self.keywords.get('denseOutput', False)
+        if self.dense_output:
+            if not hasattr(self.netw, 'get_derivative'):
+                raise CanSenError('Dense output (DENS) requires Cantera 2.5 '
+                                  'or newer.')
+            if max_time_int is not None:
+                set_max_time_step(self.netw, max_time_int)
+            else:
+                set_max_time_step(self.netw, 0.0)
+        elif time_ints:
+            set_max_time_step(self.netw, min(time_ints))
         else:
-            self.netw.set_max_time_step(self.tend/100)
+            set_max_time_step(self.netw, self.tend/100)
 
         if print_time_int is not None:
             self.print_time_step = print_time_int
@@ -220,12 +361,30 @@ class SimulationCase(object):
         if self.save_time_step is not None:
             self.save_time = self.save_time_step
 
+        # If a tolerance for saving is set, time steps are only saved
+        # when the state has changed enough. The ``save_time_step``
+        # then sets the maximum time between saved time steps.
+        if 'saveRelTol' in self.keywords:
+            self.save_filter = AdaptiveSaveFilter(
+                self.keywords['saveRelTol'],
+                self.keywords.get('saveAbsTol', 1.0E-08),
+                max_interval=self.save_time_step,
+                )
+            if 'saveSpecies' in self.keywords:
+                self.save_species = [self.gas.species_index(species) for
+                                     species in self.keywords['saveSpecies']]
+            else:
+                self.save_species = slice(None)
+        else:
+            self.save_filter = None
+
         # Store the species names in a slightly shorter variable name
         self.species_names = self.reac.thermo.species_names
 
         # Initialize the ignition time, in case the end time is reached
         # before ignition occurs
         self.ignition_time = None
+        self.ignition_bracket = None
 
     def run_case(self):
         """
@@ -233,6 +392,155 @@ class SimulationCase(object):
         output file format, then runs the simulation by using
         :py:`~cantera.ReactorNet.step`.
         """
+        with tables.open_file(self.save_filename, mode='w',
+                              title='CanSen Save File') as save_file:
+            timestep = self.open_save_writer(self.create_save_table(save_file))
+            # Any rows remaining in the buffer are written and the file
+            # is flushed when the ``with`` block exits.
+            with timestep:
+                self.save_initial_state(timestep)
+                # Set an array with values from before the first time step
+                # in case we have to interpolate after the first time step
+                prev_time = np.hstack((self.netw.time, self.reac.thermo.T,
+                                       self.reac.thermo.P, self.reac.volume,
+                                       self.wall.vdot(self.netw.time),
+                                       self.reac.thermo.X
+                                       ))
+                # The solver derivatives are not available until the
+                # first step has been taken.
+                if self.dense_output:
+                    self.cur_dense = self.dense_point(derivative=False)
+                # Print the initial information to the screen
+                print(divider)
+                print('Kinetic Mechanism Details:\n')
+                print(('Total Gas Phase Species     = {0}\n'
+                       'Total Gas Phase Reactions   = {1}'
+                       ).format(self.reac.kinetics.n_species,
+                                self.reac.kinetics.n_reactions))
+                if self.sensitivity:
+                    print(('Total Sensitivity Reactions = {}'
+                           ).format(self.netw.n_sensitivity_params))
+                print(divider, '\n')
+
+                self.reactor_state_printer(prev_time)
+
+                ignition_found = False
+                self.n_steps = 0
+                prev_temp_deriv = None
+
+                # Main loop to run the calculation. As long as the time in
+                # the ``ReactorNet`` is less than the end time, keep going.
+                while self.netw.time < self.tend:
+                    # If we are using a function to set the temperature as
+                    # a function of time, use it here.
+                    if self.temp_func is not None:
+                        self.gas.TP = self.temp_func(self.netw.time), None
+
+                    # Take the step towards the end time.
+                    self.netw.step()
+                    self.n_steps += 1
+                    cur_temp_deriv = self.temperature_derivative()
+                    if self.dense_output:
+                        self.prev_dense = self.cur_dense
+                        self.cur_dense = self.dense_point()
+
+                    # Set an array with the information from the current
+                    # time step for printing.
+                    cur_time = np.hstack((self.netw.time, self.reac.thermo.T,
+                                          self.reac.thermo.P, self.reac.volume,
+                                          self.wall.vdot(self.netw.time),
+                                          self.reac.thermo.X
+                                          ))
+
+                    # If we have passed the end time, interpolate backwards
+                    # to get the solution at the end time. Because linear
+                    # interpolation is used, this will not work well if the
+                    # end time is during or before the ignition event and
+                    # we have stepped past it. This is unlikely though, as
+                    # the solver should be taking relatively small time
+                    # steps near ignition.
+                    if self.netw.time > self.tend:
+                        if (self.dense_output and self.save_filter is None and
+                                self.save_time_step is not None):
+                            self.save_dense_rows(timestep, self.tend)
+                        interp_state = self.interpolate_state(self.tend,
+                                                              prev_time,
+                                                              cur_time)
+                        self.reactor_state_printer(interp_state, end=True)
+                        timestep['time'] = self.tend
+                        timestep['temperature'] = interp_state[1]
+                        timestep['pressure'] = interp_state[2]
+                        # Mass fractions are saved, so convert the mole
+                        # fractions in ``interp_state`` to mass fractions.
+                        timestep['massfractions'] = \
+                            (interp_state[5:] *
+                             self.reac.thermo.molecular_weights /
+                             self.reac.thermo.mean_molecular_weight)
+
+                        timestep['volume'] = interp_state[3]
+                        if self.sensitivity:
+                            # Add sensitivity interpolation here by reading
+                            # the last saved row from the buffer.
+                            prev_sens = timestep.last_row['sensitivity']
+                            cur_sens = self.netw.sensitivities()
+                            prev_time = timestep.last_row['time']
+                            cur_time = self.netw.time
+                            interp_sens = prev_sens + ((self.tend - prev_time) *
+                                                       (cur_sens - prev_sens) /
+                                                       (cur_time - prev_time))
+                            timestep['sensitivity'] = interp_sens
+                        # We don't need any of the rest of this step, so
+                        # break
+                        break
+
+                    self.save_step(timestep)
+
+                    # Print Reactor state information to the screen for
+                    # monitoring. With dense output, one step can pass
+                    # several print times.
+                    if self.dense_output:
+                        while self.netw.time >= self.print_time:
+                            interp_state = self.interpolate_state(
+                                self.print_time, prev_time, cur_time)
+                            self.reactor_state_printer(interp_state)
+                            self.print_time += self.print_time_step
+                    elif self.netw.time > self.print_time:
+                        interp_state = utils.reactor_interpolate(self.print_time,
+                                                                 prev_time,
+                                                                 cur_time)
+                        self.reactor_state_printer(interp_state)
+                        self.print_time += self.print_time_step
+                    elif self.netw.time == self.print_time:
+                        self.reactor_state_printer(cur_time)
+                        self.print_time += self.print_time_step
+
+                    # If the temperature limit has been exceeded, we have
+                    # ignition! Find the time the limit was crossed
+                    # between the previous and current steps.
+                    if self.reac.T >= self.temp_limit and ignition_found is False:
+                        self.locate_ignition(prev_time[0], prev_time[1],
+                                             prev_temp_deriv, cur_time[0],
+                                             cur_time[1], cur_temp_deriv)
+                        ignition_found = True
+                        if self.keywords.get('break_on_ignition', False):
+                            self.reactor_state_printer(cur_time, end=False)
+                            break
+
+                    # Set the ``prev_time`` array equal to the ``cur_time``
+                    # array so we can go to the next time step.
+                    prev_time = cur_time
+                    prev_temp_deriv = cur_temp_deriv
+
+                self.finish_saving(timestep)
+
+    def create_save_table(self, save_file):
+        """Create the ``reactor`` table in the binary save file.
+
+        :param save_file:
+            The open :py:class:`tables.File`.
+        :return table:
+            The new :py:class:`tables.Table`.
+        """
         # Use the table format of hdf instead of the array format. This
         # way, each variable can be saved in its own column and
         # referenced individually when read. Solution to the
@@ -253,161 +561,310 @@ class SimulationCase(object):
                 shape=(self.n_vars, self.netw.n_sensitivity_params), pos=5
                 )
 
-        with tables.open_file(self.save_filename, mode='w',
-                              title='CanSen Save File') as save_file:
-            table = save_file.create_table(save_file.root, 'reactor',
-                                           table_def, 'Reactor State'
-                                           )
-            # Create a row instance to save information to.
-            timestep = table.row
-            # Save information before the first time step.
-            timestep['time'] = self.netw.time
-            (timestep['temperature'], timestep['pressure'],
-                timestep['massfractions']) = self.reac.thermo.TPY
-            timestep['volume'] = self.reac.volume
-            if self.sensitivity:
-                timestep['sensitivity'] = np.zeros((
-                    self.n_vars,
-                    self.netw.n_sensitivity_params
-                    ))
-            # Add the ``timestep`` to the ``table`` and write it to
-            # disk.
-            timestep.append()
-            table.flush()
-            # Set an array with values from before the first time step
-            # in case we have to interpolate after the first time step
-            prev_time = np.hstack((self.netw.time, self.reac.thermo.T,
-                                   self.reac.thermo.P, self.reac.volume,
-                                   self.wall.vdot(self.netw.time),
-                                   self.reac.thermo.X
-                                   ))
-            # Print the initial information to the screen
-            print(divider)
-            print('Kinetic Mechanism Details:\n')
-            print(('Total Gas Phase Species     = {0}\n'
-                   'Total Gas Phase Reactions   = {1}'
-                   ).format(self.reac.kinetics.n_species,
-                            self.reac.kinetics.n_reactions))
+        # By default, the table is not compressed and PyTables chooses
+        # the chunk shape. If a compression library is given, the
+        # shuffle filter is used as well, since it improves the
+        # compression of floating point data.
+        complib = self.keywords.get('complib')
+        if complib is not None:
+            filters = tables.Filters(complevel=self.keywords.get('complevel', 5),
+                                     complib=complib, shuffle=True)
+        else:
+            filters = None
+        if self.keywords.get('chunkRows') is not None:
+            chunkshape = (self.keywords['chunkRows'],)
+        else:
+            chunkshape = None
+
+        table = save_file.create_table(save_file.root, 'reactor',
+                                       table_def, 'Reactor State',
+                                       filters=filters,
+                                       chunkshape=chunkshape,
+                                       )
+        # Record the layout of the table so that it is known when the
+        # file is read later.
+        table.attrs.complib = table.filters.complib or 'none'
+        table.attrs.complevel = table.filters.complevel
+        table.attrs.shuffle = table.filters.shuffle
+        table.attrs.chunkshape = np.array(table.chunkshape, dtype=np.int64)
+        return table
+
+    def open_save_writer(self, table):
+        """Return the writer used to save the time steps to the table.
+
+        Rows are collected in a buffer in memory and written to the
+        ``table`` in blocks, instead of flushing the file on every time
+        step. If requested, the blocks are written by a background
+        thread so that the disk I/O overlaps with the integration. The
+        writer is used like a ``tables.Row`` instance.
+
+        :param table:
+            The ``reactor`` table, from `create_save_table`.
+        """
+        buffer_size = self.keywords.get('bufferSize', 100)
+        buffer_time = self.keywords.get('bufferTime')
+        if self.keywords.get('asyncQueueSize') is not None:
+            return ThreadedTableWriter(
+                table, buffer_size, buffer_time,
+                queue_size=self.keywords['asyncQueueSize'],
+                )
+        return BufferedTableWriter(table, buffer_size, buffer_time)
+
+    def save_initial_state(self, timestep):
+        """Save the state before the first time step.
+
+        :param timestep:
+            The writer for the ``reactor`` table.
+        """
+        timestep['time'] = self.netw.time
+        (timestep['temperature'], timestep['pressure'],
+            timestep['massfractions']) = self.reac.thermo.TPY
+        timestep['volume'] = self.reac.volume
+        if self.sensitivity:
+            timestep['sensitivity'] = np.zeros((
+                self.n_vars,
+                self.netw.n_sensitivity_params
+                ))
+        # Add the ``timestep`` to the ``table`` and write it to disk,
+        # so that the initial state is saved even if the integration
+        # fails.
+        timestep.append()
+        timestep.checkpoint()
+        if self.save_filter is not None:
+            self.save_filter.start(self.save_state())
+
+    def save_step(self, timestep):
+        """Save the current time step, if it should be saved.
+
+        If the ``save_filter`` is set, save the time steps where the
+        state has changed by more than the tolerance. Otherwise, if the
+        ``save_time_step`` is set, save at the nearest step to the given
+        interval. To avoid any errors, the values written to the binary
+        save file will not be interpolated, but saved at the solver time
+        step instead. If neither is set, save every time step to the
+        binary file.
+
+        :param timestep:
+            The writer for the ``reactor`` table.
+        """
+        if self.save_filter is not None:
+            for row in self.save_filter.update(self.save_state(),
+                                               self.reactor_row()):
+                self.save_row(timestep, row)
+        elif self.save_time_step is not None:
+            # With dense output, save at exactly the requested times
+            # instead.
+            if self.dense_output:
+                self.save_dense_rows(timestep, self.netw.time)
+            elif self.netw.time > self.save_time:
+                self.save_row(timestep, self.reactor_row())
+                self.save_time += self.save_time_step
+        else:
+            self.save_row(timestep, self.reactor_row())
+
+    def finish_saving(self, timestep):
+        """Save the last time step held back by the ``save_filter``.
+
+        :param timestep:
+            The writer for the ``reactor`` table.
+        """
+        if self.save_filter is not None:
+            for row in self.save_filter.finish():
+                self.save_row(timestep, row)
+
+    def temperature_derivative(self):
+        """Return the time derivative of the temperature from the solver.
+
+        :return deriv:
+            The derivative at the current step, or ``None`` if the
+            installed version of Cantera cannot provide it.
+        """
+        if not hasattr(self.netw, 'get_derivative'):
+            return None
+        # The temperature comes right before the mass fractions in the
+        # solver's state vector.
+        index = self.n_vars - self.reac.kinetics.n_species - 1
+        return self.netw.get_derivative(1)[index]
+
+    def locate_ignition(self, time1, temp1, deriv1, time2, temp2, deriv2):
+        """Find the time where the temperature crossed the limit.
+
+        The temperature is interpolated between the two steps that
+        bracket the crossing, and the crossing time of the interpolant
+        is stored in ``ignition_time``. The bracketing steps are stored
+        in ``ignition_bracket``.
+
+        :param time1:
+            Time of the step before the crossing.
+        :param temp1:
+            Temperature at the step before the crossing.
+        :param deriv1:
+            Time derivative of the temperature at the step before the
+            crossing, or ``None`` if it is not known.
+        :param time2:
+            Time of the step after the crossing.
+        :param temp2:
+            Temperature at the step after the crossing.
+        :param deriv2:
+            Time derivative of the temperature at the step after the
+            crossing, or ``None`` if it is not known.
+        """
+        self.ignition_bracket = (time1, time2)
+        self.ignition_time = utils.find_crossing(
+            self.temp_limit, time1, temp1, time2, temp2, deriv1, deriv2,
+            tol=self.keywords.get('ignitionTol'),
+            )
+
+    def reactor_row(self):
+        """Return the current reactor state as a row of the save file.
+
+        :return row:
+            Dictionary with the values of the columns of the ``reactor``
+            table at the current time step.
+        """
+        row = {'time': self.netw.time, 'volume': self.reac.volume}
+        (row['temperature'], row['pressure'],
+            row['massfractions']) = self.reac.thermo.TPY
+        if self.sensitivity:
+            row['sensitivity'] = self.netw.sensitivities()
+        return row
+
+    def save_state(self):
+        """Return the state vector compared by the ``save_filter``.
+
+        :return state:
+            Array of the time, temperature, pressure, and mass fractions
+            of the tracked species at the current time step.
+        """
+        return np.hstack((self.netw.time, self.reac.thermo.T,
+                          self.reac.thermo.P,
+                          self.reac.thermo.Y[self.save_species]))
+
+    def dense_point(self, derivative=True):
+        """Return the solution and its derivative at the current time.
+
+        The solution vector is built from the reactor state in the same
+        order as the solver's state vector: the mass, the volume (for
+        constant volume reactors), the temperature, and the mass
+        fractions.
+
+        :param derivative:
+            If ``False``, the derivative is not computed and ``None`` is
+            returned in its place. Used before the first step, when the
+            solver derivatives are not available yet.
+        :return point:
+            Tuple of the time, the solution vector, its time derivative,
+            and the sensitivities, or ``None`` if they are not computed.
+        """
+        if self.n_vars - self.reac.kinetics.n_species == 3:
+            state = np.hstack((self.reac.mass, self.reac.volume,
+                               self.reac.thermo.T, self.reac.thermo.Y))
+        else:
+            state = np.hstack((self.reac.mass, self.reac.thermo.T,
+                               self.reac.thermo.Y))
+        if derivative:
+            deriv = np.asarray(self.netw.get_derivative(1))[:self.n_vars]
+        else:
+            deriv = None
+        if self.sensitivity and derivative:
+            sens = self.netw.sensitivities()
+        else:
+            sens = None
+        return self.netw.time, state, deriv, sens
+
+    def interpolate_state(self, interp_time, prev_state, cur_state):
+        """Interpolate the reactor state to the given time.
+
+        With dense output, the solver's state vector is interpolated
+        with cubic Hermite interpolation between the last two steps.
+        Otherwise, the printed reactor states are interpolated linearly.
+
+        :param interp_time:
+            Time at which the interpolated values should be calculated.
+        :param prev_state:
+            Array of the printed state information at the previous step.
+        :param cur_state:
+            Array of the printed state information at the current step.
+        :return interp_state:
+            Array of the printed state information at ``interp_time``.
+        """
+        if not self.dense_output:
+            return utils.reactor_interpolate(interp_time, prev_state,
+                                             cur_state)
+
+        temperature, pressure, volume, mass_fracs = self.dense_values(
+            interp_time)
+        mole_fracs = (mass_fracs/self.reac.thermo.molecular_weights /
+                      np.sum(mass_fracs/self.reac.thermo.molecular_weights))
+        return np.hstack((interp_time, temperature, pressure, volume,
+                          self.wall.vdot(interp_time), mole_fracs))
+
+    def dense_values(self, interp_time):
+        """Interpolate the solver's state vector to the given time.
+
+        :param interp_time:
+            Time between the last two solver steps.
+        :return values:
+            Tuple of the temperature, pressure, volume, and mass
+            fractions at ``interp_time``.
+        """
+        time1, state1, deriv1 = self.prev_dense[:3]
+        time2, state2, deriv2 = self.cur_dense[:3]
+        if deriv1 is None:
+            # Before the first step, use the slope of the quadratic
+            # through both states with the derivative at the end.
+            deriv1 = 2*(state2 - state1)/(time2 - time1) - deriv2
+        state = utils.hermite_interpolate(interp_time, time1, state1, deriv1,
+                                          time2, state2, deriv2)
+
+        n_species = self.reac.kinetics.n_species
+        mass_fracs = state[-n_species:]
+        mean_mw = 1/np.sum(mass_fracs/self.reac.thermo.molecular_weights)
+        mass = state[0]
+        if self.n_vars - n_species == 3:
+            volume = state[1]
+            temperature = state[2]
+            pressure = mass/volume*ct.gas_constant*temperature/mean_mw
+        else:
+            temperature = state[1]
+            pressure = self.reac.thermo.P
+            volume = mass*ct.gas_constant*temperature/(mean_mw*pressure)
+        return temperature, pressure, volume, mass_fracs
+
+    def save_dense_rows(self, timestep, end_time):
+        """Save the interpolated state at each save time up to end_time.
+
+        :param timestep:
+            The writer for the ``reactor`` table.
+        :param end_time:
+            Save times up to and including this time are saved.
+        """
+        while self.save_time <= end_time:
+            row = {'time': self.save_time}
+            (row['temperature'], row['pressure'], row['volume'],
+                row['massfractions']) = self.dense_values(self.save_time)
             if self.sensitivity:
-                print(('Total Sensitivity Reactions = {}'
-                       ).format(self.netw.n_sensitivity_params))
-            print(divider, '\n')
-
-            self.reactor_state_printer(prev_time)
-
-            ignition_found = False
-
-            # Main loop to run the calculation. As long as the time in
-            # the ``ReactorNet`` is less than the end time, keep going.
-            while self.netw.time < self.tend:
-                # If we are using a function to set the temperature as
-                # a function of time, use it here.
-                if self.temp_func is not None:
-                    self.gas.TP = self.temp_func(self.netw.time), None
-
-                # Take the step towards the end time.
-                self.netw.step()
-
-                # Set an array with the information from the current
-                # time step for printing.
-                cur_time = np.hstack((self.netw.time, self.reac.thermo.T,
-                                      self.reac.thermo.P, self.reac.volume,
-                                      self.wall.vdot(self.netw.time),
-                                      self.reac.thermo.X
-                                      ))
-
-                # If we have passed the end time, interpolate backwards
-                # to get the solution at the end time. Because linear
-                # interpolation is used, this will not work well if the
-                # end time is during or before the ignition event and
-                # we have stepped past it. This is unlikely though, as
-                # the solver should be taking relatively small time
-                # steps near ignition.
-                if self.netw.time > self.tend:
-                    interp_state = utils.reactor_interpolate(self.tend,
-                                                             prev_time,
-                                                             cur_time)
-                    self.reactor_state_printer(interp_state, end=True)
-                    timestep['time'] = self.tend
-                    timestep['temperature'] = interp_state[1]
-                    timestep['pressure'] = interp_state[2]
-                    # Mass fractions are saved, so convert the mole
-                    # fractions in ``interp_state`` to mass fractions.
-                    timestep['massfractions'] = \
-                        (interp_state[5:] *
-                         self.reac.thermo.molecular_weights /
-                         self.reac.thermo.mean_molecular_weight)
-
-                    timestep['volume'] = interp_state[3]
-                    if self.sensitivity:
-                        # Add sensitivity interpolation here by reading
-                        # from file on disk. Only have to do it once,
-                        # so it shouldn't be too expensive.
-                        prev_sens = table.cols.sensitivity[-1]
-                        cur_sens = self.netw.sensitivities()
-                        prev_time = table.cols.time[-1]
-                        cur_time = self.netw.time
-                        interp_sens = prev_sens + ((self.tend - prev_time) *
-                                                   (cur_sens - prev_sens) /
-                                                   (cur_time - prev_time))
-                        timestep['sensitivity'] = interp_sens
-                    # We don't need any of the rest of this step, so
-                    # break
-                    break
-
-                # If the ``save_time_step`` is set, save at the nearest
-                # step to the given interval. To avoid any errors, the
-                # values written to the binary save file will not be
-                # interpolated, but saved at the solver time step
-                # instead. If ``save_time_step`` is not set, save every
-                # time step to the binary file.
-                if self.save_time_step is not None:
-                    # Add what to do here if the save_time_step is set.
-                    if self.netw.time > self.save_time:
-                        timestep['time'] = self.netw.time
-                        (timestep['temperature'], timestep['pressure'],
-                            timestep['massfractions']) = self.reac.thermo.TPY
-                        timestep['volume'] = self.reac.volume
-                        if self.sensitivity:
-                            timestep['sensitivity'] = self.netw.sensitivities()
-                        timestep.append()
-                        table.flush()
-                        self.save_time += self.save_time_step
-                else:
-                    timestep['time'] = self.netw.time
-                    (timestep['temperature'], timestep['pressure'],
-                        timestep['massfractions']) = self.reac.thermo.TPY
-                    timestep['volume'] = self.reac.volume
-                    if self.sensitivity:
-                        timestep['sensitivity'] = self.netw.sensitivities()
-                    timestep.append()
-                    table.flush()
-
-                # Print Reactor state information to the screen for
-                # monitoring.
-                if self.netw.time > self.print_time:
-                    interp_state = utils.reactor_interpolate(self.print_time,
-                                                             prev_time,
-                                                             cur_time)
-                    self.reactor_state_printer(interp_state)
-                    self.print_time += self.print_time_step
-                elif self.netw.time == self.print_time:
-                    self.reactor_state_printer(cur_time)
-                    self.print_time += self.print_time_step
-
-                # If the temperature limit has been exceeded, we have
-                # ignition! Save the time this occurs at. In the
-                # future, the ignition time may be interpolated.
-                if self.reac.T >= self.temp_limit and ignition_found is False:
-                    self.ignition_time = self.netw.time
-                    ignition_found = True
-                    if self.keywords.get('break_on_ignition', False):
-                        self.reactor_state_printer(cur_time, end=False)
-                        break
+                time1, sens1 = self.prev_dense[0], self.prev_dense[3]
+                time2, sens2 = self.cur_dense[0], self.cur_dense[3]
+                if sens1 is None:
+                    sens1 = np.zeros_like(sens2)
+                row['sensitivity'] = sens1 + ((self.save_time - time1) *
+                                              (sens2 - sens1) /
+                                              (time2 - time1))
+            self.save_row(timestep, row)
+            self.save_time += self.save_time_step
 
-                # Set the ``prev_time`` array equal to the ``cur_time``
-                # array so we can go to the next time step.
-                prev_time = cur_time
+    def save_row(self, timestep, row):
+        """Append a row to the binary save file.
+
+        :param timestep:
+            The writer for the ``reactor`` table.
+        :param row:
+            Dictionary of column values, from `reactor_row`.
+        """
+        for name, value in row.items():
+            timestep[name] = value
+        timestep.append()
 
     def run_simulation(self):
         """
@@ -501,35 +958,62 @@ class SimulationCase(object):
 class MultiSimulationCase(SimulationCase):
     """Class that sets up and runs a simulation case, for multiple.
 
-    When multiple cases are run, no output is printed and no simulation
-    data is saved; upon completion, the calculated ignition delay times
-    are written to the output file.
+    When multiple cases are run, no output is printed; upon
+    completion, the calculated ignition delay times are written to the
+    output file. The time history is only saved if ``save_filename`` is
+    not ``None``. The reactor network is reused by the cases run in the
+    same process.
     """
 
-    def __init__(self, filenames):
-        """Initialize the simulation case.
-
-        Read the SENKIN-format input file is read into the ``keywords``
-        dictionary.
-
-        :param filenames:
-            Dictionary containing the relevant file names for this
-            case.
-        """
-        self.input_filename = filenames['input_filename']
-        self.mech_filename = filenames['mech_filename']
-        self.save_filename = filenames['save_filename']
-        self.thermo_filename = filenames['thermo_filename']
-
-        self.keywords = utils.read_input_file(self.input_filename)
+    reuse_reactor = True
 
     def run_case(self):
         """
         Actually run the case set up by ``setup_case``. Runs the
-        simulation by using ``ReactorNet.step(self.tend)``.
+        simulation by using :py:`~cantera.ReactorNet.step`.
+
+        The case is stopped early if it runs longer than the wall time
+        limit or takes more solver steps than the step limit, if either
+        is set. ``self.status`` records how the case ended: one of
+        ``'ignition'``, ``'no-ignition'``, ``'wall-time'``, or
+        ``'max-steps'``.
+
+        If ``save_filename`` is set, the time history is saved to it in
+        the same format as `SimulationCase.run_case`, up to the time
+        the case stops.
         """
+        with ExitStack() as stack:
+            timestep = None
+            if self.save_filename is not None:
+                save_file = stack.enter_context(tables.open_file(
+                    self.save_filename, mode='w', title='CanSen Save File'))
+                timestep = stack.enter_context(self.open_save_writer(
+                    self.create_save_table(save_file)))
+                self.save_initial_state(timestep)
+                if self.dense_output:
+                    self.cur_dense = self.dense_point(derivative=False)
+            self.integrate(timestep)
+            if timestep is not None:
+                self.finish_saving(timestep)
+
+    def integrate(self, timestep=None):
+        """Integrate until ignition, the end time, or a limit is hit.
 
+        :param timestep:
+            Optional writer for the ``reactor`` table. If it is given,
+            the time steps are saved to it.
+        """
         ignition_found = False
+        prev_time = self.netw.time
+        prev_temp = self.reac.T
+        prev_temp_deriv = None
+        self.n_steps = 0
+        self.status = 'no-ignition'
+
+        max_steps = self.keywords.get('maxSteps')
+        max_wall_time = self.keywords.get('maxWallTime')
+        if max_wall_time is not None:
+            deadline = perf_counter() + max_wall_time
 
         # Main loop to run the calculation. As long as the time in
         # the ``ReactorNet`` is less than the end time, keep going.
@@ -539,13 +1023,44 @@ class MultiSimulationCase(SimulationCase):
             if self.temp_func is not None:
                 self.gas.TP = self.temp_func(self.netw.time), None
 
-            # Take the step towards the end time.
-            self.netw.step(self.tend)
+            # Take one solver step.
+            self.netw.step()
+            self.n_steps += 1
+            cur_temp_deriv = self.temperature_derivative()
+
+            # As in `SimulationCase.run_case`, the step past the end
+            # time is not saved; with dense output, the rows up to the
+            # end time are.
+            if timestep is not None:
+                if self.dense_output:
+                    self.prev_dense = self.cur_dense
+                    self.cur_dense = self.dense_point()
+                if self.netw.time <= self.tend:
+                    self.save_step(timestep)
+                elif (self.dense_output and self.save_filter is None and
+                        self.save_time_step is not None):
+                    self.save_dense_rows(timestep, self.tend)
 
             # If the temperature limit has been exceeded, we have
-            # ignition! Save the time this occurs at. In the
-            # future, the ignition time may be interpolated.
+            # ignition! Find the time the limit was crossed between the
+            # previous and current steps.
             if self.reac.T >= self.temp_limit and ignition_found is False:
-                self.ignition_time = self.netw.time
+                self.locate_ignition(prev_time, prev_temp, prev_temp_deriv,
+                                     self.netw.time, self.reac.T,
+                                     cur_temp_deriv)
                 ignition_found = True
+                self.status = 'ignition'
+                break
+
+            # Give up on the case if it is over budget, so that the
+            # worker is free for the next case.
+            if max_steps is not None and self.n_steps >= max_steps:
+                self.status = 'max-steps'
+                break
+            if max_wall_time is not None and perf_counter() > deadline:
+                self.status = 'wall-time'
                 break
+
+            prev_time = self.netw.time
+            prev_temp = self.reac.T
+            prev_temp_deriv = cur_temp_deriv
@@ -0,0 +1,153 @@
+# Standard libraries
+import math
+from bisect import bisect_left
+
+# Rough activation temperature and pre-exponential factor for the
+# ignition delay, tau = A/P*exp(T_a/T). Only the order of the estimates
+# matters, so these do not have to be accurate for any fuel.
+ACTIVATION_TEMPERATURE = 15000.0
+PRE_EXPONENTIAL = 1.0E-10
+
+
+class RuntimeHistory(object):
+    """
+    Find the runtime of the previous case most similar to a new case.
+    The cases are compared on the axes where the ignition delay is close
+    to linear: inverse temperature, log pressure, and log equivalence
+    ratio. The previous cases are sorted by inverse temperature, so a
+    search only looks at the cases whose temperature is close enough to
+    be the nearest, and a case run before with the same conditions is
+    found directly.
+    """
+
+    def __init__(self, runtimes):
+        """Index the runtimes of the previous cases.
+
+        :param runtimes:
+            List of tuples of the temperature, pressure, equivalence
+            ratio, and runtime of previous cases, from
+            `~cansen.cache.ResultCache.get_runtimes`.
+        """
+        self.exact = {}
+        points = []
+        for temperature, pressure, eq_ratio, runtime in runtimes:
+            eq_ratio = eq_ratio or 1.0
+            self.exact[(temperature, pressure, eq_ratio)] = runtime
+            points.append((1000/temperature, math.log(pressure),
+                           math.log(eq_ratio), runtime))
+        points.sort()
+        self.points = points
+        self.inverse_temps = [point[0] for point in points]
+
+    def __len__(self):
+        return len(self.points)
+
+    def nearest(self, temperature, pressure, eq_ratio):
+        """Return the runtime of the most similar previous case.
+
+        :return runtime:
+            Runtime of the nearest previous case, or ``None`` if there
+            are none.
+        """
+        runtime = self.exact.get((temperature, pressure, eq_ratio))
+        if runtime is not None or not self.points:
+            return runtime
+
+        x = 1000/temperature
+        y = math.log(pressure)
+        z = math.log(eq_ratio)
+        inverse_temps = self.inverse_temps
+        n_points = len(inverse_temps)
+        above = bisect_left(inverse_temps, x)
+        below = above - 1
+        best = float('inf')
+        # Walk outwards from the temperature of the case, always to the
+        # closer side, until the temperature difference alone is larger
+        # than the best distance found.
+        while True:
+            dx_below = x - inverse_temps[below] if below >= 0 else float('inf')
+            dx_above = inverse_temps[above] - x if above < n_points else float('inf')
+            if min(dx_below, dx_above)**2 >= best:
+                break
+            if dx_below <= dx_above:
+                point = self.points[below]
+                below -= 1
+            else:
+                point = self.points[above]
+                above += 1
+            distance = ((x - point[0])**2 + (y - point[1])**2 +
+                        (z - point[2])**2)
+            if distance < best:
+                best = distance
+                runtime = point[3]
+        return runtime
+
+
+def estimate_cost(keywords, history=None):
+    """Estimate the relative cost of running a case.
+
+    If runtimes of previous runs with the same mechanism are available,
+    the runtime of the most similar previous case is used. Otherwise,
+    the cost is estimated from an Arrhenius fit of the ignition delay,
+    limited by the end time, since the cases stop at ignition.
+
+    :param keywords:
+        Dictionary of keywords of the case.
+    :param history:
+        Optional `RuntimeHistory` of previous cases with the same
+        mechanism.
+    :return cost:
+        Estimated cost of the case. Only comparable to the costs of
+        other cases estimated with the same ``history``.
+    """
+    temperature = keywords['temperature']
+    pressure = keywords['pressure']
+    eq_ratio = keywords.get('eqRatio') or 1.0
+
+    if history:
+        return history.nearest(temperature, pressure, eq_ratio)
+
+    # Cap the exponent so that very low temperatures do not overflow.
+    exponent = min(ACTIVATION_TEMPERATURE/temperature, 700.0)
+    tau = PRE_EXPONENTIAL/pressure*math.exp(exponent)
+    return min(tau, keywords['endTime'])
+
+
+def order_jobs(jobs, costs):
+    """Sort the jobs so that the most expensive are run first.
+
+    :param jobs:
+        Sequence of jobs, each a list of the keywords and the index of
+        the case.
+    :param costs:
+        Dictionary of the estimated cost of each case, keyed by the
+        index of the case.
+    :return jobs:
+        Tuple of the jobs in decreasing order of cost.
+    """
+    return tuple(sorted(jobs, key=lambda job: costs[job[1]], reverse=True))
+
+
+def load_balance(busy_times, wall_time, n_workers):
+    """Summarize how evenly the work was spread over the workers.
+
+    :param busy_times:
+        Dictionary of the total time each worker spent running cases,
+        keyed by the slot or the name of the worker. A worker that
+        replaces a recycled one should have the same key.
+    :param wall_time:
+        Wall-clock time to run all of the cases.
+    :param n_workers:
+        Number of worker processes, including any that ran no cases.
+    :return summary:
+        String describing the load balance.
+    """
+    if not busy_times or wall_time <= 0:
+        return 'Load balance: no cases were run'
+    times = list(busy_times.values())
+    times += [0.0]*max(n_workers - len(times), 0)
+    mean_time = sum(times)/len(times)
+    return ('Load balance: {} workers, busy time min {:.2f} s, mean {:.2f} s, '
+            'max {:.2f} s, wall time {:.2f} s, efficiency {:.1%}'.format(
+                len(times), min(times), mean_time, max(times), wall_time,
+                sum(times)/(len(times)*wall_time)))
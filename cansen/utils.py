@@ -1,18 +1,20 @@
 # Standard libraries
 import sys
 import os
+import json
+import shutil
+import time
 from itertools import product
-from math import pi
-from tempfile import NamedTemporaryFile
+from math import pi, floor
 from argparse import ArgumentParser
 from multiprocessing import cpu_count
 
-# Third-party modules
-from cantera import ck2cti
-
 # Local imports
 from .printer import divider
-from .exceptions import (KeywordError,
+from .cache import MechanismCache, hash_file, atomic_write
+from .distributed import parse_address
+from .exceptions import (CanSenError,
+                         KeywordError,
                          MultipleProblemError,
                          UnsupportedKeyword,
                          UndefinedKeywordError,
@@ -30,47 +32,71 @@ class MyParser(ArgumentParser):
         sys.exit(2)
 
 
-def convert_mech(mech_filename, thermo_filename=None):
+def convert_mech(mech_filename, thermo_filename=None, output_filename=None):
     """Convert a mechanism and return a string with the filename.
 
     Convert a CHEMKIN format mechanism to the Cantera CTI format using
-    the Cantera built-in script `ck2cti`.
+    the Cantera built-in script `ck2cti`. The converted mechanism is
+    stored in a :py:class:`~cansen.cache.MechanismCache`, so a
+    mechanism that has been converted before with the same
+    thermodynamic database and version of Cantera is not converted
+    again.
 
     :param mech_filename:
-        Filename of the input CHEMKIN format mechanism. The converted
-        CTI file will have the same name, but with `.cti` extension.
+        Filename of the input CHEMKIN format mechanism.
     :param thermo_filename:
         Filename of the thermodynamic database. Optional if the
         thermodynamic database is present in the mechanism input.
+    :param output_filename:
+        Optional filename to copy the converted CTI file to. By default,
+        the file in the cache is used.
     """
-
-    arg = ['--input='+mech_filename]
-    if thermo_filename is not None:
-        arg.append('--thermo='+thermo_filename)
-
-    # Convert the mechanism
-    ck2cti.main(arg)
-    mech_filename = mech_filename[:-4]+'.cti'
-    print('Mechanism conversion successful, written to '
-          '{}'.format(mech_filename))
-    return mech_filename
+    # Cantera takes a long time to import, so only import it when a
+    # mechanism has to be converted.
+    from cantera import __version__ as cantera_version
+    from cantera import ck2cti
+
+    cache = MechanismCache()
+    key = cache.make_key(mech_filename, thermo_filename, cantera_version)
+    converted_filename = cache.get(key)
+    if converted_filename is not None:
+        print('Mechanism conversion found in the cache at '
+              '{}'.format(converted_filename))
+    else:
+        # ck2cti adds ``.cti`` to an output name without it, so the
+        # temporary name has to end with ``.cti``.
+        with atomic_write(cache.path(key), '.cti') as tmp_filename:
+            arg = ['--input='+mech_filename, '--output='+tmp_filename]
+            if thermo_filename is not None:
+                arg.append('--thermo='+thermo_filename)
+            ck2cti.main(arg)
+        converted_filename = cache.put(key, mech_filename, thermo_filename,
+                                       cantera_version)
+        print('Mechanism conversion successful, stored in the cache at '
+              '{}'.format(converted_filename))
+
+    if output_filename is not None:
+        shutil.copyfile(converted_filename, output_filename)
+        print('Converted mechanism written to {}'.format(output_filename))
+        return output_filename
+    return converted_filename
 
 
 def process_multi_input(input_filename):
     """Process a formatted input file into multiple cases.
 
     Processes a formatted input file that contains multiple cases into
-    separate temporary files, for individual reading of keywords.
+    separate lists of lines, for individual reading of keywords with
+    `read_input_file`.
 
     :param input_filename:
         Filename of the SENKIN input file.
-    :return filenames:
-        List of temporary filenames.
+    :return cases:
+        List of the lists of lines of each case.
     """
 
-    filenames = []
-
-    temp_file = NamedTemporaryFile(delete=False)
+    cases = []
+    case = []
 
     with open(input_filename) as input_file:
         for line in input_file:
@@ -80,44 +106,199 @@ def process_multi_input(input_filename):
                 # skip comment or blank lines
                 continue
             elif line.upper().startswith('END'):
-                temp_file.write(line)
-
-                # store temporary file and create new
-                temp_file.seek(0)
-                filenames.append(temp_file.name)
+                case.append(line)
 
-                temp_file = NamedTemporaryFile(delete=False)
+                # store the case and start a new one
+                cases.append(case)
+                case = []
 
                 continue
             else:
-                # just print line
-                temp_file.write(line)
+                # just store line
+                case.append(line)
+
+    # keep the last case if it did not end with END
+    if case:
+        cases.append(case)
+
+    return cases
+
+
+def expand_sweep(keywords):
+    """Expand the swept keywords of a case into the individual cases.
+
+    The cases are the Cartesian product of the values of the sweep
+    keywords :ref:`TRNG <TRNG>`, :ref:`PLST <PLST>`, and
+    :ref:`ELST <ELST>`, in the order given in the input.
+
+    :param keywords:
+        Dictionary of keywords from `read_input_file`.
+    :return cases:
+        List of keyword dictionaries, one for each case. If no keywords
+        are swept, the list contains only the input dictionary.
+    """
+    sweep = keywords.get('sweep')
+    if not sweep:
+        return [keywords]
+
+    cases = []
+    names = list(sweep.keys())
+    for values in product(*[sweep[name] for name in names]):
+        case = keywords.copy()
+        del case['sweep']
+        case.update(zip(names, values))
+        cases.append(case)
+    return cases
+
+
+def sort_multi_output(output_filename):
+    """Sort the results in a multiple case output file by case index.
+
+    The results of multiple cases are written in the order the cases
+    finish. The comment lines are kept at the top of the file and the
+    result lines are sorted by the case index in the first column.
+
+    :param output_filename:
+        Filename of the text output file.
+    """
+    with open(output_filename) as output_file:
+        lines = output_file.readlines()
+
+    comments = [line for line in lines if line.startswith('#')]
+    results = [line for line in lines if not line.startswith('#')]
+    results.sort(key=lambda line: int(line.split()[0]))
+
+    with open(output_filename, 'w') as output_file:
+        output_file.writelines(comments + results)
+
+
+def case_save_filename(index):
+    """Return the name of the binary save file of one of multiple cases.
+
+    :param index:
+        Index of the case in the input file.
+    """
+    return 'case_{}.hdf'.format(index)
+
+
+def write_journal(journal, index, key, res, stats):
+    """Record a finished case in the journal of a multiple case run.
+
+    The journal has one JSON object per line. Each line is flushed as
+    soon as it is written, so that the journal is complete up to the
+    last finished case if the run is interrupted.
+
+    :param journal:
+        Journal file object, open for writing.
+    :param index:
+        Index of the case in the input file.
+    :param key:
+        Hash identifying the case, from
+        :py:meth:`~cansen.cache.ResultCache.make_key`.
+    :param res:
+        List of simulation results of the case.
+    :param stats:
+        Dictionary of the status of the case and, optionally, its
+        number of solver steps and wall time.
+    """
+    print(json.dumps({'index': index, 'key': key, 'result': res,
+                      'stats': stats}), file=journal)
+    journal.flush()
+
+
+def read_journal(journal_filename):
+    """Read the finished cases from the journal of a multiple case run.
+
+    Only the cases that ran to ignition or the end time are finished.
+    A case that failed or was stopped by a limit on its wall time or
+    solver steps is run again, since the limits may have been changed.
+    A line that cannot be read, such as a line that was only partly
+    written when the run was interrupted, is skipped.
+
+    :param journal_filename:
+        Filename of the journal. If it does not exist, no cases have
+        been finished.
+    :return journaled:
+        Dictionary of tuples of the results and the dictionary of the
+        status and statistics of each case, keyed by the hash
+        identifying the case.
+    """
+    journaled = {}
+    if not os.path.isfile(journal_filename):
+        return journaled
+    with open(journal_filename) as journal:
+        for line in journal:
+            try:
+                record = json.loads(line)
+                if record['stats']['status'] not in ('ignition',
+                                                     'no-ignition'):
+                    continue
+                journaled[record['key']] = (record['result'],
+                                            record['stats'])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return journaled
+
 
-    # check if last file actually written to; if not, close
-    if os.stat(temp_file.name).st_size == 0:
-        temp_file.close()
+def read_multi_cases(input_filename):
+    """Read the keywords of every case of a multiple case input file.
 
-    return filenames
+    :param input_filename:
+        Filename of the SENKIN input file. Relative filenames in the
+        keywords, such as :ref:`VPRF <VPRF>`, are relative to its
+        directory.
+    :return cases:
+        List of keyword dictionaries from `read_input_file`, one for
+        each case in the input file. Swept keywords are not expanded.
+    """
+    return [read_input_file(input_filename, echo=False, lines=lines)
+            for lines in process_multi_input(input_filename)]
 
 
-def remove_files(files):
-    """Delete files.
+def known_complib(complib):
+    """Check whether PyTables knows the compression library.
 
-    :param files:
-        List of names of files to be removed
+    PyTables is only imported when a compression library is given.
+
+    :param complib:
+        Lower case name of the compression library, such as ``zlib``
+        or ``blosc:lz4``.
     """
+    from tables.filters import all_complibs
+    return complib in all_complibs
+
 
-    for f in files:
-        os.remove(f)
+def profile_filename(line, input_filename):
+    """Return the absolute filename of a profile file keyword.
 
-    return None
+    :param line:
+        Line of the input file with the :ref:`VPRF <VPRF>` or
+        :ref:`TPRF <TPRF>` keyword followed by the filename.
+    :param input_filename:
+        Filename of the SENKIN input file. A relative profile filename
+        is relative to the directory of the input file, or to the
+        current directory if there is no input file.
+    """
+    filename = line.split(None, 1)[1].strip()
+    if input_filename is not None:
+        filename = os.path.join(os.path.dirname(input_filename), filename)
+    filename = os.path.abspath(filename)
+    if not os.path.isfile(filename):
+        raise CanSenError('The profile file "{}" does not exist'.format(
+            filename))
+    return filename
 
 
-def read_input_file(input_filename):
+def read_input_file(input_filename, echo=True, lines=None):
     """Read a formatted input file and return a dictionary of keywords.
 
     :param input_filename:
         Filename of the SENKIN input file.
+    :param echo:
+        If ``True``, print the input file to the screen as it is read.
+    :param lines:
+        Optional list of the lines of the input. If it is given, the
+        lines are read instead of the input file.
     """
     # Initialize the dictionaries and lists that will be filled by
     # the parsing.
@@ -127,6 +308,7 @@ def read_input_file(input_filename):
     fuel = {}
     complete_products = []
     additional_species = {}
+    sweep = {}
 
     # problem_type is a boolean indicating whether a problem selection
     # has been made.
@@ -149,161 +331,256 @@ def read_input_file(input_filename):
         'USET',   'WENG',   'XMLI'
         ]
 
-    with open(input_filename) as input_file:
+    if lines is None:
+        with open(input_filename) as input_file:
+            lines = input_file.readlines()
+
+    if echo:
         print(divider)
         print('Keyword Input:\n')
-        for line in input_file:
-            # Echo the input back to the output file.
+    for line in lines:
+        # Echo the input back to the output file.
+        if echo:
             print(' '*10, line, end='')
-            if (line.startswith('!') or line.startswith('.') or
-                    line.startswith('/') or line.strip() == ""):
-                continue
-            elif line.upper().startswith('CONV'):
-                if problem_type:
-                    raise MultipleProblemError(line, keywords['problemType'])
-                else:
-                    keywords['problemType'] = 1
-                    problem_type = True
-            elif line.upper().startswith('CONP'):
-                if problem_type:
-                    raise MultipleProblemError(line, keywords['problemType'])
-                else:
-                    keywords['problemType'] = 2
-                    problem_type = True
-            elif line.upper().startswith('VPRO'):
-                if not problem_type:
-                    keywords['problemType'] = 3
-                    vproTime = [float(line.split()[1])]
-                    vproVol = [float(line.split()[2])]
-                    problem_type = True
-                elif problem_type and keywords.get('problemType') != 3:
-                    raise MultipleProblemError(line, keywords['problemType'])
-                elif problem_type and keywords.get('problemType') == 3:
-                    vproTime.append(float(line.split()[1]))
-                    vproVol.append(float(line.split()[2]))
-            elif line.upper().startswith('CONT'):
-                if problem_type:
-                    raise MultipleProblemError(line, keywords['problemType'])
-                else:
-                    keywords['problemType'] = 4
-                    problem_type = True
-            elif line.upper().startswith('COTV'):
-                if problem_type:
-                    raise MultipleProblemError(line, keywords['problemType'])
-                else:
-                    keywords['problemType'] = 5
-                    problem_type = True
-            elif line.upper().startswith('VTIM'):
-                if problem_type:
-                    raise MultipleProblemError(line, keywords['problemType'])
-                else:
-                    keywords['problemType'] = 6
-                    problem_type = True
-            elif line.upper().startswith('TTIM'):
-                if problem_type:
-                    raise MultipleProblemError(line, keywords['problemType'])
-                else:
-                    keywords['problemType'] = 7
-                    problem_type = True
-            elif line.upper().startswith('TPRO'):
-                if not problem_type:
-                    keywords['problemType'] = 8
-                    TproTime = [float(line.split()[1])]
-                    TproTemp = [float(line.split()[2])]
-                    problem_type = True
-                elif problem_type and keywords.get('problemType') != 8:
-                    raise MultipleProblemError(line, keywords['problemType'])
-                elif problem_type and keywords.get('problemType') == 8:
-                    TproTime.append(float(line.split()[1]))
-                    TproTemp.append(float(line.split()[2]))
-            elif line.upper().startswith('ICEN'):
-                if problem_type:
-                    raise MultipleProblemError(line, keywords['problemType'])
-                else:
-                    keywords['problemType'] = 9
-                    problem_type = True
-            elif line.upper().startswith('TEMP'):
-                keywords['temperature'] = float(line.split()[1])
-            elif line.upper().startswith('REAC'):
-                species = line.split()[1]
-                molefrac = line.split()[2]
-                reactants.append(':'.join([species, molefrac]))
-            elif line.upper().startswith('PRES'):
-                keywords['pressure'] = float(line.split()[1])
-            elif line.upper().startswith('TIME'):
-                keywords['endTime'] = float(line.split()[1])
-            elif line.upper().startswith('TLIM'):
-                keywords['tempLimit'] = float(line.split()[1])
-            elif line.upper().startswith('DTIGN'):
-                keywords['tempThresh'] = float(line.split()[1])
-            elif line.upper().startswith('ATOL'):
-                keywords['abstol'] = float(line.split()[1])
-            elif line.upper().startswith('RTOL'):
-                keywords['reltol'] = float(line.split()[1])
-            elif line.upper().startswith('DELT'):
-                keywords['prntTimeInt'] = float(line.split()[1])
-            elif line.upper().startswith('DTSV'):
-                keywords['saveTimeInt'] = float(line.split()[1])
-            elif line.upper().startswith('STPT'):
-                keywords['maxTimeStep'] = float(line.split()[1])
-            elif line.upper().startswith('EQUI'):
-                keywords['eqRatio'] = float(line.split()[1])
-            elif line.upper().startswith('OXID'):
-                species = line.split()[1]
-                molefrac = float(line.split()[2])
-                oxidizer[species] = molefrac
-            elif line.upper().startswith('FUEL'):
-                species = line.split()[1]
-                molefrac = float(line.split()[2])
-                fuel[species] = molefrac
-            elif line.upper().startswith('CPROD'):
-                species = line.split()[1]
-                complete_products.append(species)
-            elif line.upper().startswith('ADD'):
-                species = line.split()[1]
-                molefrac = float(line.split()[2])
-                additional_species[species] = molefrac
-            elif line.upper().startswith('SENS'):
-                keywords['sensitivity'] = True
-            elif line.upper().startswith('VOL '):
-                # The default units of volume in SENKIN are cm**3, but
-                # the default in Cantera is m**3 so we have to convert.
-                keywords['reactorVolume'] = float(line.split()[1])/1.0E6
-            elif line.upper().startswith('RTLS'):
-                keywords['sensRelTol'] = float(line.split()[1])
-            elif line.upper().startswith('ATLS'):
-                keywords['sensAbsTol'] = float(line.split()[1])
-            elif line.upper().startswith('IGNBREAK'):
-                keywords['break_on_ignition'] = True
-            elif line.upper().startswith('CMPR'):
-                keywords['comp_ratio'] = float(line.split()[1])
-            elif line.upper().startswith('DEG0'):
-                keywords['start_crank_angle'] = float(line.split()[1])
-            elif line.upper().startswith('VOLD'):
-                keywords['swept_volume'] = float(line.split()[1])/1.0E6
-            elif line.upper().startswith('VOLC'):
-                keywords['clear_volume'] = float(line.split()[1])/1.0E6
-            elif line.upper().startswith('LOLR'):
-                keywords['rod_radius_ratio'] = float(line.split()[1])
-            elif line.upper().startswith('RPM'):
-                keywords['rev_per_min'] = float(line.split()[1])
-            elif line.upper().startswith('BORE'):
-                keywords['cyl_bore'] = float(line.split()[1])/1.0E2
-            elif line.upper().startswith('STROKE'):
-                keywords['stroke_length'] = float(line.split()[1])/1.0E2
-            elif line.upper().startswith('RODL'):
-                keywords['connect_rod_len'] = float(line.split()[1])/1.0E2
-            elif line.upper().startswith('CRAD'):
-                keywords['crank_radius'] = float(line.split()[1])/1.0E2
-            elif line.upper()[0:3] in unsupported_keys:
-                raise UnsupportedKeyword(line)
-                continue
-            elif line.upper().startswith('END'):
-                continue
+        if (line.startswith('!') or line.startswith('.') or
+                line.startswith('/') or line.strip() == ""):
+            continue
+        elif line.upper().startswith('CONV'):
+            if problem_type:
+                raise MultipleProblemError(line, keywords['problemType'])
+            else:
+                keywords['problemType'] = 1
+                problem_type = True
+        elif line.upper().startswith('CONP'):
+            if problem_type:
+                raise MultipleProblemError(line, keywords['problemType'])
+            else:
+                keywords['problemType'] = 2
+                problem_type = True
+        elif line.upper().startswith('VPRO'):
+            if not problem_type:
+                keywords['problemType'] = 3
+                vproTime = [float(line.split()[1])]
+                vproVol = [float(line.split()[2])]
+                problem_type = True
+            elif problem_type and keywords.get('problemType') != 3:
+                raise MultipleProblemError(line, keywords['problemType'])
+            elif 'vproFile' in keywords:
+                raise MultipleProblemError(line, 'VPRF')
+            elif problem_type and keywords.get('problemType') == 3:
+                vproTime.append(float(line.split()[1]))
+                vproVol.append(float(line.split()[2]))
+        elif line.upper().startswith('VPRF'):
+            if problem_type:
+                raise MultipleProblemError(line, keywords['problemType'])
+            else:
+                keywords['problemType'] = 3
+                keywords['vproFile'] = profile_filename(line, input_filename)
+                problem_type = True
+        elif line.upper().startswith('CONT'):
+            if problem_type:
+                raise MultipleProblemError(line, keywords['problemType'])
+            else:
+                keywords['problemType'] = 4
+                problem_type = True
+        elif line.upper().startswith('COTV'):
+            if problem_type:
+                raise MultipleProblemError(line, keywords['problemType'])
+            else:
+                keywords['problemType'] = 5
+                problem_type = True
+        elif line.upper().startswith('VTIM'):
+            if problem_type:
+                raise MultipleProblemError(line, keywords['problemType'])
             else:
-                raise UndefinedKeywordError(line)
+                keywords['problemType'] = 6
+                problem_type = True
+        elif line.upper().startswith('TTIM'):
+            if problem_type:
+                raise MultipleProblemError(line, keywords['problemType'])
+            else:
+                keywords['problemType'] = 7
+                problem_type = True
+        elif line.upper().startswith('TPRO'):
+            if not problem_type:
+                keywords['problemType'] = 8
+                TproTime = [float(line.split()[1])]
+                TproTemp = [float(line.split()[2])]
+                problem_type = True
+            elif problem_type and keywords.get('problemType') != 8:
+                raise MultipleProblemError(line, keywords['problemType'])
+            elif 'TproFile' in keywords:
+                raise MultipleProblemError(line, 'TPRF')
+            elif problem_type and keywords.get('problemType') == 8:
+                TproTime.append(float(line.split()[1]))
+                TproTemp.append(float(line.split()[2]))
+        elif line.upper().startswith('TPRF'):
+            if problem_type:
+                raise MultipleProblemError(line, keywords['problemType'])
+            else:
+                keywords['problemType'] = 8
+                keywords['TproFile'] = profile_filename(line, input_filename)
+                problem_type = True
+        elif line.upper().startswith('ICEN'):
+            if problem_type:
+                raise MultipleProblemError(line, keywords['problemType'])
+            else:
+                keywords['problemType'] = 9
+                problem_type = True
+        elif line.upper().startswith('TEMP'):
+            keywords['temperature'] = float(line.split()[1])
+        elif line.upper().startswith('REAC'):
+            species = line.split()[1]
+            molefrac = line.split()[2]
+            reactants.append(':'.join([species, molefrac]))
+        elif line.upper().startswith('PRES'):
+            keywords['pressure'] = float(line.split()[1])
+        elif line.upper().startswith('TIME'):
+            keywords['endTime'] = float(line.split()[1])
+        elif line.upper().startswith('TLIM'):
+            keywords['tempLimit'] = float(line.split()[1])
+        elif line.upper().startswith('DTIGN'):
+            keywords['tempThresh'] = float(line.split()[1])
+        elif line.upper().startswith('ATOL'):
+            keywords['abstol'] = float(line.split()[1])
+        elif line.upper().startswith('RTOL'):
+            keywords['reltol'] = float(line.split()[1])
+        elif line.upper().startswith('DELT'):
+            keywords['prntTimeInt'] = float(line.split()[1])
+        elif line.upper().startswith('DTSV'):
+            keywords['saveTimeInt'] = float(line.split()[1])
+        elif line.upper().startswith('STPT'):
+            keywords['maxTimeStep'] = float(line.split()[1])
+        elif line.upper().startswith('EQUI'):
+            keywords['eqRatio'] = float(line.split()[1])
+        elif line.upper().startswith('OXID'):
+            species = line.split()[1]
+            molefrac = float(line.split()[2])
+            oxidizer[species] = molefrac
+        elif line.upper().startswith('FUEL'):
+            species = line.split()[1]
+            molefrac = float(line.split()[2])
+            fuel[species] = molefrac
+        elif line.upper().startswith('CPROD'):
+            species = line.split()[1]
+            complete_products.append(species)
+        elif line.upper().startswith('ADD'):
+            species = line.split()[1]
+            molefrac = float(line.split()[2])
+            additional_species[species] = molefrac
+        elif line.upper().startswith('SENS'):
+            keywords['sensitivity'] = True
+        elif line.upper().startswith('VOL '):
+            # The default units of volume in SENKIN are cm**3, but
+            # the default in Cantera is m**3 so we have to convert.
+            keywords['reactorVolume'] = float(line.split()[1])/1.0E6
+        elif line.upper().startswith('RTLS'):
+            keywords['sensRelTol'] = float(line.split()[1])
+        elif line.upper().startswith('ATLS'):
+            keywords['sensAbsTol'] = float(line.split()[1])
+        elif line.upper().startswith('IGNBREAK'):
+            keywords['break_on_ignition'] = True
+        elif line.upper().startswith('CMPR'):
+            keywords['comp_ratio'] = float(line.split()[1])
+        elif line.upper().startswith('DEG0'):
+            keywords['start_crank_angle'] = float(line.split()[1])
+        elif line.upper().startswith('VOLD'):
+            keywords['swept_volume'] = float(line.split()[1])/1.0E6
+        elif line.upper().startswith('VOLC'):
+            keywords['clear_volume'] = float(line.split()[1])/1.0E6
+        elif line.upper().startswith('LOLR'):
+            keywords['rod_radius_ratio'] = float(line.split()[1])
+        elif line.upper().startswith('RPM'):
+            keywords['rev_per_min'] = float(line.split()[1])
+        elif line.upper().startswith('BORE'):
+            keywords['cyl_bore'] = float(line.split()[1])/1.0E2
+        elif line.upper().startswith('STROKE'):
+            keywords['stroke_length'] = float(line.split()[1])/1.0E2
+        elif line.upper().startswith('RODL'):
+            keywords['connect_rod_len'] = float(line.split()[1])/1.0E2
+        elif line.upper().startswith('CRAD'):
+            keywords['crank_radius'] = float(line.split()[1])/1.0E2
+        elif line.upper().startswith('BUFS'):
+            keywords['bufferSize'] = int(line.split()[1])
+        elif line.upper().startswith('BUFT'):
+            keywords['bufferTime'] = float(line.split()[1])
+        elif line.upper().startswith('TRNG'):
+            start, end, step = [float(x) for x in line.split()[1:4]]
+            if step == 0 or (end - start)/step < 0:
+                raise KeywordError('The TRNG step must be nonzero and go '
+                                   'from the start to the end temperature: '
+                                   '{}'.format(line.strip()))
+            # The sweep stops at the last step that does not pass the
+            # end temperature.
+            n_points = int(floor((end - start)/step + 1e-9)) + 1
+            sweep['temperature'] = [start + i*step for i in range(n_points)]
+        elif line.upper().startswith('PLST'):
+            sweep['pressure'] = [float(x) for x in line.split()[1:]]
+        elif line.upper().startswith('ELST'):
+            sweep['eqRatio'] = [float(x) for x in line.split()[1:]]
+        elif line.upper().startswith('SVTL'):
+            keywords['saveRelTol'] = float(line.split()[1])
+            if len(line.split()) > 2:
+                keywords['saveAbsTol'] = float(line.split()[2])
+        elif line.upper().startswith('SVSP'):
+            keywords.setdefault('saveSpecies', []).append(
+                line.split()[1])
+        elif line.upper().startswith('IGNTOL'):
+            keywords['ignitionTol'] = float(line.split()[1])
+            if not keywords['ignitionTol'] > 0:
+                raise KeywordError('The ignition time tolerance must be '
+                                   'positive: {}'.format(line.strip()))
+        elif line.upper().startswith('DENS'):
+            keywords['denseOutput'] = True
+        elif line.upper().startswith('COMP'):
+            keywords['complib'] = line.split()[1].lower()
+            if not known_complib(keywords['complib']):
+                raise KeywordError('Unknown compression library: '
+                                   '{}'.format(line.strip()))
+            if len(line.split()) > 2:
+                keywords['complevel'] = int(line.split()[2])
+                if not 1 <= keywords['complevel'] <= 9:
+                    raise KeywordError('The compression level must be '
+                                       'between 1 and 9: '
+                                       '{}'.format(line.strip()))
+        elif line.upper().startswith('CHNK'):
+            keywords['chunkRows'] = int(line.split()[1])
+        elif line.upper().startswith('WTIM'):
+            keywords['maxWallTime'] = float(line.split()[1])
+        elif line.upper().startswith('MXST'):
+            keywords['maxSteps'] = int(line.split()[1])
+        elif line.upper().startswith('VSMO'):
+            keywords['vproSmoothing'] = line.split()[1].lower()
+            if len(line.split()) > 2:
+                keywords['vproSmoothingLam'] = float(line.split()[2])
+        elif line.upper().startswith('ASYNC'):
+            if len(line.split()) > 1:
+                keywords['asyncQueueSize'] = int(line.split()[1])
+            else:
+                keywords['asyncQueueSize'] = 4
+        elif line.upper()[0:3] in unsupported_keys:
+            raise UnsupportedKeyword(line)
+            continue
+        elif line.upper().startswith('END'):
+            continue
+        else:
+            raise UndefinedKeywordError(line)
+    if echo:
         print('\n', divider, '\n', sep='')
 
+    # Swept values stand in for the single values of the keyword. The
+    # first value is used until the cases are expanded by
+    # `expand_sweep`.
+    if sweep:
+        for key, values in sweep.items():
+            if not values:
+                raise KeywordError('A sweep keyword has no values.')
+            if key in keywords:
+                raise KeywordError('{} cannot be both given and '
+                                   'swept.'.format(key))
+            keywords[key] = values[0]
+        keywords['sweep'] = sweep
+
     # The endTime, temperature, pressure, and problemType are required
     # input. Exit if any of them are not found.
     if 'endTime' not in keywords:
@@ -322,11 +599,20 @@ def read_input_file(input_filename):
             'COTV', 'TTIM', 'VTIM',
         )
     elif keywords.get('problemType') == 3:
-        keywords['vproTime'] = vproTime
-        keywords['vproVol'] = vproVol
+        # A profile in a file is loaded by each process that runs the
+        # case. Its hash is part of the keywords, so that cached results
+        # are not used when the file changes.
+        if 'vproFile' in keywords:
+            keywords['vproFileHash'] = hash_file(keywords['vproFile'])
+        else:
+            keywords['vproTime'] = vproTime
+            keywords['vproVol'] = vproVol
     elif keywords.get('problemType') == 8:
-        keywords['TproTime'] = TproTime
-        keywords['TproTemp'] = TproTemp
+        if 'TproFile' in keywords:
+            keywords['TproFileHash'] = hash_file(keywords['TproFile'])
+        else:
+            keywords['TproTime'] = TproTime
+            keywords['TproTemp'] = TproTemp
     elif keywords.get('problemType') == 9:
         # Variables needed to calculate piston velocity and other
         # quantities for the IC Engine model: Stroke length, rod
@@ -488,6 +774,19 @@ def cli_parser(argv):
                         help='Convert the input mechanism to CTI format '
                              'and quit. If ``--convert`` is specified, '
                              'the SENKIN input file is optional.')
+    parser.add_argument('--list-mech-cache',
+                        action='store_true',
+                        help='List the converted mechanisms in the '
+                             'mechanism cache and quit.')
+    parser.add_argument('--prune-mech-cache',
+                        type=float,
+                        nargs='?',
+                        const=0.0,
+                        metavar='DAYS',
+                        help='Remove the converted mechanisms that have '
+                             'not been used for ``DAYS`` days from the '
+                             'mechanism cache and quit. If ``DAYS`` is not '
+                             'given, remove all of them.')
     parser.add_argument('-m', '--multi',
                         type=int,
                         nargs='?',
@@ -500,6 +799,152 @@ def cli_parser(argv):
                              'CanSen uses the available number of '
                              'processors by default.')
 
+    parser.add_argument('--sort',
+                        action='store_true',
+                        help='With ``--multi``, sort the results in the '
+                             'output file into the order of the cases in '
+                             'the input file when all of the cases are '
+                             'finished. Optional, by default the results '
+                             'are in the order the cases finish.')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='With ``--multi``, run every case instead of '
+                             'reading the results of cases that have been '
+                             'run before from the result cache.')
+    parser.add_argument('--cache-size',
+                        type=float,
+                        default=100.0,
+                        help='Maximum size of the result cache in MB. The '
+                             'least recently used results are removed '
+                             'when the cache is larger. Optional, '
+                             'default: 100.')
+    parser.add_argument('--results',
+                        type=str,
+                        help='With ``--multi``, also write the results to '
+                             'a table with one row per case, in HDF5 '
+                             '(``.h5``, ``.hdf``, ``.hdf5``), CSV '
+                             '(``.csv``), or NumPy (``.npz``) format, '
+                             'chosen by the file extension. Optional.')
+    parser.add_argument('--save-cases',
+                        type=str,
+                        metavar='DIRECTORY',
+                        help='With ``--multi``, save the time history of '
+                             'each case to its own binary save file in '
+                             '``DIRECTORY``, and write a ``master.hdf`` '
+                             'file there that links to all of them. '
+                             'Optional, by default no time histories are '
+                             'saved.')
+    parser.add_argument('--threads-per-worker',
+                        type=int,
+                        help='With ``--multi``, the maximum number of '
+                             'threads each worker process may use in '
+                             'OpenMP and BLAS libraries. Optional, by '
+                             'default the libraries choose.')
+    parser.add_argument('--pin',
+                        choices=['core', 'numa'],
+                        help='With ``--multi``, pin each worker process '
+                             'to its own CPUs (``core``) or spread the '
+                             'workers over the NUMA nodes (``numa``). '
+                             'Only supported on Linux. Optional, by '
+                             'default the workers are not pinned.')
+    parser.add_argument('--max-tasks',
+                        type=int,
+                        help='With ``--multi``, replace each worker '
+                             'process after it has run this many cases, '
+                             'to bound its memory use. Optional, by '
+                             'default the workers are kept for the '
+                             'whole run.')
+    parser.add_argument('--serve',
+                        type=parse_address,
+                        metavar='[HOST:]PORT',
+                        help='Instead of running the cases of ``--multi`` '
+                             'on this machine, hand them out to workers '
+                             'that connect to the given ``[HOST:]PORT``. '
+                             'The host is ``localhost`` if it is left '
+                             'out; use ``0.0.0.0`` to listen on every '
+                             'interface. Implies ``--multi``.')
+    parser.add_argument('--worker',
+                        type=parse_address,
+                        metavar='HOST:PORT',
+                        help='Run cases from the coordinator started with '
+                             '``--serve`` at ``HOST:PORT`` until there '
+                             'are none left. Use ``-m`` to start more than '
+                             'one worker process. No other options are '
+                             'needed.')
+    parser.add_argument('--journal',
+                        type=str,
+                        help='With ``--multi``, the file where each case '
+                             'is recorded as soon as it is finished. '
+                             'Optional, default: the output file name '
+                             'followed by ``.journal``.')
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='With ``--multi``, continue an interrupted '
+                             'run, running only the cases that are not in '
+                             'the journal or that failed or were stopped.')
+    parser.add_argument('--dense-output',
+                        action='store_true',
+                        help='Interpolate the printed and saved values '
+                             'between solver steps, so that the print and '
+                             'save intervals do not limit the solver step '
+                             'size. Same as the ``DENS`` keyword.')
+    parser.add_argument('--native-functions',
+                        action='store_true',
+                        help='Evaluate the ``VPRO`` and ``TPRO`` profiles '
+                             'and the ``ICEN`` piston velocity '
+                             'with native Cantera functions instead of '
+                             'Python callbacks, if the installed version of '
+                             'Cantera supports it.')
+    parser.add_argument('--buffer-size',
+                        type=int,
+                        help='Number of time steps to collect in memory '
+                             'before they are written to the binary save '
+                             'file. Overrides the ``BUFS`` keyword. '
+                             'Optional, default: 100.')
+
+    parser.add_argument('--async-write',
+                        type=int,
+                        nargs='?',
+                        const=4,
+                        metavar='QUEUE_SIZE',
+                        help='Write the binary save file from a background '
+                             'thread, with at most ``QUEUE_SIZE`` blocks '
+                             'of time steps waiting to be written. '
+                             'Overrides the ``ASYNC`` keyword. Optional, '
+                             'default queue size: 4.')
+
+    parser.add_argument('--complib',
+                        type=str,
+                        help='Compression library for the binary save '
+                             'file, e.g., ``zlib`` or ``blosc:lz4``. '
+                             'Overrides the ``COMP`` keyword. Optional, '
+                             'by default the file is not compressed.')
+    parser.add_argument('--complevel',
+                        type=int,
+                        help='Compression level for the binary save file, '
+                             'from 1 to 9. Only used if a compression '
+                             'library is set. Optional, default: 5.')
+    parser.add_argument('--chunk-rows',
+                        type=int,
+                        help='Number of time steps in each chunk of the '
+                             'binary save file. Overrides the ``CHNK`` '
+                             'keyword. Optional, by default PyTables '
+                             'chooses the chunk size.')
+    parser.add_argument('--max-wall-time',
+                        type=float,
+                        help='With ``--multi``, stop a case that runs '
+                             'longer than this many seconds and go on to '
+                             'the next case. Overrides the ``WTIM`` '
+                             'keyword. Optional, by default there is no '
+                             'limit.')
+    parser.add_argument('--max-steps',
+                        type=int,
+                        help='With ``--multi``, stop a case that takes '
+                             'more than this many solver steps and go on '
+                             'to the next case. Overrides the ``MXST`` '
+                             'keyword. Optional, by default there is no '
+                             'limit.')
+
     if len(argv) == 0:
         parser.print_help()
         sys.exit(1)
@@ -515,6 +960,29 @@ def cli_parser(argv):
             path=os.path.abspath(os.path.dirname(__file__))))
         sys.exit(0)
 
+    if args.list_mech_cache:
+        entries = MechanismCache().entries()
+        for entry in entries:
+            print('{key:.16s} {size:>12d} {last_used} {mechanism}'.format(
+                key=entry['key'], size=entry['size'],
+                last_used=time.strftime('%Y-%m-%d %H:%M',
+                                        time.localtime(entry['last_used'])),
+                mechanism=entry.get('mechanism', 'unknown')))
+        print('{} converted mechanisms, {:.1f} MB'.format(
+            len(entries), sum(entry['size'] for entry in entries)/2**20))
+        sys.exit(0)
+
+    if args.prune_mech_cache is not None:
+        removed = MechanismCache().prune(args.prune_mech_cache or None)
+        print('Removed {} converted mechanisms, {:.1f} MB'.format(
+            len(removed), sum(entry['size'] for entry in removed)/2**20))
+        sys.exit(0)
+
+    # A worker gets everything else from the coordinator.
+    if args.worker is not None:
+        num_proc = args.multi or 1
+        return filenames, False, False, num_proc, {}, {'worker': args.worker}
+
     if args.input:
         input_filename = args.input
         if not os.path.isfile(input_filename):
@@ -553,8 +1021,88 @@ def cli_parser(argv):
     if args.multi:
         multi = True
         num_proc = args.multi
+    if args.serve is not None:
+        multi = True
+        if args.save_cases is not None:
+            print('Error: --save-cases cannot be used with --serve')
+            sys.exit(1)
 
-    return filenames, convert, multi, num_proc
+    # Keywords set on the command line override the values in the
+    # input file.
+    options = {}
+    if args.dense_output:
+        options['denseOutput'] = True
+    if args.native_functions:
+        options['nativeFunctions'] = True
+    if args.buffer_size is not None:
+        if args.buffer_size < 1:
+            print('Error: The buffer size must be at least 1')
+            sys.exit(1)
+        options['bufferSize'] = args.buffer_size
+    if args.async_write is not None:
+        if args.async_write < 1:
+            print('Error: The write queue size must be at least 1')
+            sys.exit(1)
+        options['asyncQueueSize'] = args.async_write
+    if args.complib is not None:
+        options['complib'] = args.complib.lower()
+        if not known_complib(options['complib']):
+            print('Error: Unknown compression library: {}'.format(
+                args.complib))
+            sys.exit(1)
+    if args.complevel is not None:
+        if not 1 <= args.complevel <= 9:
+            print('Error: The compression level must be between 1 and 9')
+            sys.exit(1)
+        options['complevel'] = args.complevel
+    if args.chunk_rows is not None:
+        if args.chunk_rows < 1:
+            print('Error: The chunk size must be at least 1')
+            sys.exit(1)
+        options['chunkRows'] = args.chunk_rows
+    if args.max_wall_time is not None:
+        if args.max_wall_time <= 0:
+            print('Error: The wall time limit must be positive')
+            sys.exit(1)
+        options['maxWallTime'] = args.max_wall_time
+    if args.max_steps is not None:
+        if args.max_steps < 1:
+            print('Error: The step limit must be at least 1')
+            sys.exit(1)
+        options['maxSteps'] = args.max_steps
+
+    if args.results is not None:
+        extension = os.path.splitext(args.results)[1].lower()
+        if extension not in ('.h5', '.hdf', '.hdf5', '.csv', '.npz'):
+            print('Error: The results file must end in .h5, .hdf, .hdf5, '
+                  '.csv, or .npz')
+            sys.exit(1)
+
+    if args.threads_per_worker is not None and args.threads_per_worker < 1:
+        print('Error: The number of threads per worker must be at least 1')
+        sys.exit(1)
+    if args.pin is not None and not hasattr(os, 'sched_setaffinity'):
+        print('Error: Pinning workers is not supported on this platform')
+        sys.exit(1)
+    if args.max_tasks is not None and args.max_tasks < 1:
+        print('Error: The number of cases per worker must be at least 1')
+        sys.exit(1)
+
+    # Options for running multiple cases.
+    multi_options = {'sort': args.sort,
+                     'cache': not args.no_cache,
+                     'cache_size': args.cache_size,
+                     'results': args.results,
+                     'save_cases': args.save_cases,
+                     'threads': args.threads_per_worker,
+                     'pin': args.pin,
+                     'max_tasks': args.max_tasks,
+                     'serve': args.serve,
+                     'journal': args.journal,
+                     'resume': args.resume,
+                     }
+
+    return filenames, convert, multi, num_proc, options, multi_options
 
 
 def reactor_interpolate(interp_time, state1, state2):
@@ -572,6 +1120,97 @@ def reactor_interpolate(interp_time, state1, state2):
     return interp_state
 
 
+def hermite_interpolate(interp_time, time1, state1, deriv1, time2, state2,
+                        deriv2):
+    """Interpolate between two solver steps with a cubic Hermite spline.
+
+    :param interp_time:
+        Time at which the interpolated values should be calculated.
+    :param time1:
+        Time of the previous step.
+    :param state1:
+        Array of the solution at the previous step.
+    :param deriv1:
+        Array of the time derivative of the solution at the previous step.
+    :param time2:
+        Time of the current step.
+    :param state2:
+        Array of the solution at the current step.
+    :param deriv2:
+        Array of the time derivative of the solution at the current step.
+    """
+    h = time2 - time1
+    s = (interp_time - time1)/h
+    h00 = (1 + 2*s)*(1 - s)**2
+    h10 = s*(1 - s)**2
+    h01 = s**2*(3 - 2*s)
+    h11 = s**2*(s - 1)
+    return (h00*state1 + h10*h*deriv1 +
+            h01*state2 + h11*h*deriv2)
+
+
+# Maximum number of bisections in `find_crossing`. Halving the interval
+# this many times takes it well below the floating point spacing.
+MAX_BISECTIONS = 200
+
+
+def find_crossing(threshold, time1, value1, time2, value2, deriv1=None,
+                  deriv2=None, tol=None):
+    """Find the time where an interpolated value crosses a threshold.
+
+    If the derivatives at both ends are given, the value is interpolated
+    with a cubic Hermite spline and the crossing is found by bisection.
+    Otherwise, the value is interpolated linearly.
+
+    :param threshold:
+        The value to be crossed. ``value1`` should be below and
+        ``value2`` at or above the threshold.
+    :param time1:
+        Time at the start of the interval.
+    :param value1:
+        Value at the start of the interval.
+    :param time2:
+        Time at the end of the interval.
+    :param value2:
+        Value at the end of the interval.
+    :param deriv1:
+        Optional time derivative of the value at the start.
+    :param deriv2:
+        Optional time derivative of the value at the end.
+    :param tol:
+        Absolute tolerance of the crossing time for the bisection.
+        Optional, default: 1E-10 of the interval length. Tolerances
+        below the spacing of floating point numbers at ``time2`` are
+        raised to a few times that spacing.
+    :return crossing_time:
+        The time where the interpolated value reaches ``threshold``.
+    """
+    if value1 >= threshold:
+        return time1
+    if deriv1 is None or deriv2 is None:
+        return time1 + (threshold - value1)*(time2 - time1)/(value2 - value1)
+
+    if tol is None:
+        tol = 1.0E-10*(time2 - time1)
+    # The interval cannot shrink below the floating point spacing, so
+    # a smaller tolerance would never be reached. The iteration limit
+    # guards against any other case where it is not.
+    tol = max(tol, 4*sys.float_info.epsilon*abs(time2))
+    lower = time1
+    upper = time2
+    for i in range(MAX_BISECTIONS):
+        if upper - lower <= tol:
+            break
+        middle = (lower + upper)/2
+        value = hermite_interpolate(middle, time1, value1, deriv1, time2,
+                                    value2, deriv2)
+        if value >= threshold:
+            upper = middle
+        else:
+            lower = middle
+    return (lower + upper)/2
+
+
 def equivalence_ratio(gas, eq_ratio, fuel, oxidizer, complete_products,
                       additional_species):
     """Calculate the mixture mole fractions from the equivalence ratio.
@@ -0,0 +1,544 @@
+# Standard libraries
+import os
+import csv
+import time
+import threading
+from queue import Queue
+
+# Third-party modules
+import numpy as np
+import tables
+
+
+class BufferedTableWriter(object):
+    """
+    Collect rows for a :py:class:`tables.Table` in memory and write them
+    to disk in blocks. Rows are stored in a preallocated NumPy
+    structured array with the same ``dtype`` as the table, so filling a
+    row does not touch the HDF5 file at all. Used with the input
+    keywords :ref:`BUFS <BUFS>` and :ref:`BUFT <BUFT>`.
+    """
+
+    def __init__(self, table, buffer_size=100, buffer_time=None):
+        """Allocate the row buffer for the given table.
+
+        :param table:
+            The :py:class:`tables.Table` that rows will be written to.
+        :param buffer_size:
+            Number of rows to collect before they are written to the
+            table. A value of 1 writes every row as soon as it is
+            appended.
+        :param buffer_time:
+            Optional wall-clock time in seconds. If it is given, the
+            buffer is also written when this much time has passed
+            since the last write, even if it is not full.
+        """
+        if buffer_size < 1:
+            raise ValueError('The buffer size must be at least 1 row.')
+
+        self.table = table
+        self.buffer_size = int(buffer_size)
+        self.buffer_time = buffer_time
+        self.buffer = np.zeros(self.buffer_size, dtype=table.dtype)
+
+        # Index of the row in the buffer that is currently being
+        # filled. Rows before this index are complete and waiting to
+        # be written.
+        self.n_rows = 0
+        self.last_write = time.time()
+
+        # Copy of the most recently appended row, made when the buffer
+        # is written, so that `last_row` can still be read once the
+        # buffer is reused.
+        self.written_row = None
+
+    def __setitem__(self, name, value):
+        """Set the value of the column ``name`` in the current row."""
+        self.buffer[name][self.n_rows] = value
+
+    def __getitem__(self, name):
+        """Get the value of the column ``name`` in the current row."""
+        return self.buffer[name][self.n_rows]
+
+    @property
+    def last_row(self):
+        """The most recently appended row, or ``None`` if there is none.
+
+        The row is read from the buffer, or from the copy made when the
+        buffer was last written, without going to the file on disk. It
+        must not be modified.
+        """
+        if self.n_rows > 0:
+            return self.buffer[self.n_rows - 1]
+        return self.written_row
+
+    def append(self):
+        """Finish the current row and move on to the next one.
+
+        The buffer is written to the table when it is full, or when
+        the ``buffer_time`` has been exceeded.
+        """
+        self.n_rows += 1
+
+        if self.n_rows == self.buffer_size:
+            self.write()
+        elif (self.buffer_time is not None and
+              time.time() - self.last_write >= self.buffer_time):
+            self.write()
+
+    def write(self):
+        """Write the completed rows in the buffer to the table.
+
+        The rows are handed to PyTables in one block, but the table is
+        not flushed to disk; see `checkpoint`.
+        """
+        if self.n_rows > 0:
+            self.table.append(self.buffer[:self.n_rows])
+            self.written_row = self.buffer[self.n_rows - 1].copy()
+            self.n_rows = 0
+        self.last_write = time.time()
+
+    def checkpoint(self):
+        """Write any buffered rows and flush the table to disk."""
+        self.write()
+        self.table.flush()
+
+    def close(self):
+        """Write the remaining rows and flush the table to disk.
+
+        The row that is currently being filled is discarded if it has
+        not been appended, matching the behavior of
+        :py:class:`tables.Row`.
+        """
+        self.checkpoint()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Save as much as possible, but don't hide the original
+            # error behind an error from writing the file.
+            try:
+                self.close()
+            except Exception:
+                pass
+
+
+class ThreadedTableWriter(BufferedTableWriter):
+    """
+    Buffered writer that hands the blocks of rows to a background
+    thread, so that writing to the HDF5 file overlaps with the
+    integration. The blocks are passed through a bounded queue; when
+    the queue is full, the integration waits for the writer thread to
+    catch up. Used with the input keyword :ref:`ASYNC <ASYNC>`.
+    """
+
+    # Commands sent to the writer thread along with the blocks of rows
+    _FLUSH = 'flush'
+    _STOP = 'stop'
+
+    def __init__(self, table, buffer_size=100, buffer_time=None,
+                 queue_size=4):
+        """Allocate the row buffer and start the writer thread.
+
+        :param table:
+            The :py:class:`tables.Table` that rows will be written to.
+            The table must not be used by any other thread until this
+            writer is closed.
+        :param buffer_size:
+            Number of rows in each block passed to the writer thread.
+        :param buffer_time:
+            Optional wall-clock time in seconds after which a partial
+            block is passed to the writer thread.
+        :param queue_size:
+            Maximum number of blocks waiting to be written.
+        """
+        super(ThreadedTableWriter, self).__init__(table, buffer_size,
+                                                  buffer_time)
+        if queue_size < 1:
+            raise ValueError('The queue size must be at least 1 block.')
+
+        self.queue = Queue(maxsize=queue_size)
+        # An exception raised in the writer thread is stored here and
+        # raised again in the main thread.
+        self.error = None
+        self.thread = threading.Thread(target=self._drain,
+                                       name='cansen-writer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _drain(self):
+        """Write the blocks from the queue to the table.
+
+        Runs in the writer thread. After an error, the remaining
+        blocks are taken from the queue and discarded so that the main
+        thread never waits on a full queue.
+        """
+        while True:
+            item = self.queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                elif self.error is not None:
+                    continue
+                elif item is self._FLUSH:
+                    self.table.flush()
+                else:
+                    self.table.append(item)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _raise_error(self):
+        """Raise the exception from the writer thread, if there was one."""
+        if self.error is not None:
+            raise self.error
+
+    def write(self):
+        """Pass the completed rows in the buffer to the writer thread.
+
+        The rows are copied so that the buffer can be refilled while
+        the block is being written. Blocks if the queue is full.
+        """
+        self._raise_error()
+        if self.n_rows > 0:
+            block = self.buffer[:self.n_rows].copy()
+            self.queue.put(block)
+            self.written_row = block[-1]
+            self.n_rows = 0
+        self.last_write = time.time()
+
+    def checkpoint(self):
+        """Wait until all the buffered rows are written and flushed."""
+        self.write()
+        self.queue.put(self._FLUSH)
+        self.queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Write the remaining rows and stop the writer thread."""
+        if not self.thread.is_alive():
+            return
+        try:
+            self.checkpoint()
+        finally:
+            self.queue.put(self._STOP)
+            self.thread.join()
+
+
+class AdaptiveSaveFilter(object):
+    """
+    Choose which solver time steps are saved to the binary save file,
+    based on how much the reactor state changes. A time step is saved
+    when the temperature, pressure, or any tracked species has changed
+    by more than the tolerance since the last saved time step, or when
+    linear interpolation between the saved time steps would be off by
+    more than the tolerance at the time step before it. Used with the
+    input keyword :ref:`SVTL <SVTL>`.
+    """
+
+    def __init__(self, rtol, atol=0.0, max_interval=None):
+        """Set the tolerances.
+
+        A value ``x`` differs from the reference value ``x_ref`` when
+        ``abs(x - x_ref) > rtol*abs(x_ref) + atol``.
+
+        :param rtol:
+            Relative tolerance for the change in the state.
+        :param atol:
+            Absolute tolerance for the change in the state.
+        :param max_interval:
+            Optional maximum simulation time between saved time steps.
+        """
+        self.rtol = rtol
+        self.atol = atol
+        self.max_interval = max_interval
+        self.saved_state = None
+        # The most recent time step that was not saved, as a tuple of
+        # the state vector and the row to be saved.
+        self.pending = None
+
+    def _differs(self, state, reference):
+        """Check whether any element of the state vector has changed.
+
+        The first element of the state vectors is the time, which is
+        not compared.
+        """
+        return np.any(np.abs(state[1:] - reference[1:]) >
+                      self.rtol*np.abs(reference[1:]) + self.atol)
+
+    def start(self, state):
+        """Set the state vector of the first saved time step."""
+        self.saved_state = state
+        self.pending = None
+
+    def update(self, state, row):
+        """Return the rows that should be saved after a new time step.
+
+        :param state:
+            Array of the time followed by the state information that is
+            compared, at the new time step.
+        :param row:
+            The row to be saved for the new time step. The row is kept
+            until it is known whether it should be saved.
+        :return rows:
+            List of rows to be saved, in order. The list can include the
+            row of the previous time step.
+        """
+        rows = []
+        if self.pending is not None:
+            pending_state, pending_row = self.pending
+            fraction = ((pending_state[0] - self.saved_state[0]) /
+                        (state[0] - self.saved_state[0]))
+            interp_state = (self.saved_state +
+                            (state - self.saved_state)*fraction)
+            if self._differs(interp_state, pending_state):
+                rows.append(pending_row)
+                self.saved_state = pending_state
+
+        self.pending = (state, row)
+        if (self._differs(state, self.saved_state) or
+                (self.max_interval is not None and
+                 state[0] - self.saved_state[0] >= self.max_interval)):
+            rows.append(row)
+            self.saved_state = state
+            self.pending = None
+
+        return rows
+
+    def finish(self):
+        """Return the rows that should be saved at the end of the run.
+
+        The last time step is always saved, so that the saved history
+        covers the whole simulation.
+        """
+        rows = []
+        if self.pending is not None:
+            rows.append(self.pending[1])
+            self.saved_state = self.pending[0]
+            self.pending = None
+        return rows
+
+
+# Columns of the table of results of multiple cases, one row per case.
+# The temperature, pressure, and equivalence ratio are the keywords
+# that can be swept; the equivalence ratio is ``nan`` for cases where
+# the composition is given directly. The number of steps is -1 and the
+# wall time is ``nan`` for results read from the result cache.
+RESULT_DTYPE = np.dtype([('case', np.int64),
+                         ('temperature', np.float64),
+                         ('pressure', np.float64),
+                         ('eqRatio', np.float64),
+                         ('ignition_time', np.float64),
+                         ('n_steps', np.int64),
+                         ('wall_time', np.float64),
+                         ('status', 'S16'),
+                         ])
+
+RESULT_UNITS = {'temperature': 'K',
+                'pressure': 'atm',
+                'ignition_time': 's',
+                'wall_time': 's',
+                }
+
+
+class ResultWriter(object):
+    """
+    Write the results of multiple cases to a file with one row per case
+    and one column per field of `RESULT_DTYPE`. Subclasses write a
+    particular file format; use `open_result_writer` to pick the format
+    from the file name.
+    """
+
+    def __init__(self, filename):
+        """Open the results file.
+
+        :param filename:
+            Name of the results file.
+        """
+        self.filename = filename
+
+    @staticmethod
+    def make_row(index, keywords, ignition_time, stats=None):
+        """Return the results of one case as a row of `RESULT_DTYPE`.
+
+        :param index:
+            Index of the case in the input file.
+        :param keywords:
+            Dictionary of the keywords of the case.
+        :param ignition_time:
+            Ignition delay of the case, or ``None`` if ignition was not
+            found.
+        :param stats:
+            Dictionary of the status, number of solver steps, and wall
+            time of the case. The number of steps and wall time are
+            optional.
+        """
+        if stats is None:
+            stats = {}
+        row = np.zeros(1, dtype=RESULT_DTYPE)
+        row['case'] = index
+        row['temperature'] = keywords['temperature']
+        row['pressure'] = keywords['pressure']
+        eq_ratio = keywords.get('eqRatio')
+        row['eqRatio'] = eq_ratio if eq_ratio is not None else np.nan
+        row['ignition_time'] = (ignition_time if ignition_time is not None
+                                else np.nan)
+        row['n_steps'] = stats.get('n_steps', -1)
+        row['wall_time'] = stats.get('wall_time', np.nan)
+        row['status'] = stats.get('status', '').encode('ascii')
+        return row
+
+    def append(self, index, keywords, ignition_time, stats=None):
+        """Write the results of one case. See `make_row`."""
+        self.write(self.make_row(index, keywords, ignition_time, stats))
+
+    def write(self, row):
+        """Write one row of `RESULT_DTYPE` to the file."""
+        raise NotImplementedError
+
+    def close(self):
+        """Close the results file."""
+        pass
+
+
+class HDF5ResultWriter(ResultWriter):
+    """
+    Write the results of multiple cases to the ``results`` table of an
+    HDF5 file. The units of each column are stored as attributes of the
+    table, named ``<column>_units``.
+    """
+
+    def __init__(self, filename):
+        super(HDF5ResultWriter, self).__init__(filename)
+        self.file = tables.open_file(filename, mode='w',
+                                     title='CanSen Results File')
+        self.table = self.file.create_table(self.file.root, 'results',
+                                            RESULT_DTYPE, 'Case Results')
+        for column, units in RESULT_UNITS.items():
+            self.table.attrs[column + '_units'] = units
+
+    def write(self, row):
+        # Flush every row, so the file can be read while the cases are
+        # running and nothing is lost if the run is interrupted.
+        self.table.append(row)
+        self.table.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class CSVResultWriter(ResultWriter):
+    """
+    Write the results of multiple cases to a CSV file. The first line
+    is a header with the column names; the units are given in
+    brackets. Floats are written with full precision.
+    """
+
+    def __init__(self, filename):
+        super(CSVResultWriter, self).__init__(filename)
+        self.file = open(filename, 'w', newline='')
+        self.csv = csv.writer(self.file)
+        self.csv.writerow([
+            name + (' [{}]'.format(RESULT_UNITS[name])
+                    if name in RESULT_UNITS else '')
+            for name in RESULT_DTYPE.names
+            ])
+        self.file.flush()
+
+    def write(self, row):
+        row = row[0]
+        self.csv.writerow([
+            row[name].decode('ascii') if name == 'status'
+            else repr(row[name].item()) for name in RESULT_DTYPE.names
+            ])
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class NPZResultWriter(ResultWriter):
+    """
+    Write the results of multiple cases to a NumPy ``.npz`` file, with
+    one array per column and a ``results`` structured array with every
+    column. The format cannot be appended to, so the rows are collected
+    in memory and the file is written when it is closed.
+    """
+
+    def __init__(self, filename):
+        super(NPZResultWriter, self).__init__(filename)
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+
+    def close(self):
+        if self.rows:
+            results = np.concatenate(self.rows)
+        else:
+            results = np.zeros(0, dtype=RESULT_DTYPE)
+        columns = {name: results[name] for name in RESULT_DTYPE.names}
+        np.savez(self.filename, results=results, **columns)
+
+
+# Result writers by file name extension.
+RESULT_WRITERS = {'.h5': HDF5ResultWriter,
+                  '.hdf': HDF5ResultWriter,
+                  '.hdf5': HDF5ResultWriter,
+                  '.csv': CSVResultWriter,
+                  '.npz': NPZResultWriter,
+                  }
+
+
+def open_result_writer(filename):
+    """Return a `ResultWriter` for the format given by the extension.
+
+    :param filename:
+        Name of the results file. The extension must be one of
+        ``.h5``, ``.hdf``, ``.hdf5``, ``.csv``, or ``.npz``.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in RESULT_WRITERS:
+        raise ValueError('Unknown results file format: {}'.format(filename))
+    return RESULT_WRITERS[extension](filename)
+
+
+def write_master_file(filename, rows, case_files):
+    """Write the file that indexes the time histories of multiple cases.
+
+    The master file has a ``results`` table, with the same columns as
+    the tables written by `ResultWriter`, and a ``cases`` group with an
+    external link named ``case_<index>`` to the ``reactor`` table of
+    each case file. The links are relative to the directory of the
+    master file, so the directory can be moved as a whole.
+
+    :param filename:
+        Name of the master file.
+    :param rows:
+        List of rows of `RESULT_DTYPE`, from `ResultWriter.make_row`.
+    :param case_files:
+        Dictionary of the names of the case files, relative to the
+        directory of the master file, keyed by the index of the case.
+    """
+    if rows:
+        results = np.sort(np.concatenate(rows), order='case')
+    else:
+        results = np.zeros(0, dtype=RESULT_DTYPE)
+    with tables.open_file(filename, mode='w',
+                          title='CanSen Master File') as master_file:
+        table = master_file.create_table(master_file.root, 'results',
+                                         RESULT_DTYPE, 'Case Results')
+        table.append(results)
+        for column, units in RESULT_UNITS.items():
+            table.attrs[column + '_units'] = units
+        group = master_file.create_group(master_file.root, 'cases',
+                                         'Case Time Histories')
+        for index in sorted(case_files):
+            master_file.create_external_link(
+                group, 'case_{}'.format(index),
+                case_files[index] + ':/reactor')
@@ -8,6 +8,17 @@ keywords['ADD'] = ("Mole fractions of species that should be included in the "
                    "ratio option is used to specify the composition. See "
                    "|CPROD|_, |EQUI|_, |FUEL|_, |OXID|_, |REAC|_.\n\n"
                    "Example::\n\n    ADD Ar 0.1")
+keywords['ASYNC'] = ("CanSen specific keyword. Write the binary save file "
+                     "from a background thread, so that writing to the disk "
+                     "overlaps with the integration. The time steps are "
+                     "passed to the thread in blocks of |BUFS|_ time steps. "
+                     "Optionally, specify the maximum number of blocks "
+                     "waiting to be written; when this many blocks are "
+                     "waiting, the integration pauses until the thread "
+                     "catches up. Can be overridden by the ``--async-write`` "
+                     "command line option. Optional keyword, default queue "
+                     "size: 4.\n\n"
+                     "Example::\n\n    ASYNC 8")
 keywords['ATLS'] = ("Absolute tolerance of the accuracy of the sensitivity "
                     "coefficients. Optional keyword, default: 1E-06\n\n"
                     "Example::\n\n    ATLS 1E-06")
@@ -15,6 +26,44 @@ keywords['ATOL'] = ("Absolute tolerance of the accuracy of the solution. "
                     "Should be set smaller than the smallest meaningful "
                     "species mass fraction. Optional keyword, default: "
                     "1E-20\n\nExample::\n\n    ATOL 1E-20")
+keywords['BUFS'] = ("CanSen specific keyword. Number of time steps to collect "
+                    "in memory before they are written to the binary save "
+                    "file. Larger values reduce the time spent writing to the "
+                    "disk, at the cost of memory. A value of 1 writes every "
+                    "time step as soon as it is computed. Can be overridden "
+                    "by the ``--buffer-size`` command line option. See "
+                    "|BUFT|_. Optional keyword, default: 100.\n\n"
+                    "Example::\n\n    BUFS 1000")
+keywords['BUFT'] = ("CanSen specific keyword. Maximum wall-clock time between "
+                    "writes to the binary save file. The buffered time steps "
+                    "are written when this time has passed, even if the "
+                    "buffer set by |BUFS|_ is not full. Optional keyword, by "
+                    "default, the buffer is only written when it is full. "
+                    "Units: seconds.\n\n"
+                    "Example::\n\n    BUFT 60")
+keywords['CHNK'] = ("CanSen specific keyword. Number of time steps stored in "
+                    "each chunk of the binary save file. Larger chunks "
+                    "usually compress better and are faster to read in full, "
+                    "while smaller chunks are faster to read a few time "
+                    "steps from. Can be overridden by the ``--chunk-rows`` "
+                    "command line option. The chunk size is stored in the "
+                    "``chunkshape`` attribute of the ``reactor`` table. "
+                    "Optional keyword, by default PyTables chooses the chunk "
+                    "size.\n\n"
+                    "Example::\n\n    CHNK 64")
+keywords['COMP'] = ("CanSen specific keyword. Compress the binary save file "
+                    "with the given compression library and, optionally, "
+                    "compression level from 1 to 9 (default: 5). Any "
+                    "library supported by PyTables can be used, e.g., "
+                    "``zlib``, ``blosc``, or ``blosc:lz4``. The shuffle "
+                    "filter is always used with compression. The "
+                    "compression settings are stored in the ``complib``, "
+                    "``complevel``, and ``shuffle`` attributes of the "
+                    "``reactor`` table. Can be overridden by the "
+                    "``--complib`` and ``--complevel`` command line options. "
+                    "See |CHNK|_. Optional keyword, by default the file is "
+                    "not compressed.\n\n"
+                    "Example::\n\n    COMP blosc:lz4 5")
 keywords['CONP'] = ("Solve a constant pressure reactor with the energy "
                     "equation on. One of |CONP|_, |CONT|_, |CONV|_, |COTV|_, "
                     "|ICEN|_, |TPRO|_, |TTIM|_, |VPRO|_, or |VTIM|_ must be "
@@ -43,6 +92,18 @@ keywords['DELT'] = ("Time interval for printing to the screen and the text "
                     "output file. Optional keyword, default: |TIME|_/100."
                     "Units: seconds.\n\n"
                     "Example::\n\n    DELT 1E-03")
+keywords['DENS'] = ("CanSen specific keyword. Use dense output for the "
+                    "printed and saved values. The solver takes its natural "
+                    "step size, and the values at the print times set by "
+                    "|DELT|_ and the save times set by |DTSV|_ are computed "
+                    "by cubic Hermite interpolation of the solution between "
+                    "steps, using the solution derivatives from the solver. "
+                    "With dense output, |DELT|_ and |DTSV|_ do not limit the "
+                    "solver step size and values are saved at exactly the "
+                    "|DTSV|_ interval; the maximum step size is only set if "
+                    "|STPT|_ is specified. Requires Cantera 2.5 or newer. Can "
+                    "also be set by the ``--dense-output`` command line "
+                    "option. Optional keyword.")
 keywords['DTIGN'] = ("Temperature threshold used to determine the ignition "
                      "delay. Ignition temperature is the initial temperature "
                      "|TEMP|_ plus this value. Will be ignored for cases with "
@@ -52,9 +113,18 @@ keywords['DTIGN'] = ("Temperature threshold used to determine the ignition "
                      "\n\nExample::\n\n    DTIGN 400")
 keywords['DTSV'] = ("Time interval for saving to the binary save file. Values "
                     "are stored at the nearest time step to the save time "
-                    "interval. Optional keyword, by default, all time points "
-                    "are saved to the binary save file. Units: seconds.\n\n"
+                    "interval. If |SVTL|_ is specified, |DTSV|_ is the "
+                    "maximum time between saved time steps instead. Optional "
+                    "keyword, by default, all time points are saved to the "
+                    "binary save file. Units: seconds.\n\n"
                     "Example::\n\n    DTSV 1E-05")
+keywords['ELST'] = ("CanSen specific keyword. List of equivalence ratios to "
+                    "sweep over when running multiple cases with the "
+                    "``--multi`` option. One case is run for each "
+                    "combination of the values of |ELST|_, |PLST|_, and "
+                    "|TRNG|_. Replaces |EQUI|_, and requires |FUEL|_, "
+                    "|OXID|_, and |CPROD|_.\n\n"
+                    "Example::\n\n    ELST 0.5 1.0 2.0")
 keywords['END'] = ("Signifies the end of the input file in SENKIN. It is "
                    "included in CanSen for compatibility with SENKIN input "
                    "files, but does not do anything. Any CanSen specific "
@@ -80,6 +150,23 @@ keywords['IGNBREAK'] = ("CanSen specific keyword. Indicates that the "
                         "instead of continuing until the end time |TIME|_ is "
                         "reached. The criterion for ignition is specified by "
                         "|DTIGN|_ or |TLIM|_. Optional keyword.")
+keywords['IGNTOL'] = ("CanSen specific keyword. Tolerance of the ignition "
+                      "time. When the ignition temperature set by |DTIGN|_ "
+                      "or |TLIM|_ is crossed between two solver steps, the "
+                      "temperature is interpolated between the steps and the "
+                      "crossing time is found to within this tolerance. The "
+                      "interpolation is cubic, using the temperature "
+                      "derivatives from the solver, with Cantera 2.5 or "
+                      "newer, and linear otherwise. Optional keyword, "
+                      "default: 1E-10 of the step size. Units: seconds.\n\n"
+                      "Example::\n\n    IGNTOL 1E-12")
+keywords['MXST'] = ("CanSen specific keyword. With the ``--multi`` option, "
+                    "the maximum number of solver steps of a case. A case that "
+                    "takes more steps is stopped, and its status in the output "
+                    "file is ``max-steps``. Can be overridden by the "
+                    "``--max-steps`` command line option. Optional keyword, "
+                    "by default there is no limit. See |WTIM|_.\n\n"
+                    "Example::\n\n    MXST 100000")
 keywords['OXID'] = ("Relative mole fractions of components in the oxidizer "
                     "mixture for equivalence ratio calculations. The sum of "
                     "the oxidizer mole fractions should be 1.0; if they are "
@@ -88,6 +175,12 @@ keywords['OXID'] = ("Relative mole fractions of components in the oxidizer "
                     "specified. See |ADD|_, |CPROD|_, |EQUI|_, |FUEL|_, "
                     "|REAC|_.\n\n"
                     "Example::\n\n    OXID O2 1.0\n    OXID N2 3.76")
+keywords['PLST'] = ("CanSen specific keyword. List of initial pressures to "
+                    "sweep over when running multiple cases with the "
+                    "``--multi`` option. One case is run for each "
+                    "combination of the values of |ELST|_, |PLST|_, and "
+                    "|TRNG|_. Replaces |PRES|_. Units: atmospheres.\n\n"
+                    "Example::\n\n    PLST 1.0 10.0 20.0")
 keywords['PRES'] = ("Initial reactor pressure. Required keyword. Units: "
                     "atmospheres.\n\n"
                     "Example::\n\n    PRES 1.0")
@@ -124,8 +217,32 @@ keywords['STPT'] = ("Maximum internal time step for the solver. Optional "
                     "keyword. If any of |DELT|_, |DTSV|_, or |STPT|_ are "
                     "specified, the minimum of these is used as the maximum "
                     "internal time step. Otherwise, the default maximum time "
-                    "step is the end time |TIME|_/100.\n\n"
+                    "step is the end time |TIME|_/100. If |DENS|_ is "
+                    "specified, only |STPT|_ limits the internal time step, "
+                    "and there is no limit by default.\n\n"
                     "Example::\n\n    STPT 1E-5")
+keywords['SVSP'] = ("CanSen specific keyword. Species whose mass fraction is "
+                    "tracked by |SVTL|_ to decide which time steps are saved. "
+                    "Multiple invocations of this keyword add more species. "
+                    "Optional keyword, by default all of the species are "
+                    "tracked.\n\n"
+                    "Example::\n\n    SVSP OH\n    SVSP CH4")
+keywords['SVTL'] = ("CanSen specific keyword. Save only the time steps "
+                    "where the reactor state has changed. A time step is "
+                    "saved to the binary save file when the temperature, "
+                    "pressure, or the mass fraction of any tracked species "
+                    "(see |SVSP|_) has changed by more than the tolerance "
+                    "since the last saved time step, or when linearly "
+                    "interpolating between the saved time steps would miss "
+                    "the state at the previous time step by more than the "
+                    "tolerance. The first value is the relative tolerance "
+                    "and the optional second value is the absolute "
+                    "tolerance, default: 1E-08. If |DTSV|_ is also "
+                    "specified, it sets the maximum time between saved time "
+                    "steps. The last time step is always saved. Optional "
+                    "keyword, by default, all time points are saved to the "
+                    "binary save file.\n\n"
+                    "Example::\n\n    SVTL 0.01 1E-06")
 keywords['TEMP'] = ("Initial reactor temperature. Required keyword. Units: "
                     "K.\n\n"
                     "Example::\n\n    TEMP 800")
@@ -135,7 +252,10 @@ keywords['TIME'] = ("End time for the integration. Unless, |IGNBREAK|_ is "
                     "Units: seconds.\n\n"
                     "Example::\n\n    TIME 1E-03")
 keywords['TLIM'] = ("Ignition temperature. Ignition is considered to have "
-                    "occurred when this temperature is exceeded. If both "
+                    "occurred when this temperature is exceeded. The "
+                    "ignition time is interpolated between the solver steps "
+                    "before and after the temperature is exceeded; see "
+                    "|IGNTOL|_. If both "
                     "|DTIGN|_ and |TLIM|_ are specified, |TLIM|_ overrides "
                     "|DTIGN|_. Optional keyword, default: |TEMP|_ + 400. "
                     "Units: K.\n\n"
@@ -150,8 +270,22 @@ keywords['TPRO'] = ("Warning: |TPRO|_ is broken in CanSen v1.1 due to "
                     "is exceeded, the temperature remains constant at the "
                     "last specified value. One of |CONP|_, |CONT|_, |CONV|_, "
                     "|COTV|_, |ICEN|_, |TPRO|_, |TTIM|_, |VPRO|_, or |VTIM|_ "
-                    "must be specified. Units: seconds, K.\n\n"
+                    "must be specified. Units: seconds, K. See |TPRF|_ to "
+                    "read the profile from a file.\n\n"
                     "Example::\n\n    TPRO 0.0 800\n    TPRO 0.1 900")
+keywords['TPRF'] = ("CanSen specific keyword. Read the temperature profile of "
+                    "|TPRO|_ from a file instead of the input file. The file "
+                    "has two columns, the time and the temperature, in one of "
+                    "the formats of |VPRF|_. Cannot be combined with "
+                    "|TPRO|_. Units: seconds, K.\n\n"
+                    "Example::\n\n    TPRF temperature.npy")
+keywords['TRNG'] = ("CanSen specific keyword. Range of initial temperatures "
+                    "to sweep over when running multiple cases with the "
+                    "``--multi`` option, given as the first temperature, "
+                    "the last temperature, and the step. One case is run for "
+                    "each combination of the values of |ELST|_, |PLST|_, and "
+                    "|TRNG|_. Replaces |TEMP|_. Units: K.\n\n"
+                    "Example::\n\n    TRNG 700 1200 25")
 keywords['TTIM'] = ("Warning: |TTIM|_ is broken in CanSen v1.1 due to "
                     "incompatibilites with Cantera 2.1. "
                     "Specify the reactor temperature as a user-provided "
@@ -182,8 +316,48 @@ keywords['VPRO'] = ("Specify the reactor volume as a function of time. "
                     "is exceeded, the volume remains constant at the "
                     "last specified value. One of |CONP|_, |CONT|_, |CONV|_, "
                     "|COTV|_, |ICEN|_, |TPRO|_, |TTIM|_, |VPRO|_, or |VTIM|_ "
-                    "must be specified. Units: seconds, m**3.\n\n"
+                    "must be specified. Units: seconds, m**3. See |VPRF|_ "
+                    "to read the profile from a file and |VSMO|_ to smooth "
+                    "it.\n\n"
                     "Example::\n\n    VPRO 0.0 1E-5\n    VPRO 0.1 1E-6")
+keywords['VPRF'] = ("CanSen specific keyword. Read the volume profile of "
+                    "|VPRO|_ from a file instead of the input file, which is "
+                    "much faster for long measured profiles. The file has two "
+                    "columns, the time and the volume, and can be a NumPy "
+                    "``.npy`` file, a raw binary ``.bin`` file of 64-bit "
+                    "floats in native byte order, a comma separated ``.csv`` "
+                    "file, or a whitespace separated text file with any "
+                    "other extension. Binary files are memory-mapped, and "
+                    "text files are converted once to a ``.npy`` file in the "
+                    "user cache directory, so the processes of ``--multi`` "
+                    "share one copy of the profile. A relative filename is "
+                    "relative to the directory of the input file. Cannot be "
+                    "combined with |VPRO|_. Units: seconds, m**3.\n\n"
+                    "Example::\n\n    VPRF volume.npy")
+keywords['VSMO'] = ("CanSen specific keyword. Smooth the volume profile set "
+                    "by |VPRO|_. By default, the piston velocity is constant "
+                    "between the points of the profile and jumps at each "
+                    "point, which forces the solver to take small steps. "
+                    "With ``PCHIP``, the volume is interpolated by a "
+                    "monotone cubic curve through the points, and the "
+                    "velocity is its derivative, so it is continuous. With "
+                    "``SPLINE``, a cubic smoothing spline is fit to the "
+                    "points instead, which also removes noise from measured "
+                    "profiles; optionally, specify the regularization "
+                    "parameter of the spline, which is otherwise chosen by "
+                    "generalized cross-validation. ``SPLINE`` requires "
+                    "SciPy 1.10 or newer. The times of the profile must be "
+                    "strictly increasing. Optional keyword, by default the "
+                    "profile is not smoothed.\n\n"
+                    "Example::\n\n    VSMO PCHIP\n    VSMO SPLINE 1E-9")
+keywords['WTIM'] = ("CanSen specific keyword. With the ``--multi`` option, "
+                    "the maximum wall time of a case, in seconds. A case that "
+                    "runs longer is stopped, and its status in the output "
+                    "file is ``wall-time``. The limit is checked after each "
+                    "solver step. Can be overridden by the "
+                    "``--max-wall-time`` command line option. Optional "
+                    "keyword, by default there is no limit. See |MXST|_."
+                    "\n\nExample::\n\n    WTIM 600")
 keywords['VTIM'] = ("Specify the reactor volume as a user-provided "
                     "function of time. To use this keyword, the user must "
                     "edit the :class:`~user_routines.VolumeFunctionTime` "
@@ -262,18 +436,10 @@ with open('keywords.rst', 'wb') as out_file:
     out_file.write(preamble.encode('utf-8'))
     out_file.write('\n\n'.encode('utf-8'))
     for items in grouped:
-        out_file.write('| '.encode('utf-8'))
-        if items[-1]:
-            for item in items[:-1]:
-                out_file.write(item.encode('utf-8'))
-            out_file.write(items[-1].rstrip().encode('utf-8'))
-        else:
-            for i, item in enumerate(items):
-                if items[i]:
-                    out_file.write(item.rstrip().encode('utf-8'))
-                else:
-                    out_file.write(item.encode('utf-8'))
-        out_file.write('\n'.encode('utf-8'))
+        # A reference must be followed by a space, so the items of the
+        # last, partly filled row are separated like the others.
+        row = ' '.join(item.rstrip() for item in items if item)
+        out_file.write(('| ' + row + '\n').encode('utf-8'))
     out_file.write('\n====\n\n'.encode('utf-8'))
     for key in sorted_keys[:-1]:
         out_file.write(bytes('.. |' + key + '| replace:: ``' + key + '``\n',
@@ -0,0 +1,59 @@
+"""Tests of the caches in cansen.cache."""
+# Standard libraries
+import os
+
+# Third-party modules
+import pytest
+
+# Local imports
+from cansen.cache import ResultCache, atomic_write
+
+
+def test_size_is_kept_up_to_date(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'), max_size=1.0)
+    for i in range(50):
+        cache.put('key{}'.format(i), [1e-3*i, 1.0, 1000.0])
+        cache.put_runtime('hash', {'temperature': 1000.0 + i,
+                                   'pressure': 1.0}, 0.1*i)
+    # Replacing an entry changes the size by the difference only.
+    cache.put('key0', [None, 1.0, 1000.0])
+    cache.put_runtime('hash', {'temperature': 1000.0, 'pressure': 1.0}, 5.0)
+    assert cache.n_bytes == cache.count_bytes()
+    cache.close()
+
+    cache = ResultCache(str(tmp_path / 'results.sqlite'), max_size=1.0)
+    assert cache.get('key0') == [None, 1.0, 1000.0]
+    assert len(cache.get_runtimes('hash')) == 50
+    cache.close()
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'), max_size=0.01)
+    result = ['x'*1000]
+    for i in range(20):
+        cache.put('key{}'.format(i), result)
+    assert cache.size() <= 0.01
+    assert cache.n_bytes == cache.count_bytes()
+    assert cache.get('key0') is None
+    assert cache.get('key19') == result
+    cache.close()
+
+
+def test_atomic_write(tmp_path):
+    filename = str(tmp_path / 'profile.npy')
+    with atomic_write(filename, '.npy') as tmp_filename:
+        assert tmp_filename.endswith('.npy')
+        with open(tmp_filename, 'w') as tmp_file:
+            tmp_file.write('complete')
+        assert not os.path.exists(filename)
+    with open(filename) as written:
+        assert written.read() == 'complete'
+
+    # A failed write leaves neither the file nor the temporary file.
+    other_filename = str(tmp_path / 'mechanism.cti')
+    with pytest.raises(ValueError):
+        with atomic_write(other_filename) as tmp_filename:
+            with open(tmp_filename, 'w') as tmp_file:
+                tmp_file.write('partial')
+            raise ValueError('conversion failed')
+    assert sorted(os.listdir(str(tmp_path))) == ['profile.npy']
@@ -0,0 +1,93 @@
+"""Tests of the main driver in cansen.cansen."""
+# Standard libraries
+import os
+
+# Third-party modules
+import pytest
+
+# Local imports
+from cansen import utils
+from cansen import affinity
+from cansen.cansen import main
+from cansen._version import __version__
+
+ct = pytest.importorskip('cantera')
+
+INPUT = """CONV
+TEMP 1500.0
+PRES 1.0
+EQUI 1.0
+FUEL CH4 1.0
+OXID O2 1.0
+OXID N2 3.76
+VOL 1.0
+CPROD CO2
+CPROD H2O
+CPROD N2
+TIME 1.0E-3
+END
+"""
+
+
+def run_main(tmp_path, monkeypatch, multi_options):
+    """Run two cases with a CHEMKIN format mechanism and ``--multi``.
+
+    The conversion itself is replaced by the GRI-Mech 3.0 mechanism
+    that comes with Cantera, so that only the handling of the
+    filenames by `main` is tested.
+    """
+    mech_filename = os.path.join(os.path.dirname(ct.__file__), 'data',
+                                 'gri30.xml')
+    if not os.path.isfile(mech_filename):
+        pytest.skip('gri30.xml is not installed with Cantera')
+    monkeypatch.setattr(utils, 'convert_mech',
+                        lambda *args, **kwargs: mech_filename)
+    (tmp_path / 'chem.inp').write_text('')
+    (tmp_path / 'in.inp').write_text(INPUT + INPUT.replace('1500.0', '1400.0'))
+    filenames = {'input_filename': str(tmp_path / 'in.inp'),
+                 'output_filename': str(tmp_path / 'output.out'),
+                 'save_filename': None,
+                 'mech_filename': str(tmp_path / 'chem.inp'),
+                 'thermo_filename': None,
+                 }
+    multi_options.update(cache=False)
+    main(filenames, False, True, 1, __version__, multi_options=multi_options)
+    with open(filenames['output_filename']) as output_file:
+        return [line for line in output_file if not line.startswith('#')]
+
+
+def test_multi_with_chemkin_mechanism(tmp_path, monkeypatch):
+    lines = run_main(tmp_path, monkeypatch, {})
+    assert len(lines) == 2
+    assert (tmp_path / 'output.out.journal').is_file()
+
+
+def test_multi_sort_with_chemkin_mechanism(tmp_path, monkeypatch):
+    journal_filename = str(tmp_path / 'cases.journal')
+    lines = run_main(tmp_path, monkeypatch, {'journal': journal_filename,
+                                             'sort': True})
+    assert [line.split()[0] for line in lines] == ['0', '1']
+    assert os.path.isfile(journal_filename)
+
+
+def test_threads_are_limited_before_conversion(tmp_path, monkeypatch):
+    for name in affinity.THREAD_ENV_VARS:
+        monkeypatch.delenv(name, raising=False)
+    seen = {}
+
+    def convert_mech(*args, **kwargs):
+        seen.update({name: os.environ.get(name)
+                     for name in affinity.THREAD_ENV_VARS})
+        raise RuntimeError('stop after the conversion')
+
+    monkeypatch.setattr(utils, 'convert_mech', convert_mech)
+    filenames = {'input_filename': str(tmp_path / 'in.inp'),
+                 'output_filename': str(tmp_path / 'output.out'),
+                 'save_filename': None,
+                 'mech_filename': str(tmp_path / 'chem.inp'),
+                 'thermo_filename': None,
+                 }
+    with pytest.raises(RuntimeError, match='stop after the conversion'):
+        main(filenames, False, True, 1, __version__,
+             multi_options={'threads': 2})
+    assert seen == {name: '2' for name in affinity.THREAD_ENV_VARS}
@@ -0,0 +1,155 @@
+"""Tests of the coordinator of remote workers in cansen.distributed.
+
+The workers are played by sockets on localhost that follow the
+protocol of `~cansen.distributed.run_worker` without running cases, so
+Cantera is not needed.
+"""
+# Standard libraries
+import time
+import socket
+import threading
+
+# Local imports
+from cansen import distributed
+
+
+def make_jobs(n_jobs):
+    return [[{'temperature': 1000.0 + 100*index}, index]
+            for index in range(n_jobs)]
+
+
+class FakeWorker(object):
+    """A worker connected to the coordinator that returns fixed results."""
+
+    def __init__(self, address):
+        self.sock = socket.create_connection(address)
+        self.stream = self.sock.makefile('rb')
+        self.setup = self.send({'type': 'hello'})
+
+    def send(self, message):
+        distributed.send_message(self.sock, message)
+        return distributed.read_message(self.stream)
+
+    def request(self):
+        return self.send({'type': 'request'})
+
+    def send_result(self, index, ignition_time=1e-3):
+        # Results have no reply; the messages of a connection are
+        # handled in order, so the result has been handled once the
+        # reply to the next message of this worker arrives.
+        distributed.send_message(self.sock, {
+            'type': 'result', 'index': index,
+            'result': [ignition_time, 1.0, 1000.0],
+            'stats': {'status': 'ignition'}})
+
+    def run(self):
+        """Run cases until there are none left, like `run_worker`."""
+        while True:
+            message = self.request()
+            if message is None or message['type'] == 'done':
+                return
+            if message['type'] == 'wait':
+                time.sleep(message['delay'])
+            elif message['type'] == 'case':
+                self.send_result(message['index'])
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+
+def collect(coordinator):
+    """Collect the results of the coordinator in a background thread."""
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.extend(coordinator.results()), daemon=True)
+    thread.start()
+    return thread, results
+
+
+def test_requeue_on_disconnect():
+    coordinator = distributed.Coordinator(('localhost', 0), make_jobs(5),
+                                          {'options': None})
+    try:
+        thread, results = collect(coordinator)
+        lost = FakeWorker(coordinator.address)
+        assert lost.setup['type'] == 'setup'
+        assert lost.request()['index'] == 0
+        lost.close()
+
+        worker = FakeWorker(coordinator.address)
+        worker.run()
+        worker.close()
+        thread.join(10.0)
+        assert sorted(index for index, res, stats in results) == list(range(5))
+    finally:
+        coordinator.close()
+
+
+def test_requeue_on_missed_heartbeats(monkeypatch):
+    monkeypatch.setattr(distributed, 'HEARTBEAT_TIMEOUT', 0.2)
+    monkeypatch.setattr(distributed, 'WAIT_TIME', 0.05)
+    coordinator = distributed.Coordinator(('localhost', 0), make_jobs(3),
+                                          {'options': None})
+    try:
+        thread, results = collect(coordinator)
+        silent = FakeWorker(coordinator.address)
+        assert silent.request()['index'] == 0
+
+        # The other worker waits for the case of the silent worker
+        # until the silent worker is given up on.
+        worker = FakeWorker(coordinator.address)
+        worker.run()
+        thread.join(10.0)
+        assert sorted(index for index, res, stats in results) == [0, 1, 2]
+        # The connection of the silent worker is closed.
+        assert silent.stream.readline() == b''
+        silent.close()
+        worker.close()
+    finally:
+        coordinator.close()
+
+
+def test_duplicate_results_are_ignored():
+    coordinator = distributed.Coordinator(('localhost', 0), make_jobs(2),
+                                          {'options': None})
+    try:
+        first = FakeWorker(coordinator.address)
+        second = FakeWorker(coordinator.address)
+        assert first.request()['index'] == 0
+        first.send_result(0, ignition_time=1e-3)
+        first.send_result(0, ignition_time=2e-3)
+        assert first.request()['index'] == 1
+        second.send_result(0, ignition_time=3e-3)
+        assert second.request()['type'] == 'wait'
+        first.send_result(1)
+        assert first.request()['type'] == 'done'
+
+        results = list(coordinator.results())
+        assert [(index, res[0]) for index, res, stats in results] == [
+            (0, 1e-3), (1, 1e-3)]
+        assert coordinator.results_queue.empty()
+        first.close()
+        second.close()
+    finally:
+        coordinator.close()
+
+
+def test_serve_address_defaults_to_localhost():
+    assert distributed.parse_address('5000') == ('localhost', 5000)
+    assert distributed.parse_address('0.0.0.0:5000') == ('0.0.0.0', 5000)
+
+
+def test_profiles_are_sent_to_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    (tmp_path / 'mech.cti').write_text('')
+    profile = tmp_path / 'vol.csv'
+    profile.write_bytes(b'0.0,1.0\r\n0.05,0.5\r\n')
+    jobs = [[{'vproFile': str(profile)}, 0], [{'vproFile': str(profile)}, 1]]
+    setup = distributed.worker_setup(
+        {'mech_filename': str(tmp_path / 'mech.cti')}, None, jobs)
+    profile_filenames = distributed.write_profiles(setup)
+    local_filename = profile_filenames[str(profile)]
+    assert local_filename.endswith('.csv')
+    with open(local_filename, 'rb') as local_file:
+        assert local_file.read() == profile.read_bytes()
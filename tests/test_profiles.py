@@ -0,0 +1,118 @@
+"""Tests of the volume, temperature, and engine profiles."""
+# Third-party modules
+import numpy as np
+import pytest
+
+# Local imports
+from cansen.profiles import VolumeProfile, TemperatureProfile, ICEngineProfile
+
+TIME = np.linspace(0.0, 0.05, 201)
+
+
+def volume_keywords():
+    return {'vproTime': TIME.tolist(),
+            'vproVol': (1.0 - 0.5*np.sin(TIME/TIME[-1]*np.pi)**2).tolist(),
+            }
+
+
+def temperature_keywords():
+    return {'TproTime': TIME.tolist(),
+            'TproTemp': (800.0 + 400.0*TIME/TIME[-1]).tolist(),
+            }
+
+
+def sample_times():
+    """Random times in and after the profile, away from the points."""
+    return np.random.default_rng(0).uniform(0.0, 1.5*TIME[-1], 2000)
+
+
+def native_function(profile):
+    pytest.importorskip('cantera')
+    function = profile.native_function()
+    if function is None:
+        pytest.skip('Tabulated functions need Cantera 2.5 or newer')
+    return function
+
+
+@pytest.mark.parametrize('profile_class, keywords', [
+    (VolumeProfile, volume_keywords),
+    (TemperatureProfile, temperature_keywords),
+])
+def test_native_function_agrees(profile_class, keywords):
+    profile = profile_class(keywords())
+    function = native_function(profile)
+    for t in sample_times():
+        assert function(t) == pytest.approx(profile(t), rel=1e-12, abs=1e-12)
+
+
+@pytest.mark.parametrize('profile_class, keyword, smoothing', [
+    (VolumeProfile, 'vproFile', None),
+    (VolumeProfile, 'vproFile', 'pchip'),
+    (TemperatureProfile, 'TproFile', None),
+])
+def test_file_profile_tables_are_shared(tmp_path, profile_class, keyword,
+                                        smoothing):
+    filename = str(tmp_path / 'profile.npy')
+    np.save(filename, np.column_stack([TIME, 1.0 + TIME]))
+    keywords = {keyword: filename, 'vproSmoothing': smoothing}
+    first = profile_class(keywords)
+    second = profile_class(keywords)
+    assert first.time_list is second.time_list
+    if profile_class is VolumeProfile:
+        assert first.step_velocity is second.step_velocity
+        assert first.slopes is second.slopes
+        assert first(TIME[-1]/2) == second(TIME[-1]/2)
+    else:
+        assert first.temp_list is second.temp_list
+        assert first(TIME[-1]/2) == pytest.approx(1.0 + TIME[-1]/2)
+
+
+def test_engine_velocity_is_piston_speed():
+    keywords = {'rod_radius_ratio': 3.5,
+                'rev_per_min': 1500.0,
+                'stroke_length': 0.1,
+                'start_crank_angle': 180.0,
+                }
+    profile = ICEngineProfile(keywords)
+    crank_radius = keywords['stroke_length']/2
+    rod_length = keywords['rod_radius_ratio']*crank_radius
+
+    def piston_position(t):
+        # Distance from the crank axis to the piston pin, from Heywood.
+        theta = profile.start_crank_rad - profile.omega*t
+        return (crank_radius*np.cos(theta) +
+                np.sqrt(rod_length**2 - (crank_radius*np.sin(theta))**2))
+
+    dt = 1e-7
+    for t in np.linspace(0.0, 2*np.pi/profile.omega, 37):
+        speed = (piston_position(t + dt) - piston_position(t - dt))/(2*dt)
+        assert profile(t) == pytest.approx(speed, rel=1e-6, abs=1e-8)
+
+
+def engine_keywords():
+    return {'rod_radius_ratio': 3.5,
+            'rev_per_min': 1500.0,
+            'stroke_length': 0.1,
+            'start_crank_angle': 180.0,
+            'endTime': 0.1,
+            }
+
+
+def test_engine_velocity_table():
+    profile = ICEngineProfile(engine_keywords())
+    time, velocity = profile.velocity_table(0.1)
+    assert time[0] == 0.0 and time[-1] >= 0.1
+    assert velocity == pytest.approx(profile(time), rel=1e-14, abs=1e-14)
+    peak = np.max(np.abs(velocity))
+    t = np.random.default_rng(0).uniform(0.0, 0.1, 2000)
+    assert np.max(np.abs(np.interp(t, time, velocity) - profile(t))) <= (
+        1e-5*peak)
+    assert profile.velocity_table(0.1, max_points=100) is None
+
+
+def test_engine_native_function_agrees():
+    profile = ICEngineProfile(engine_keywords())
+    function = native_function(profile)
+    peak = profile.omega*profile.stroke_length
+    for t in np.random.default_rng(0).uniform(0.0, 0.1, 2000):
+        assert function(t) == pytest.approx(profile(t), abs=1e-5*peak)
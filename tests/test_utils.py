@@ -0,0 +1,168 @@
+"""Tests of the input file reading in cansen.utils."""
+# Standard libraries
+import os
+import sys
+import types
+
+# Third-party modules
+import pytest
+
+# Local imports
+from cansen import utils
+from cansen.exceptions import KeywordError
+
+INPUT = """PRES 1.0
+TEMP 800.0
+REAC CH4 1.0
+TIME 0.05
+VOL 1.0
+VPRF vol.csv
+END
+"""
+
+
+def write_input(tmp_path):
+    """Write an input file and its profile to a subdirectory."""
+    sub_dir = tmp_path / 'sub'
+    sub_dir.mkdir()
+    (sub_dir / 'vol.csv').write_text('0.0,1.0\n0.05,0.5\n')
+    (sub_dir / 'in.inp').write_text(INPUT + INPUT)
+    return sub_dir
+
+
+def fake_ck2cti_main(argv):
+    """Write an empty output file, naming it like `ck2cti.main`."""
+    output_filename = [arg for arg in argv
+                       if arg.startswith('--output=')][0][len('--output='):]
+    if not output_filename.endswith('.cti'):
+        output_filename += '.cti'
+    with open(output_filename, 'w') as output_file:
+        output_file.write('# converted\n')
+
+
+def test_convert_mech_to_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    cantera = types.ModuleType('cantera')
+    cantera.__version__ = '2.4.0'
+    cantera.ck2cti = types.SimpleNamespace(main=fake_ck2cti_main)
+    monkeypatch.setitem(sys.modules, 'cantera', cantera)
+    mech_filename = tmp_path / 'chem.inp'
+    mech_filename.write_text('ELEMENTS H END\n')
+
+    converted_filename = utils.convert_mech(str(mech_filename))
+    assert converted_filename.endswith('.cti')
+    with open(converted_filename) as converted_file:
+        assert converted_file.read() == '# converted\n'
+    assert [name for name in os.listdir(os.path.dirname(converted_filename))
+            if 'tmp' in name] == []
+    # The second conversion is found in the cache.
+    assert utils.convert_mech(str(mech_filename)) == converted_filename
+
+
+def test_profile_file_relative_to_input(tmp_path, monkeypatch):
+    sub_dir = write_input(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    keywords = utils.read_input_file(os.path.join('sub', 'in.inp'),
+                                     echo=False,
+                                     lines=INPUT.splitlines(True))
+    assert keywords['vproFile'] == str(sub_dir / 'vol.csv')
+
+
+def test_multi_profile_file_relative_to_input(tmp_path, monkeypatch):
+    sub_dir = write_input(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    cases = utils.read_multi_cases(os.path.join('sub', 'in.inp'))
+    assert len(cases) == 2
+    for keywords in cases:
+        assert keywords['vproFile'] == str(sub_dir / 'vol.csv')
+
+
+def test_resume_runs_failed_and_stopped_cases(tmp_path):
+    journal_filename = str(tmp_path / 'output.out.journal')
+    with open(journal_filename, 'w') as journal:
+        for index, status in enumerate(['ignition', 'no-ignition', 'error',
+                                        'wall-time', 'max-steps']):
+            utils.write_journal(journal, index, 'key{}'.format(index),
+                                [None, 1.0, 1000.0], {'status': status})
+        # A case that was stopped and then finished when resumed.
+        utils.write_journal(journal, 3, 'key3', [1e-3, 1.0, 1000.0],
+                            {'status': 'ignition'})
+        journal.write('{"index": 5, "key"')
+    journaled = utils.read_journal(journal_filename)
+    assert sorted(journaled) == ['key0', 'key1', 'key3']
+    assert journaled['key3'][0] == [1e-3, 1.0, 1000.0]
+
+
+def cubic_crossing(time1, time2, tol):
+    """Find where (t - time1)**3 reaches half its value at ``time2``."""
+    span = time2 - time1
+    return utils.find_crossing(span**3/2, time1, 0.0, time2, span**3,
+                               deriv1=0.0, deriv2=3*span**2, tol=tol)
+
+
+def test_find_crossing_linear():
+    assert utils.find_crossing(1500.0, 1.0, 1000.0, 2.0, 2000.0) == 1.5
+    assert utils.find_crossing(1500.0, 1.0, 1600.0, 2.0, 2000.0) == 1.0
+
+
+def test_find_crossing_hermite():
+    # The cubic is interpolated exactly by the Hermite spline.
+    crossing = cubic_crossing(0.0, 1.0, 1e-12)
+    assert abs(crossing - 0.5**(1/3)) <= 1e-12
+
+
+def test_find_crossing_zero_tolerance():
+    crossing = cubic_crossing(0.0, 1.0, 0.0)
+    assert crossing == pytest.approx(0.5**(1/3), rel=1e-14)
+
+
+def test_find_crossing_large_time():
+    # The default tolerance is far below the floating point spacing at
+    # a time of 1e9 s.
+    crossing = cubic_crossing(1e9, 1e9 + 1e-6, None)
+    assert crossing == pytest.approx(1e9 + 1e-6*0.5**(1/3), abs=1e-6)
+    assert 1e9 <= crossing <= 1e9 + 1e-6
+
+
+@pytest.mark.parametrize('tolerance', ['0.0', '-1.0E-3'])
+def test_ignition_tolerance_must_be_positive(tolerance):
+    lines = INPUT.replace('VPRF vol.csv\n',
+                         'CONV\nIGNTOL {}\n'.format(tolerance)).splitlines(True)
+    with pytest.raises(KeywordError, match='ignition time tolerance'):
+        utils.read_input_file('in.inp', echo=False, lines=lines)
+
+
+@pytest.mark.parametrize('trng,temperatures', [
+    ('TRNG 700 1200 100', [700.0, 800.0, 900.0, 1000.0, 1100.0, 1200.0]),
+    ('TRNG 700 1200 30', [700.0 + 30*i for i in range(17)]),
+    ('TRNG 1000 800 -150', [1000.0, 850.0]),
+])
+def test_temperature_sweep(trng, temperatures):
+    lines = INPUT.replace('TEMP 800.0\n', '').replace(
+        'VPRF vol.csv\n', 'CONV\n{}\n'.format(trng))
+    keywords = utils.read_input_file('in.inp', echo=False,
+                                     lines=lines.splitlines(True))
+    assert keywords['sweep']['temperature'] == pytest.approx(temperatures)
+    assert keywords['temperature'] == temperatures[0]
+
+
+def test_unknown_compression_library():
+    pytest.importorskip('tables')
+    lines = INPUT.replace('VPRF vol.csv\n', 'CONV\nCOMP blosc:lz4 5\n')
+    keywords = utils.read_input_file('in.inp', echo=False,
+                                     lines=lines.splitlines(True))
+    assert keywords['complib'] == 'blosc:lz4'
+    lines = INPUT.replace('VPRF vol.csv\n', 'CONV\nCOMP zlibb 5\n')
+    with pytest.raises(KeywordError):
+        utils.read_input_file('in.inp', echo=False,
+                              lines=lines.splitlines(True))
+
+
+@pytest.mark.parametrize('level', ['0', '12'])
+def test_compression_level_out_of_range(level):
+    pytest.importorskip('tables')
+    lines = INPUT.replace('VPRF vol.csv\n',
+                          'CONV\nCOMP zlib {}\n'.format(level))
+    with pytest.raises(KeywordError, match='compression level'):
+        utils.read_input_file('in.inp', echo=False,
+                              lines=lines.splitlines(True))
@@ -0,0 +1,93 @@
+"""Tests of the save file writers in cansen.writer."""
+# Third-party modules
+import numpy as np
+import pytest
+import tables
+
+# Local imports
+from cansen.writer import (BufferedTableWriter, ThreadedTableWriter,
+                           AdaptiveSaveFilter)
+
+
+class Row(tables.IsDescription):
+    time = tables.Float64Col(pos=0)
+    massfractions = tables.Float64Col(shape=(3,), pos=1)
+    sensitivity = tables.Float64Col(shape=(3, 2), pos=2)
+
+
+def fill(row, step):
+    row['time'] = 1e-3*step
+    row['massfractions'] = np.arange(3) + step
+    row['sensitivity'] = np.arange(6).reshape(3, 2)*step
+
+
+def write_rows(filename, make_writer, n_rows):
+    """Write the rows, and fill one more that is not appended."""
+    with tables.open_file(filename, 'w') as save_file:
+        table = save_file.create_table('/', 'reactor', Row)
+        if make_writer is None:
+            row = table.row
+            for step in range(n_rows):
+                fill(row, step)
+                row.append()
+            fill(row, n_rows)
+            table.flush()
+        else:
+            with make_writer(table) as row:
+                for step in range(n_rows):
+                    fill(row, step)
+                    row.append()
+                    assert row.last_row['time'] == 1e-3*step
+                fill(row, n_rows)
+                # The row being filled is not the last appended row.
+                assert row.last_row['time'] == 1e-3*(n_rows - 1)
+        return table.read()
+
+
+@pytest.mark.parametrize('make_writer', [
+    lambda table: BufferedTableWriter(table, buffer_size=4),
+    lambda table: BufferedTableWriter(table, buffer_size=1),
+    lambda table: ThreadedTableWriter(table, buffer_size=4, queue_size=1),
+])
+def test_writer_matches_table_row(tmp_path, make_writer):
+    expected = write_rows(str(tmp_path / 'row.hdf'), None, 10)
+    actual = write_rows(str(tmp_path / 'buffered.hdf'), make_writer, 10)
+    assert len(expected) == 10
+    assert actual.dtype == expected.dtype
+    for name in expected.dtype.names:
+        np.testing.assert_array_equal(actual[name], expected[name])
+
+
+def filter_trace(save_filter, time, temperature):
+    """Return the indices of the time steps the filter saves."""
+    states = np.column_stack((time, temperature))
+    save_filter.start(states[0])
+    saved = [0]
+    for index in range(1, len(time)):
+        saved.extend(save_filter.update(states[index], index))
+    saved.extend(save_filter.finish())
+    return saved
+
+
+def sigmoid_trace():
+    time = np.linspace(0.0, 1.0, 2001)
+    return time, 1000.0 + 1500.0/(1.0 + np.exp(-(time - 0.5)/0.01))
+
+
+def test_adaptive_filter_interpolation_error():
+    time, temperature = sigmoid_trace()
+    saved = filter_trace(AdaptiveSaveFilter(rtol=0.01), time, temperature)
+    assert saved == sorted(set(saved))
+    assert saved[0] == 0 and saved[-1] == len(time) - 1
+    assert len(saved) < 100
+    interpolated = np.interp(time, time[saved], temperature[saved])
+    assert np.max(np.abs(interpolated/temperature - 1)) <= 0.01
+
+
+def test_adaptive_filter_max_interval():
+    time, temperature = sigmoid_trace()
+    saved = filter_trace(AdaptiveSaveFilter(rtol=0.01, max_interval=0.05),
+                         time, temperature)
+    # A time step is saved once it is at least max_interval after the
+    # last saved one, so the gaps are at most one solver step longer.
+    assert np.max(np.diff(time[saved])) <= 0.05 + time[1]